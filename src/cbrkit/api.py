@@ -1,11 +1,19 @@
-from collections.abc import Mapping
-from typing import Any, Literal
+import asyncio
+import gc
+import os
+import signal
+from collections.abc import Mapping, Sequence
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated, Any, Literal
 
-from pydantic import ConfigDict
-from pydantic.dataclasses import dataclass
+import orjson
 
 try:
-    from fastapi import FastAPI
+    from fastapi import Body, Depends, FastAPI, HTTPException, Query
+    from fastapi.responses import ORJSONResponse
+    from pydantic import BaseModel
     from pydantic_settings import BaseSettings, SettingsConfigDict
 except ModuleNotFoundError:
     print("Please install cbrkit with the [api] extra to use the REST API server.")
@@ -13,14 +21,134 @@ except ModuleNotFoundError:
 
 import cbrkit
 
-pydantic_dataclass_kwargs = {
-    "config": ConfigDict(arbitrary_types_allowed=True),
-    "frozen": True,
-    "slots": True,
-}
 
-RetrievalResult = dataclass(cbrkit.retrieval.Result, **pydantic_dataclass_kwargs)
-ReuseResult = dataclass(cbrkit.reuse.Result, **pydantic_dataclass_kwargs)
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Mapping):
+        return dict(obj)
+
+    if isinstance(obj, Sequence | AbstractSet):
+        return list(obj)
+
+    raise TypeError
+
+
+def _response(content: Any) -> ORJSONResponse:
+    # the content is serialized up front since `ORJSONResponse` does not convert other mappings, sequences, and sets
+    return ORJSONResponse(
+        orjson.Fragment(
+            orjson.dumps(
+                content,
+                default=_default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            )
+        )
+    )
+
+
+class StepResponse(BaseModel):
+    """Result of a single retrieval/reuse step, fields excluded by the projection are omitted."""
+
+    similarities: dict[str, Any] | None = None
+    ranking: list[Any] | None = None
+    casebase: dict[str, Any] | None = None
+    metadata: dict[str, Any] | None = None
+
+
+class ResultResponse(BaseModel):
+    steps: list[StepResponse]
+
+
+class MetadataResponse(BaseModel):
+    """Results wrapped with the metadata of their steps if `metadata=response` is requested."""
+
+    metadata: list[dict[str, Any]]
+    results: dict[str, ResultResponse]
+
+
+# the results are serialized directly, so these models only document the responses
+ProjectedResponse = dict[str, ResultResponse] | MetadataResponse
+
+
+@dataclass(slots=True, frozen=True)
+class Projection:
+    """Query parameters that select the parts of the results that are returned.
+
+    Args:
+        steps: Return the results of all retrieval/reuse steps or only the final one.
+        limit: Only return the best cases of each step.
+        similarities: Return the full similarity objects, only their float values, or none at all.
+        include_cases: Return the cases of each step.
+        metadata: Return the metadata with each step, once per response, or not at all.
+            If set to `response`, the results are wrapped as `{"metadata": [...], "results": {...}}`.
+    """
+
+    steps: Literal["all", "final"] = "all"
+    limit: int | None = None
+    similarities: Literal["full", "value", "none"] = "full"
+    include_cases: bool = True
+    metadata: Literal["step", "response", "none"] = "step"
+
+
+def _project_step(
+    step: cbrkit.retrieval.ResultStep | cbrkit.reuse.ResultStep,
+    projection: Projection,
+) -> dict[str, Any]:
+    ranking = list(getattr(step, "ranking", step.similarities.keys()))
+
+    if projection.limit is not None:
+        ranking = ranking[: projection.limit]
+
+    entry: dict[str, Any] = {}
+
+    if projection.similarities == "full":
+        entry["similarities"] = {key: step.similarities[key] for key in ranking}
+    elif projection.similarities == "value":
+        entry["similarities"] = {
+            key: cbrkit.helpers.unpack_sim(step.similarities[key]) for key in ranking
+        }
+
+    if isinstance(step, cbrkit.retrieval.ResultStep):
+        entry["ranking"] = ranking
+
+    if projection.include_cases:
+        entry["casebase"] = {
+            key: step.casebase[key] for key in ranking if key in step.casebase
+        }
+
+    if projection.metadata == "step":
+        entry["metadata"] = step.metadata
+
+    return entry
+
+
+def _project(
+    results: Mapping[Any, cbrkit.retrieval.Result] | Mapping[Any, cbrkit.reuse.Result],
+    projection: Projection,
+) -> ORJSONResponse:
+    payload = {
+        key: {
+            "steps": [
+                _project_step(step, projection)
+                for step in (
+                    result.steps[-1:] if projection.steps == "final" else result.steps
+                )
+            ]
+        }
+        for key, result in results.items()
+    }
+
+    if projection.metadata == "response":
+        # the metadata only depends on the retrievers/reusers, not on the query
+        first = next(iter(results.values()), None)
+        steps = [] if first is None else first.steps
+        metadata = [
+            step.metadata
+            for step in (steps[-1:] if projection.steps == "final" else steps)
+        ]
+
+        return _response({"metadata": metadata, "results": payload})
+
+    return _response(payload)
 
 
 class Settings(BaseSettings):
@@ -29,6 +157,8 @@ class Settings(BaseSettings):
     retriever_map: str | None = None
     reuser: str | None = None
     reuser_map: str | None = None
+    casebase: str | None = None
+    warmup: bool = False
 
 
 settings = Settings()
@@ -60,68 +190,413 @@ elif settings.reuser_map is not None:
     reuser_map = cbrkit.helpers.load_callables_map(settings.reuser_map.split(","))
     reuser = list(reuser_map.values())
 
+casebases: dict[str, cbrkit.typing.Casebase[Any, Any]] = {}
+# set by `serve` before forking, the workers do not share any state afterwards
+forked_workers = False
+
+
+def _check_processes(processes: int) -> None:
+    # pools started in forked workers deadlock on the threads that are already running (e.g., polars)
+    if forked_workers and processes != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Multiprocessing is not available when serving multiple workers",
+        )
+
 
-@app.post("/retrieve", response_model=Mapping[str, RetrievalResult])
-def all_retrievers(
+def _check_mutable() -> None:
+    # changes would only be visible to the worker that handles the request
+    if forked_workers:
+        raise HTTPException(
+            status_code=409,
+            detail="Casebases cannot be changed when serving multiple workers",
+        )
+
+
+def _warmup(casebase: cbrkit.typing.Casebase[Any, Any]) -> None:
+    # a single query fills the embedding stores and caches of the retrievers
+    if not settings.warmup or not retriever or len(casebase) == 0:
+        return
+
+    query = next(iter(casebase.values()))
+    cbrkit.retrieval.apply(casebase, query, retriever)
+
+
+def _collect_lazy_casebases() -> None:
+    # queries of lazy casebases deadlock in forked workers if polars already ran in the parent
+    for name, casebase in casebases.items():
+        if isinstance(casebase, cbrkit.loaders.polars_lazy):
+            casebases[name] = casebase.collect()
+
+
+def _register(name: str, casebase: cbrkit.typing.Casebase[Any, Any]) -> None:
+    _warmup(casebase)
+    casebases[name] = casebase
+
+
+def _casebase(name: str) -> cbrkit.typing.Casebase[Any, Any]:
+    if name not in casebases:
+        raise HTTPException(status_code=404, detail=f"Casebase '{name}' not found")
+
+    return casebases[name]
+
+
+def _case_similarities(
+    casebase: cbrkit.typing.Casebase[Any, Any],
+    similarities: dict[str, dict[str, float]] | None,
+) -> dict[str, dict[Any, float]] | None:
+    # JSON objects only have string keys, so they are mapped back to the keys of the casebase
+    if similarities is None:
+        return None
+
+    keys = {str(key): key for key in casebase}
+
+    return {
+        query_name: {keys[key]: sim for key, sim in sims.items() if key in keys}
+        for query_name, sims in similarities.items()
+    }
+
+
+# entries have the form `name=path` or `path`, in which case the file name is used
+if settings.casebase:
+    for entry in filter(None, settings.casebase.split(",")):
+        name, sep, path = entry.rpartition("=")
+        _register(name if sep else Path(path).stem, cbrkit.loaders.path(path))
+
+
+def _is_async(retriever: cbrkit.typing.RetrieverFunc) -> bool:
+    # `build` runs similarity functions without an asynchronous path in a thread
+    if isinstance(retriever, cbrkit.retrieval.build):
+        return isinstance(retriever.similarity_func, cbrkit.typing.SupportsSimAsync)
+
+    return isinstance(retriever, cbrkit.typing.SupportsRetrieveAsync)
+
+
+async def _retrieve(
     casebase: dict[str, Any],
     queries: dict[str, Any],
+    retrievers: cbrkit.typing.RetrieverFunc | Sequence[cbrkit.typing.RetrieverFunc],
+    processes: int,
+    parallel: Literal["queries", "casebase"],
+    concurrency: int,
+) -> Mapping[str, cbrkit.retrieval.Result]:
+    _check_processes(processes)
+
+    if not isinstance(retrievers, Sequence):
+        retrievers = [retrievers]
+
+    # only retrievers that await their providers benefit from processing the queries concurrently,
+    # all others use the batched retrieval of `mapply`
+    if processes == 1 and any(_is_async(retriever) for retriever in retrievers):
+        return await cbrkit.retrieval.mapply_async(
+            casebase,
+            queries,
+            retrievers,
+            concurrency,
+        )
+
+    return await asyncio.to_thread(
+        cbrkit.retrieval.mapply,
+        casebase,
+        queries,
+        retrievers,
+        processes,
+        parallel,
+    )
+
+
+@app.post("/retrieve", response_class=ORJSONResponse, response_model=ProjectedResponse)
+async def all_retrievers(
+    casebase: dict[str, Any],
+    queries: dict[str, Any],
+    projection: Annotated[Projection, Depends()],
     processes: int = 1,
     parallel: Literal["queries", "casebase"] = "queries",
-) -> Mapping[str, cbrkit.retrieval.Result]:
-    return cbrkit.retrieval.mapply(
+    concurrency: Annotated[int, Query(ge=1)] = 8,
+) -> ORJSONResponse:
+    results = await _retrieve(
         casebase,
         queries,
         retriever,
         processes,
         parallel,
+        concurrency,
     )
 
+    return _project(results, projection)
 
-@app.post("/retrieve/{retriever_name}", response_model=Mapping[str, RetrievalResult])
-def named_retriever(
+
+@app.post(
+    "/retrieve/{retriever_name}",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
+async def named_retriever(
     retriever_name: str,
     casebase: dict[str, Any],
     queries: dict[str, Any],
+    projection: Annotated[Projection, Depends()],
     processes: int = 1,
     parallel: Literal["queries", "casebase"] = "queries",
-) -> Mapping[str, cbrkit.retrieval.Result]:
-    return cbrkit.retrieval.mapply(
+    concurrency: Annotated[int, Query(ge=1)] = 8,
+) -> ORJSONResponse:
+    results = await _retrieve(
         casebase,
         queries,
         retriever_map[retriever_name],
         processes,
         parallel,
+        concurrency,
     )
 
+    return _project(results, projection)
+
 
-@app.post("/reuse", response_model=Mapping[str, ReuseResult])
+@app.post("/reuse", response_class=ORJSONResponse, response_model=ProjectedResponse)
 def all_reusers(
     casebase: dict[str, Any],
     queries: dict[str, Any],
+    projection: Annotated[Projection, Depends()],
     processes: int = 1,
     parallel: Literal["queries", "casebase"] = "queries",
-) -> Mapping[str, cbrkit.reuse.Result]:
-    return cbrkit.reuse.mapply(
+    retrieval_similarities: dict[str, dict[str, float]] | None = None,
+) -> ORJSONResponse:
+    _check_processes(processes)
+    results = cbrkit.reuse.mapply(
         casebase,
         queries,
-        retriever,
+        reuser,
         processes,
         parallel,
+        similarities=_case_similarities(casebase, retrieval_similarities),
     )
 
+    return _project(results, projection)
+
 
-@app.post("/reuse/{retriever_name}", response_model=Mapping[str, ReuseResult])
+@app.post(
+    "/reuse/{reuser_name}",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
 def named_reuser(
-    retriever_name: str,
+    reuser_name: str,
     casebase: dict[str, Any],
     queries: dict[str, Any],
+    projection: Annotated[Projection, Depends()],
     processes: int = 1,
     parallel: Literal["queries", "casebase"] = "queries",
-) -> Mapping[str, cbrkit.reuse.Result]:
-    return cbrkit.reuse.mapply(
+    retrieval_similarities: dict[str, dict[str, float]] | None = None,
+) -> ORJSONResponse:
+    _check_processes(processes)
+    results = cbrkit.reuse.mapply(
         casebase,
         queries,
+        reuser_map[reuser_name],
+        processes,
+        parallel,
+        similarities=_case_similarities(casebase, retrieval_similarities),
+    )
+
+    return _project(results, projection)
+
+
+@app.get("/casebases")
+def list_casebases() -> Mapping[str, int]:
+    return {name: len(casebase) for name, casebase in casebases.items()}
+
+
+@app.put("/casebases/{casebase_name}")
+def upload_casebase(
+    casebase_name: str,
+    casebase: dict[str, Any],
+) -> Mapping[str, int]:
+    _check_mutable()
+    _register(casebase_name, casebase)
+
+    return {casebase_name: len(casebase)}
+
+
+@app.delete("/casebases/{casebase_name}")
+def delete_casebase(casebase_name: str) -> None:
+    _check_mutable()
+    _casebase(casebase_name)
+    del casebases[casebase_name]
+
+
+@app.post(
+    "/casebases/{casebase_name}/retrieve",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
+async def stored_all_retrievers(
+    casebase_name: str,
+    queries: Annotated[dict[str, Any], Body(embed=True)],
+    projection: Annotated[Projection, Depends()],
+    processes: int = 1,
+    parallel: Literal["queries", "casebase"] = "queries",
+    concurrency: Annotated[int, Query(ge=1)] = 8,
+) -> ORJSONResponse:
+    results = await _retrieve(
+        _casebase(casebase_name),
+        queries,
+        retriever,
+        processes,
+        parallel,
+        concurrency,
+    )
+
+    return _project(results, projection)
+
+
+@app.post(
+    "/casebases/{casebase_name}/retrieve/{retriever_name}",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
+async def stored_named_retriever(
+    casebase_name: str,
+    retriever_name: str,
+    queries: Annotated[dict[str, Any], Body(embed=True)],
+    projection: Annotated[Projection, Depends()],
+    processes: int = 1,
+    parallel: Literal["queries", "casebase"] = "queries",
+    concurrency: Annotated[int, Query(ge=1)] = 8,
+) -> ORJSONResponse:
+    results = await _retrieve(
+        _casebase(casebase_name),
+        queries,
         retriever_map[retriever_name],
         processes,
         parallel,
+        concurrency,
+    )
+
+    return _project(results, projection)
+
+
+@app.post(
+    "/casebases/{casebase_name}/reuse",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
+def stored_all_reusers(
+    casebase_name: str,
+    queries: Annotated[dict[str, Any], Body(embed=True)],
+    projection: Annotated[Projection, Depends()],
+    processes: int = 1,
+    parallel: Literal["queries", "casebase"] = "queries",
+    retrieval_similarities: Annotated[
+        dict[str, dict[str, float]] | None, Body(embed=True)
+    ] = None,
+) -> ORJSONResponse:
+    _check_processes(processes)
+    casebase = _casebase(casebase_name)
+    results = cbrkit.reuse.mapply(
+        casebase,
+        queries,
+        reuser,
+        processes,
+        parallel,
+        similarities=_case_similarities(casebase, retrieval_similarities),
     )
+
+    return _project(results, projection)
+
+
+@app.post(
+    "/casebases/{casebase_name}/reuse/{reuser_name}",
+    response_class=ORJSONResponse,
+    response_model=ProjectedResponse,
+)
+def stored_named_reuser(
+    casebase_name: str,
+    reuser_name: str,
+    queries: Annotated[dict[str, Any], Body(embed=True)],
+    projection: Annotated[Projection, Depends()],
+    processes: int = 1,
+    parallel: Literal["queries", "casebase"] = "queries",
+    retrieval_similarities: Annotated[
+        dict[str, dict[str, float]] | None, Body(embed=True)
+    ] = None,
+) -> ORJSONResponse:
+    _check_processes(processes)
+    casebase = _casebase(casebase_name)
+    results = cbrkit.reuse.mapply(
+        casebase,
+        queries,
+        reuser_map[reuser_name],
+        processes,
+        parallel,
+        similarities=_case_similarities(casebase, retrieval_similarities),
+    )
+
+    return _project(results, projection)
+
+
+def serve(
+    workers: int,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    root_path: str = "",
+) -> None:
+    """Serves the app with multiple worker processes that share the loaded casebases and retrievers.
+
+    The casebases, retrievers, and reusers (including their taxonomies and embedding stores)
+    are loaded once when this module is imported.
+    Afterwards, the worker processes are forked and share this memory copy-on-write,
+    so the memory usage does not grow with the number of workers as long as the data is only read.
+    Only available on platforms that support `os.fork`.
+    Since the workers do not share any state after forking, casebases cannot be uploaded or deleted
+    (the endpoints return 409), and requests with `processes` other than 1 are rejected with 400,
+    as process pools cannot be started safely in the forked workers.
+    For the same reason, lazy casebases (e.g., Parquet files) are read into memory before forking.
+
+    Args:
+        workers: Number of worker processes.
+        host: Host to bind to.
+        port: Port to bind to.
+        root_path: Root path of the app if served behind a proxy.
+    """
+    import uvicorn
+
+    global forked_workers
+    forked_workers = workers > 1
+
+    if forked_workers:
+        _collect_lazy_casebases()
+
+    config = uvicorn.Config(app, host=host, port=port, root_path=root_path)
+    sock = config.bind_socket()
+
+    # the objects loaded so far are never collected, so the garbage collector of
+    # the workers does not touch (and thereby copy) their memory pages
+    gc.freeze()
+    pids: list[int] = []
+
+    for _ in range(workers):
+        pid = os.fork()
+
+        if pid == 0:
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            finally:
+                os._exit(0)
+
+        pids.append(pid)
+
+    def terminate(signum: int, frame: Any) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # interrupts from the terminal are already sent to all workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, terminate)
+
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    sock.close()
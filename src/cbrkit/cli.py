@@ -7,7 +7,7 @@ import os
 import sys
 from enum import Enum
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any
 
 try:
     import typer
@@ -79,6 +79,52 @@ def retrieve(
             print()
 
 
+def _load_similarities(
+    path: Path,
+    casebase: cbrkit.typing.Casebase[Any, Any],
+    queries: cbrkit.typing.Casebase[Any, Any],
+) -> dict[Any, dict[Any, float]]:
+    with path.open() as fp:
+        data = json.load(fp)
+
+    # JSON objects only have string keys, so they are mapped to the keys of the casebase
+    case_keys = {str(key): key for key in casebase}
+    similarities: dict[Any, dict[Any, float]] = {}
+
+    for query_name in queries:
+        entry = data.get(str(query_name), {})
+
+        # results written by `cbrkit retrieve --output-path`
+        if isinstance(entry, dict) and isinstance(entry.get("steps"), list):
+            entry = entry["steps"][-1]["similarities"] if entry["steps"] else {}
+
+        if not isinstance(entry, dict):
+            raise typer.BadParameter(
+                f"Expected the similarities of query '{query_name}' to be an object",
+                param_hint="--similarities-path",
+            )
+
+        query_similarities: dict[Any, float] = {}
+
+        for key, sim in entry.items():
+            # serialized similarity objects (e.g., of `cbrkit.sim.attribute_value`) store their score as `value`
+            if isinstance(sim, dict):
+                sim = sim.get("value")
+
+            if not isinstance(sim, int | float):
+                raise typer.BadParameter(
+                    f"Expected a number as similarity of case '{key}' for query '{query_name}'",
+                    param_hint="--similarities-path",
+                )
+
+            if key in case_keys:
+                query_similarities[case_keys[key]] = float(sim)
+
+        similarities[query_name] = query_similarities
+
+    return similarities
+
+
 @app.command()
 def reuse(
     casebase_path: Path,
@@ -88,13 +134,31 @@ def reuse(
     output_path: Path | None = None,
     processes: int = 1,
     parallel: ParallelStrategy = ParallelStrategy.queries,
+    similarities_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="JSON file with the similarities of the cases to each query, either the output of `cbrkit retrieve` (the similarities of the final step are used) or a mapping of the form `{query: {case: similarity}}`."
+        ),
+    ] = None,
 ) -> None:
     sys.path.extend(str(x) for x in search_path)
     casebase = cbrkit.loaders.path(casebase_path)
     queries = cbrkit.loaders.path(queries_path)
     reusers: list[cbrkit.typing.ReuserFunc] = cbrkit.helpers.load_callables(reuser)
+    similarities = (
+        _load_similarities(similarities_path, casebase, queries)
+        if similarities_path
+        else None
+    )
 
-    results = cbrkit.reuse.mapply(casebase, queries, reusers, processes, parallel.value)
+    results = cbrkit.reuse.mapply(
+        casebase,
+        queries,
+        reusers,
+        processes,
+        parallel.value,
+        similarities=similarities,
+    )
 
     if output_path:
         results_dict = {
@@ -110,16 +174,35 @@ def serve(
     retriever: Annotated[list[str], typer.Option(default_factory=list)],
     reuser: Annotated[list[str], typer.Option(default_factory=list)],
     search_path: Annotated[list[Path], typer.Option(default_factory=list)],
+    casebase: Annotated[list[str], typer.Option(default_factory=list)],
+    warmup: bool = False,
     host: str = "0.0.0.0",
     port: int = 8080,
     reload: bool = False,
     root_path: str = "",
+    workers: int = 1,
 ) -> None:
     import uvicorn
 
     sys.path.extend(str(x) for x in search_path)
-    os.environ["CBRKIT_RETRIEVER"] = ",".join(retriever)
-    os.environ["CBRKIT_REUSER"] = ",".join(reuser)
+
+    if retriever:
+        os.environ["CBRKIT_RETRIEVER"] = ",".join(retriever)
+
+    if reuser:
+        os.environ["CBRKIT_REUSER"] = ",".join(reuser)
+
+    if casebase:
+        os.environ["CBRKIT_CASEBASE"] = ",".join(casebase)
+
+    os.environ["CBRKIT_WARMUP"] = str(warmup).lower()
+
+    # the app is loaded once and shared with the forked workers
+    if workers > 1:
+        from cbrkit.api import serve
+
+        serve(workers, host, port, root_path)
+        return
 
     uvicorn.run(
         "cbrkit.api:app",
@@ -1,8 +1,21 @@
-from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
+import heapq
+import os
+from collections import defaultdict
+from collections.abc import (
+    Callable,
+    Collection,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
 from dataclasses import dataclass, field
 from importlib import import_module
 from inspect import signature as inspect_signature
-from typing import Any, Literal, cast, override
+from multiprocessing import Pool
+from multiprocessing.pool import Pool as PoolType
+from typing import Any, Literal, Self, cast, override
 
 from .typing import (
     AnySimFunc,
@@ -14,6 +27,8 @@ from .typing import (
     SimSeqFunc,
     SimSeqOrMap,
     SupportsMetadata,
+    SupportsSimColumn,
+    SupportsSimMap,
 )
 
 __all__ = [
@@ -21,14 +36,17 @@ __all__ = [
     "SimWrapper",
     "SimSeqWrapper",
     "SimMapWrapper",
+    "SimColumnWrapper",
     "SimPairWrapper",
     "unpack_sim",
     "unpack_sims",
+    "LazySimMap",
     "singleton",
     "similarities2ranking",
     "load_object",
     "load_callables",
     "load_callables_map",
+    "WorkerPool",
 ]
 
 
@@ -103,6 +121,7 @@ def dist2sim(distance: float) -> float:
 class SimWrapper[V, S: Float](SupportsMetadata):
     func: AnySimFunc[V, S]
     kind: Literal["pair", "seq"] = field(init=False)
+    column: bool = field(init=False)
 
     def __post_init__(self):
         signature = inspect_signature(self.func)
@@ -112,10 +131,15 @@ class SimWrapper[V, S: Float](SupportsMetadata):
         else:
             self.kind = "seq"
 
+        self.column = self.kind == "pair" and isinstance(self.func, SupportsSimColumn)
+
 
 class SimSeqWrapper[V, S: Float](SimWrapper[V, S], SimSeqFunc[V, S]):
     @override
     def __call__(self, pairs: Sequence[tuple[V, V]]) -> Sequence[S]:
+        if self.column:
+            return self._call_column(pairs)
+
         if self.kind == "pair":
             func = cast(SimPairFunc[V, S], self.func)
             return [func(x, y) for (x, y) in pairs]
@@ -123,10 +147,61 @@ class SimSeqWrapper[V, S: Float](SimWrapper[V, S], SimSeqFunc[V, S]):
         func = cast(SimSeqFunc[V, S], self.func)
         return func(pairs)
 
+    def _call_column(self, pairs: Sequence[tuple[V, V]]) -> Sequence[S]:
+        func = cast(SupportsSimColumn[V, S], self.func)
+
+        if len(pairs) == 0:
+            return []
+
+        first_query = pairs[0][1]
+
+        # usually, all pairs share the same query
+        if all(y is first_query for _, y in pairs):
+            return func.sim_column([x for x, _ in pairs], first_query)
+
+        idx_map: defaultdict[Any, list[int]] = defaultdict(list)
+
+        for idx, (_, y) in enumerate(pairs):
+            idx_map[y].append(idx)
+
+        results: list[S] = [cast(S, None)] * len(pairs)
+
+        for y, idxs in idx_map.items():
+            sims = func.sim_column([pairs[idx][0] for idx in idxs], y)
+
+            for idx, sim in zip(idxs, sims, strict=True):
+                results[idx] = sim
+
+        return results
+
+
+class SimColumnWrapper[V, S: Float](SimWrapper[V, S]):
+    """Compares a column of case values to a single query value."""
+
+    def __call__(self, xs: Sequence[V], y: V) -> Sequence[S]:
+        if self.column:
+            func = cast(SupportsSimColumn[V, S], self.func)
+            return func.sim_column(xs, y)
+
+        if self.kind == "seq":
+            func = cast(SimSeqFunc[V, S], self.func)
+            return func([(x, y) for x in xs])
+
+        func = cast(SimPairFunc[V, S], self.func)
+        return [func(x, y) for x in xs]
+
 
 class SimMapWrapper[V, S: Float](SimWrapper[V, S], SimMapFunc[Any, V, S]):
     @override
     def __call__(self, x_map: Mapping[Any, V], y: V) -> SimMap[Any, S]:
+        if isinstance(self.func, SupportsSimMap):
+            return self.func.sim_map(x_map, y)
+
+        if self.column:
+            func = cast(SupportsSimColumn[V, S], self.func)
+            sims = func.sim_column(list(x_map.values()), y)
+            return {key: sim for key, sim in zip(x_map.keys(), sims, strict=True)}
+
         if self.kind == "seq":
             func = cast(SimSeqFunc[V, S], self.func)
             pairs = [(x, y) for x in x_map.values()]
@@ -160,19 +235,82 @@ def unpack_sims(sims: Iterable[Float]) -> list[float]:
     return [unpack_sim(sim) for sim in sims]
 
 
-def similarities2ranking[K, S: Float](similarities: SimSeqOrMap[K, S]) -> list[Any]:
+class LazySimMap[K, S: Float](Mapping[K, S]):
+    """Similarities whose plain values are known upfront, while the similarity objects are built on access.
+
+    `similarities2ranking` only reads the plain values,
+    so ranking a casebase does not build a similarity object for every case.
+    Subclasses implement `__getitem__` to build the similarity of a single key.
+    """
+
+    __slots__ = ("floats",)
+
+    floats: Mapping[K, float]
+
+    def __init__(self, floats: Mapping[K, float]) -> None:
+        self.floats = floats
+
+    @override
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.floats)
+
+    @override
+    def __len__(self) -> int:
+        return len(self.floats)
+
+    @override
+    def __contains__(self, key: object) -> bool:
+        return key in self.floats
+
+
+def similarities2ranking[K, S: Float](
+    similarities: SimSeqOrMap[K, S],
+    limit: int | None = None,
+    min_similarity: float | None = None,
+    max_similarity: float | None = None,
+) -> list[Any]:
+    """Rank the keys/indices of the given similarities in descending order.
+
+    If a limit is given, only the top entries are selected with a heap instead of sorting all of them.
+    Ties keep their original order in both cases.
+
+    Args:
+        similarities: The similarities to rank.
+        limit: Return at most this many entries.
+        min_similarity: Return only entries with a similarity greater or equal than this.
+        max_similarity: Return only entries with a similarity less or equal than this.
+
+    Examples:
+        >>> similarities2ranking({"a": 0.5, "b": 0.9, "c": 0.7})
+        ['b', 'c', 'a']
+        >>> similarities2ranking([0.5, 0.9, 0.7, 0.2], limit=2)
+        [1, 2]
+        >>> similarities2ranking([0.5, 0.9, 0.7, 0.2], min_similarity=0.3, max_similarity=0.8)
+        [2, 0]
+    """
+    values: Mapping[Any, float]
+
     if isinstance(similarities, Sequence):
-        return sorted(
-            range(len(similarities)),
-            key=lambda i: unpack_sim(similarities[i]),
-            reverse=True,
-        )
+        values = dict(enumerate(unpack_sims(similarities)))
+    elif isinstance(similarities, LazySimMap):
+        values = similarities.floats
     elif isinstance(similarities, Mapping):
-        return sorted(
-            similarities, key=lambda i: unpack_sim(similarities[i]), reverse=True
-        )
+        values = {key: unpack_sim(sim) for key, sim in similarities.items()}
+    else:
+        raise TypeError(f"Expected a Sequence or Mapping, but got {type(similarities)}")
 
-    raise TypeError(f"Expected a Sequence or Mapping, but got {type(similarities)}")
+    keys: Iterable[Any] = values.keys()
+
+    if min_similarity is not None:
+        keys = (key for key in keys if values[key] >= min_similarity)
+
+    if max_similarity is not None:
+        keys = (key for key in keys if values[key] <= max_similarity)
+
+    if limit is not None:
+        return heapq.nlargest(limit, keys, key=values.__getitem__)
+
+    return sorted(keys, key=values.__getitem__, reverse=True)
 
 
 def load_object(import_name: str) -> Any:
@@ -234,3 +372,146 @@ def load_callables_map(
             functions.update(obj)
 
     return functions
+
+
+# objects that are kept alive in the worker processes of a `WorkerPool`
+_resident_objects: dict[Hashable, tuple[Any, ...]] = {}
+
+
+def _init_worker(resident: dict[Hashable, tuple[Any, ...]]) -> None:
+    global _resident_objects
+    _resident_objects = resident
+
+
+def _call_resident(
+    func: Callable[..., Any], resident_key: Hashable, args: tuple[Any, ...]
+) -> Any:
+    return func(*_resident_objects[resident_key], *args)
+
+
+def _qualname(func: Callable[..., Any]) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _object_ids(x: Any) -> Hashable:
+    """Identities of the objects, lists and tuples are compared by their elements."""
+    if isinstance(x, list | tuple):
+        return tuple(_object_ids(item) for item in x)
+
+    return id(x)
+
+
+class WorkerPool:
+    """Process pool that is kept alive across calls and keeps objects resident in its workers.
+
+    Creating a `multiprocessing.Pool` for every query means paying for process startup
+    and for pickling the casebase on every call.
+    A `WorkerPool` instead starts its workers once and sends the resident objects
+    (e.g., the casebase and the retrievers) to them only when these objects change.
+    Afterwards, only the per-call arguments (e.g., the query) cross the process boundary.
+    Objects are compared by identity, so the same casebase/retriever instances should be reused between calls.
+    Objects that are modified in place are not sent again, so pass a new object (or close the pool) after changing them.
+    The workers keep the objects of the last `max_resident` distinct calls,
+    so alternating between a few casebases does not restart the pool.
+
+    The pool can be passed to `cbrkit.retrieval.apply`, `cbrkit.retrieval.mapply`,
+    `cbrkit.reuse.apply`, and `cbrkit.reuse.mapply` via their `pool` argument.
+
+    Args:
+        processes: Number of worker processes.
+            If 0, the number of processes will be equal to the number of CPUs.
+            Negative values will be treated as 0.
+        max_resident: Maximum number of distinct combinations of function and resident objects kept in the workers.
+
+    Examples:
+        >>> with WorkerPool(2) as pool:
+        ...     pool.size
+        2
+    """
+
+    __slots__ = ("_pool", "_resident", "max_resident", "processes")
+
+    processes: int
+    max_resident: int
+    _pool: PoolType | None
+    # the objects are referenced here, so their identities stay valid while they are resident
+    _resident: dict[Hashable, tuple[Any, ...]]
+
+    def __init__(self, processes: int = 0, max_resident: int = 4) -> None:
+        self.processes = processes
+        self.max_resident = max_resident
+        self._pool = None
+        self._resident = {}
+
+    @property
+    def size(self) -> int:
+        if self.processes <= 0:
+            return os.cpu_count() or 1
+
+        return self.processes
+
+    def slices(self, length: int) -> list[slice]:
+        """Split a sequence of the given length into contiguous slices, one per worker.
+
+        Examples:
+            >>> WorkerPool(3).slices(7)
+            [slice(0, 3, None), slice(3, 6, None), slice(6, 7, None)]
+        """
+        size = max(1, -(-length // self.size))
+
+        return [
+            slice(start, min(start + size, length)) for start in range(0, length, size)
+        ]
+
+    def _ensure(
+        self, func: Callable[..., Any], resident: tuple[Any, ...]
+    ) -> tuple[PoolType, Hashable]:
+        resident_key = (_qualname(func), _object_ids(resident))
+
+        if resident_key in self._resident:
+            # mark the entry as recently used
+            self._resident[resident_key] = self._resident.pop(resident_key)
+
+            if self._pool is not None:
+                return self._pool, resident_key
+
+        self.close()
+        self._resident[resident_key] = resident
+
+        while len(self._resident) > max(1, self.max_resident):
+            del self._resident[next(iter(self._resident))]
+
+        self._pool = Pool(
+            self.size,
+            initializer=_init_worker,
+            initargs=(dict(self._resident),),
+        )
+
+        return self._pool, resident_key
+
+    def starmap[T](
+        self,
+        func: Callable[..., T],
+        resident: tuple[Any, ...],
+        args: Iterable[tuple[Any, ...]],
+    ) -> list[T]:
+        """Call `func(*resident, *arg)` for each `arg` in `args` in the workers.
+
+        The function must be defined at module level so that it can be pickled by reference.
+        Its resident objects are only transferred if they are not resident in the workers yet.
+        """
+        pool, resident_key = self._ensure(func, resident)
+
+        return pool.starmap(_call_resident, ((func, resident_key, arg) for arg in args))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
@@ -1,13 +1,20 @@
 """
-This module provides several loaders to read data from different file formats and convert it into a Casebase. To validate the data against a Pydantic model, a `validate` function is also provided.
+This module provides several loaders to read data from different file formats and convert it into a Casebase. Parquet and Arrow IPC files are read lazily (see `polars_lazy`). To validate the data against a Pydantic model, a `validate` function is also provided.
 """
 
 import csv as csvlib
 import tomllib
-from collections.abc import Callable, Iterator, Mapping
-from dataclasses import dataclass
+from collections.abc import (
+    Callable,
+    ItemsView,
+    Iterator,
+    Mapping,
+    Sequence,
+    ValuesView,
+)
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, cast, override
 
 import orjson
 import polars as pl
@@ -20,6 +27,9 @@ from .typing import Casebase, FilePath
 __all__ = [
     "csv",
     "polars",
+    "polars_lazy",
+    "parquet",
+    "arrow",
     "file",
     "folder",
     "json",
@@ -72,6 +82,139 @@ class polars(Mapping[int, dict[str, Any]]):
     def __len__(self) -> int:
         return self.df.shape[0]
 
+    def select(self, columns: Sequence[str]) -> pl.DataFrame:
+        """Returns a dataframe with the given columns of all cases."""
+        # `DataFrame.select` would use the thread pool of polars, which deadlocks in forked workers
+        return pl.DataFrame([self.df.get_column(column) for column in columns])
+
+
+@dataclass(slots=True)
+class polars_lazy(Mapping[int, dict[str, Any]]):
+    """Casebase backed by a polars LazyFrame, e.g., a scanned Parquet or Arrow IPC file.
+
+    Nothing is read when the casebase is created.
+    Columns are only collected when they are requested via `select` (as done by `cbrkit.sim.attribute_value`),
+    and they are kept in memory afterwards, so columns that are never compared are never read.
+    Only this path is lazy: all other access reads complete rows.
+    Multiple cases should be read with `rows`, `items`, or `values`, which collect them in a single query,
+    while accessing a single case runs a separate query for its row.
+
+    Examples:
+        >>> import polars as pl
+        >>> casebase = polars_lazy(pl.scan_csv("./data/cars-1k.csv"))
+        >>> len(casebase)
+        999
+        >>> casebase.select(["price", "year"]).shape
+        (999, 2)
+        >>> sorted(casebase.loaded_columns)
+        ['price', 'year']
+        >>> casebase[42]["price"] == polars(pl.read_csv("./data/cars-1k.csv"))[42]["price"]
+        True
+        >>> [case["price"] for case in casebase.rows([42, 7]).values()] == [
+        ...     casebase[42]["price"], casebase[7]["price"]
+        ... ]
+        True
+    """
+
+    lf: pl.LazyFrame
+    _columns: dict[str, pl.Series] = field(default_factory=dict, init=False, repr=False)
+    _len: int | None = field(default=None, init=False, repr=False)
+
+    @property
+    def loaded_columns(self) -> list[str]:
+        return list(self._columns)
+
+    def __getitem__(self, key: int) -> dict[str, Any]:
+        if not isinstance(key, int) or not 0 <= key < len(self):
+            raise KeyError(key)
+
+        return self.lf.slice(key, 1).collect().row(0, named=True)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def rows(self, keys: Sequence[int]) -> dict[int, dict[str, Any]]:
+        """Reads the given cases with a single query, in the order of the keys."""
+        keys = list(keys)
+
+        for key in keys:
+            if not isinstance(key, int) or not 0 <= key < len(self):
+                raise KeyError(key)
+
+        if not keys:
+            return {}
+
+        df = self.lf.select(pl.all().gather(keys)).collect()
+
+        return dict(zip(keys, df.iter_rows(named=True), strict=True))
+
+    @override
+    def items(self) -> ItemsView[int, dict[str, Any]]:
+        return self.rows(range(len(self))).items()
+
+    @override
+    def values(self) -> ValuesView[dict[str, Any]]:
+        return self.rows(range(len(self))).values()
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = cast(int, self.lf.select(pl.len()).collect().item())
+
+        return self._len
+
+    def select(self, columns: Sequence[str]) -> pl.DataFrame:
+        """Returns a dataframe with the given columns of all cases, reading only those that are not loaded yet."""
+        missing = [column for column in columns if column not in self._columns]
+
+        if missing:
+            df = self.lf.select(missing).collect()
+            self._columns.update({column: df.get_column(column) for column in missing})
+
+        return pl.DataFrame([self._columns[column] for column in columns])
+
+    def collect(self) -> polars:
+        """Reads all cases into memory.
+
+        The returned casebase does not run any polars queries afterwards,
+        so it can be used in forked processes (e.g., the workers of `cbrkit.api.serve`),
+        where the queries of the lazy casebase would deadlock on the thread pool of polars.
+        """
+        return polars(self.lf.collect())
+
+
+def parquet(path: FilePath) -> polars_lazy:
+    """Lazily reads a parquet file into a Casebase
+
+    Args:
+        path: File path of the parquet file
+
+    Returns:
+        Casebase that reads the columns of the file on demand.
+
+    Examples:
+        >>> file_path = "data/cars-1k.parquet"      # doctest: +SKIP
+        >>> result = parquet(file_path)             # doctest: +SKIP
+    """
+    return polars_lazy(pl.scan_parquet(path))
+
+
+def arrow(path: FilePath) -> polars_lazy:
+    """Lazily reads an Arrow IPC (Feather v2) file into a Casebase
+
+    The file is memory-mapped, so reading a column does not copy the whole file into memory.
+
+    Args:
+        path: File path of the Arrow IPC file
+
+    Returns:
+        Casebase that reads the columns of the file on demand.
+
+    Examples:
+        >>> file_path = "data/cars-1k.arrow"        # doctest: +SKIP
+        >>> result = arrow(file_path)               # doctest: +SKIP
+    """
+    return polars_lazy(pl.scan_ipc(path, memory_map=True))
+
 
 def csv(path: FilePath) -> dict[int, dict[str, str]]:
     """Reads a csv file and converts it into a dict representation
@@ -227,6 +370,10 @@ _data_loaders: dict[str, DataLoader] = {
 _batch_loaders: dict[str, BatchLoader] = {
     **_data_loaders,
     ".csv": _csv_polars,
+    ".parquet": parquet,
+    ".arrow": arrow,
+    ".ipc": arrow,
+    ".feather": arrow,
 }
 
 # They contain one case per file
@@ -292,7 +439,7 @@ def path(path: FilePath, pattern: str | None = None) -> Casebase[Any, Any]:
 
 
 def file(path: Path) -> Casebase[Any, Any] | None:
-    """Converts a file into a Casebase. The file can be of type csv, json, toml, yaml, or yml.
+    """Converts a file into a Casebase. The file can be of type csv, json, toml, yaml, yml, parquet, or arrow (ipc, feather).
 
     Args:
         path: Path of the file.
@@ -0,0 +1,844 @@
+import asyncio
+import heapq
+import itertools
+import os
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from multiprocessing import Pool
+from typing import Any, Literal, override
+
+from ..helpers import (
+    SimMapWrapper,
+    WorkerPool,
+    get_metadata,
+    similarities2ranking,
+    unpack_sim,
+)
+from ..loaders import polars_lazy
+from ..typing import (
+    AnySimFunc,
+    Casebase,
+    Float,
+    JsonDict,
+    RetrieverFunc,
+    SimMap,
+    SupportsMetadata,
+    SupportsRetrieveAsync,
+    SupportsSimAsync,
+    SupportsSimBatch,
+    SupportsSimTop,
+)
+
+__all__ = [
+    "build",
+    "mapply",
+    "apply",
+    "mapply_async",
+    "apply_async",
+    "mstream",
+    "stream",
+    "Result",
+    "ResultStep",
+    "base_retriever",
+]
+
+
+class _RankedSimMap[K, S: Float](dict[K, S]):
+    """Similarities whose keys are already ordered by rank."""
+
+    __slots__ = ()
+
+
+@dataclass(slots=True, frozen=True)
+class ResultStep[K, V, S: Float]:
+    similarities: SimMap[K, S]
+    ranking: Sequence[K]
+    casebase: Casebase[K, V]
+    metadata: JsonDict
+
+    @classmethod
+    def build(
+        cls,
+        similarities: SimMap[K, S],
+        full_casebase: Casebase[K, V],
+        metadata: JsonDict,
+    ) -> "ResultStep[K, V, S]":
+        # the similarities of `base_retriever.postprocess` do not need to be sorted again
+        if isinstance(similarities, _RankedSimMap):
+            ranking = list(similarities.keys())
+        else:
+            ranking = similarities2ranking(similarities)
+
+        # lazy casebases read all cases of the ranking in one query
+        if isinstance(full_casebase, polars_lazy):
+            casebase = full_casebase.rows(ranking)
+        else:
+            casebase = {key: full_casebase[key] for key in ranking}
+
+        return cls(similarities, tuple(ranking), casebase, metadata)
+
+    def as_dict(self) -> dict[str, Any]:
+        x = asdict(self)
+        del x["casebase"]
+
+        return x
+
+
+@dataclass(slots=True, frozen=True)
+class Result[K, V, S: Float]:
+    steps: list[ResultStep[K, V, S]]
+
+    @property
+    def final(self) -> ResultStep[K, V, S]:
+        return self.steps[-1]
+
+    @property
+    def similarities(self) -> SimMap[K, S]:
+        return self.final.similarities
+
+    @property
+    def ranking(self) -> Sequence[K]:
+        return self.final.ranking
+
+    @property
+    def casebase(self) -> Casebase[K, V]:
+        return self.final.casebase
+
+    @property
+    def metadata(self) -> JsonDict:
+        return self.final.metadata
+
+    def as_dict(self) -> dict[str, Any]:
+        x = asdict(self)
+
+        for entry in x["steps"]:
+            del entry["casebase"]
+
+        return x
+
+
+def mapply[QK, CK, V, S: Float](
+    casebase: Casebase[CK, V],
+    queries: Mapping[QK, V],
+    retrievers: RetrieverFunc[CK, V, S] | Sequence[RetrieverFunc[CK, V, S]],
+    processes: int = 1,
+    parallel: Literal["queries", "casebase"] = "queries",
+    pool: WorkerPool | None = None,
+) -> Mapping[QK, Result[CK, V, S]]:
+    """Applies multiple queries to a Casebase using retriever functions.
+
+    Args:
+        casebase: The casebase for the query.
+        queries: The queries that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+        processes: Number of CPUs that will be used for multiprocessing.
+            If 1, a regular loop will be used.
+            If 0, the number of processes will be equal to the number of CPUs.
+            Negative values will be treated as 0.
+        parallel: Strategy for parallelization.
+            If "queries", each query will be processed in parallel,
+            if "casebase" the whole casebase will be processed in parallel.
+        pool: A persistent worker pool that is used instead of creating new processes.
+            The casebase and the retrievers are kept in its workers between calls.
+            If given, `processes` is ignored.
+
+    Without multiprocessing, the first retriever compares all queries to the casebase in one pass
+    if it is built from a similarity function that supports multiple queries (see `cbrkit.typing.SupportsSimBatch`),
+    otherwise the queries are processed one after another.
+
+    Returns:
+        Returns an object of type Result.
+    """
+
+    if pool is not None and parallel == "queries":
+        keys = list(queries.keys())
+        results = pool.starmap(
+            _apply_resident,
+            (casebase, retrievers),
+            ((queries[key],) for key in keys),
+        )
+
+        return dict(zip(keys, results, strict=True))
+
+    if pool is None and processes != 1 and parallel == "queries":
+        pool_processes = None if processes <= 0 else processes
+        keys = list(queries.keys())
+
+        with Pool(pool_processes) as process_pool:
+            results = process_pool.starmap(
+                apply,
+                ((casebase, queries[key], retrievers) for key in keys),
+            )
+
+        return dict(zip(keys, results, strict=True))
+
+    if pool is None and processes == 1:
+        if not isinstance(retrievers, Sequence):
+            retrievers = [retrievers]
+
+        assert len(retrievers) > 0
+        first_retriever, *other_retrievers = retrievers
+        # the first retriever compares all queries in one pass over the casebase
+        sim_maps = _retrieve_batch(first_retriever, casebase, list(queries.values()))
+        metadata = get_metadata(first_retriever)
+
+        return {
+            key: _extend_result(
+                ResultStep.build(sim_map, casebase, metadata),
+                query,
+                other_retrievers,
+                processes,
+            )
+            for (key, query), sim_map in zip(queries.items(), sim_maps, strict=True)
+        }
+
+    return {
+        key: apply(casebase, value, retrievers, processes, pool)
+        for key, value in queries.items()
+    }
+
+
+def _retrieve_batch[K, V, S: Float](
+    retriever: RetrieverFunc[K, V, S],
+    casebase: Casebase[K, V],
+    queries: Sequence[V],
+) -> Sequence[SimMap[K, S]]:
+    if isinstance(retriever, build):
+        return retriever.batch(casebase, queries)
+
+    return [retriever(casebase, query, 1) for query in queries]
+
+
+def _extend_result[K, V, S: Float](
+    step: "ResultStep[K, V, S]",
+    query: V,
+    retrievers: Sequence[RetrieverFunc[K, V, S]],
+    processes: int,
+) -> "Result[K, V, S]":
+    if not retrievers:
+        return Result([step])
+
+    return Result([step, *apply(step.casebase, query, retrievers, processes).steps])
+
+
+def apply[K, V, S: Float](
+    casebase: Casebase[K, V],
+    query: V,
+    retrievers: RetrieverFunc[K, V, S] | Sequence[RetrieverFunc[K, V, S]],
+    processes: int = 1,
+    pool: WorkerPool | None = None,
+) -> Result[K, V, S]:
+    """Applies a single query to a Casebase using retriever functions.
+
+    Args:
+        casebase: The casebase for the query.
+        query: The query that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+        processes: Number of CPUs that will be used for multiprocessing.
+            If 1, a regular loop will be used.
+            If 0, the number of processes will be equal to the number of CPUs.
+            Negative values will be treated as 0.
+        pool: A persistent worker pool that is used instead of creating new processes.
+            The first retriever is applied to slices of the casebase that are kept in its workers,
+            so only the query is sent to them.
+            If given, `processes` is ignored.
+
+    Returns:
+        Returns an object of type Result.
+
+    Examples:
+        >>> import cbrkit
+        >>> import polars as pl
+        >>> df = pl.read_csv("./data/cars-1k.csv")
+        >>> casebase = cbrkit.loaders.polars(df)
+        >>> query = casebase[42]
+        >>> retriever = cbrkit.retrieval.build(
+        ...     cbrkit.sim.attribute_value(
+        ...         attributes={
+        ...             "price": cbrkit.sim.numbers.linear(max=100000),
+        ...             "year": cbrkit.sim.numbers.linear(max=50),
+        ...             "manufacturer": cbrkit.sim.strings.taxonomy.load(
+        ...                 "./data/cars-taxonomy.yaml",
+        ...                 measure=cbrkit.sim.strings.taxonomy.wu_palmer(),
+        ...             ),
+        ...             "miles": cbrkit.sim.numbers.linear(max=1000000),
+        ...         },
+        ...         aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ...     ),
+        ...     limit=5,
+        ... )
+        >>> result = cbrkit.retrieval.apply(casebase, query, retriever)
+    """
+    if not isinstance(retrievers, Sequence):
+        retrievers = [retrievers]
+
+    assert len(retrievers) > 0
+    steps: list[ResultStep[K, V, S]] = []
+    current_casebase = casebase
+
+    for idx, retriever_func in enumerate(retrievers):
+        if pool is not None and idx == 0:
+            sim_map = _retrieve_pooled(pool, casebase, retrievers, query)
+        else:
+            sim_map = retriever_func(current_casebase, query, processes)
+
+        step = ResultStep.build(sim_map, current_casebase, get_metadata(retriever_func))
+
+        steps.append(step)
+        current_casebase = step.casebase
+
+    return Result(steps)
+
+
+def mstream[QK, CK, V, S: Float](
+    batches: Iterable[Casebase[CK, V] | Iterable[tuple[CK, V]]],
+    queries: Mapping[QK, V],
+    retrievers: RetrieverFunc[CK, V, S] | Sequence[RetrieverFunc[CK, V, S]],
+    limit: int | None = None,
+    processes: int = 1,
+) -> Mapping[QK, Result[CK, V, S]]:
+    """Applies multiple queries to a casebase that is read in batches.
+
+    The casebase is consumed only once: each batch is scored by the first retriever for all queries
+    (in a single pass if it supports batches, see `mapply`),
+    and only the best `limit` cases per query are kept in a heap.
+    Thus, the peak memory is bounded by the size of a batch and the limit instead of the size of the casebase.
+    The remaining retrievers are applied to the selected cases as in `apply`.
+
+    Args:
+        batches: Batches of the casebase, either as mappings or as iterables of `(key, case)` tuples.
+            The keys have to be unique across all batches.
+        queries: The queries that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+        limit: Number of cases kept per query.
+            If None, the limit of the first retriever is used.
+        processes: Number of CPUs that will be used for multiprocessing.
+            If 1, a regular loop will be used.
+            If 0, the number of processes will be equal to the number of CPUs.
+            Negative values will be treated as 0.
+
+    Returns:
+        Returns an object of type Result for each query.
+    """
+
+    if not isinstance(retrievers, Sequence):
+        retrievers = [retrievers]
+
+    assert len(retrievers) > 0
+    first_retriever, *other_retrievers = retrievers
+
+    if limit is None and isinstance(first_retriever, base_retriever):
+        limit = first_retriever.limit
+
+    if limit is None:
+        raise ValueError("Streaming retrieval requires a limit")
+
+    counter = itertools.count()
+    # min-heaps of (similarity, negated position, key), so that later cases are evicted first on ties
+    heaps: dict[QK, list[tuple[float, int, CK]]] = {key: [] for key in queries}
+    entries: dict[QK, dict[CK, tuple[int, S, V]]] = {key: {} for key in queries}
+
+    for batch in batches:
+        batch_casebase = batch if isinstance(batch, Mapping) else dict(batch)
+        sim_maps = (
+            _retrieve_batch(first_retriever, batch_casebase, list(queries.values()))
+            if processes == 1
+            else [
+                first_retriever(batch_casebase, query, processes)
+                for query in queries.values()
+            ]
+        )
+
+        for query_key, sim_map in zip(queries.keys(), sim_maps, strict=True):
+            heap = heaps[query_key]
+            query_entries = entries[query_key]
+
+            for key, sim in sim_map.items():
+                position = next(counter)
+                item = (unpack_sim(sim), -position, key)
+
+                if len(heap) < limit:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    del query_entries[heapq.heappushpop(heap, item)[2]]
+                else:
+                    continue
+
+                query_entries[key] = (position, sim, batch_casebase[key])
+
+    results: dict[QK, Result[CK, V, S]] = {}
+
+    for query_key, query in queries.items():
+        query_entries = entries[query_key]
+        keys = sorted(query_entries, key=lambda key: query_entries[key][0])
+        step = ResultStep.build(
+            {key: query_entries[key][1] for key in keys},
+            {key: query_entries[key][2] for key in keys},
+            get_metadata(first_retriever),
+        )
+        results[query_key] = _extend_result(step, query, other_retrievers, processes)
+
+    return results
+
+
+def stream[K, V, S: Float](
+    batches: Iterable[Casebase[K, V] | Iterable[tuple[K, V]]],
+    query: V,
+    retrievers: RetrieverFunc[K, V, S] | Sequence[RetrieverFunc[K, V, S]],
+    limit: int | None = None,
+    processes: int = 1,
+) -> Result[K, V, S]:
+    """Applies a single query to a casebase that is read in batches.
+
+    See `mstream` for details.
+
+    Args:
+        batches: Batches of the casebase, either as mappings or as iterables of `(key, case)` tuples.
+            The keys have to be unique across all batches.
+        query: The query that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+        limit: Number of cases kept for the query.
+            If None, the limit of the first retriever is used.
+        processes: Number of CPUs that will be used for multiprocessing.
+
+    Returns:
+        Returns an object of type Result.
+
+    Examples:
+        >>> import itertools
+        >>> import cbrkit
+        >>> import polars as pl
+        >>> df = pl.read_csv("./data/cars-1k.csv")
+        >>> casebase = cbrkit.loaders.polars(df)
+        >>> retriever = cbrkit.retrieval.build(
+        ...     cbrkit.sim.attribute_value(
+        ...         attributes={
+        ...             "price": cbrkit.sim.numbers.linear(max=100000),
+        ...             "year": cbrkit.sim.numbers.linear(max=50),
+        ...         },
+        ...         aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ...     ),
+        ...     limit=5,
+        ... )
+        >>> batches = itertools.batched(casebase.items(), 100)
+        >>> result = cbrkit.retrieval.stream(batches, casebase[42], retriever)
+        >>> result.ranking == cbrkit.retrieval.apply(casebase, casebase[42], retriever).ranking
+        True
+    """
+
+    return mstream(batches, {None: query}, retrievers, limit, processes)[None]
+
+
+async def mapply_async[QK, CK, V, S: Float](
+    casebase: Casebase[CK, V],
+    queries: Mapping[QK, V],
+    retrievers: RetrieverFunc[CK, V, S] | Sequence[RetrieverFunc[CK, V, S]],
+    concurrency: int | None = None,
+) -> Mapping[QK, Result[CK, V, S]]:
+    """Asynchronously applies multiple queries to a Casebase using retriever functions.
+
+    The queries are processed concurrently, e.g. to overlap the requests to embedding or rerank providers.
+
+    Args:
+        casebase: The casebase for the query.
+        queries: The queries that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+        concurrency: Maximum number of queries that are processed at the same time.
+            If None, all queries are started at once.
+
+    Returns:
+        Returns an object of type Result.
+    """
+
+    semaphore = asyncio.Semaphore(concurrency or max(len(queries), 1))
+
+    async def apply_query(query: V) -> Result[CK, V, S]:
+        async with semaphore:
+            return await apply_async(casebase, query, retrievers)
+
+    results = await asyncio.gather(*(apply_query(query) for query in queries.values()))
+
+    return dict(zip(queries.keys(), results, strict=True))
+
+
+async def apply_async[K, V, S: Float](
+    casebase: Casebase[K, V],
+    query: V,
+    retrievers: RetrieverFunc[K, V, S] | Sequence[RetrieverFunc[K, V, S]],
+) -> Result[K, V, S]:
+    """Asynchronously applies a single query to a Casebase using retriever functions.
+
+    Retrievers that support it (see `cbrkit.typing.SupportsRetrieveAsync`) are awaited directly,
+    all others are run in a separate thread so that they do not block the event loop.
+
+    Args:
+        casebase: The casebase for the query.
+        query: The query that will be applied to the casebase
+        retrievers: Retriever functions that will retrieve similar cases (compared to the query) from the casebase
+
+    Returns:
+        Returns an object of type Result.
+
+    Examples:
+        >>> import asyncio
+        >>> import cbrkit
+        >>> casebase = {0: "red car", 1: "blue bike", 2: "red car"}
+        >>> retriever = cbrkit.retrieval.build(cbrkit.sim.strings.fake_embedding(), limit=2)
+        >>> result = asyncio.run(cbrkit.retrieval.apply_async(casebase, "red car", retriever))
+        >>> result.ranking
+        (0, 2)
+    """
+    if not isinstance(retrievers, Sequence):
+        retrievers = [retrievers]
+
+    assert len(retrievers) > 0
+    steps: list[ResultStep[K, V, S]] = []
+    current_casebase = casebase
+
+    for retriever_func in retrievers:
+        if isinstance(retriever_func, SupportsRetrieveAsync):
+            sim_map = await retriever_func.retrieve_async(current_casebase, query)
+        else:
+            sim_map = await asyncio.to_thread(
+                retriever_func, current_casebase, query, 1
+            )
+
+        step = ResultStep.build(sim_map, current_casebase, get_metadata(retriever_func))
+
+        steps.append(step)
+        current_casebase = step.casebase
+
+    return Result(steps)
+
+
+def _apply_resident[K, V, S: Float](
+    casebase: Casebase[K, V],
+    retrievers: RetrieverFunc[K, V, S] | Sequence[RetrieverFunc[K, V, S]],
+    query: V,
+) -> Result[K, V, S]:
+    return apply(casebase, query, retrievers)
+
+
+# slices of the resident casebases, only populated in the workers of a `WorkerPool`
+_resident_shards: dict[tuple[int, int, int], Casebase[Any, Any]] = {}
+
+
+def _retrieve_shard[K, V, S: Float](
+    casebase: Casebase[K, V],
+    retrievers: Sequence[RetrieverFunc[K, V, S]],
+    shard: slice,
+    query: V,
+) -> SimMap[K, S]:
+    # the workers may keep several casebases, which stay alive as long as the worker
+    shard_key = (id(casebase), shard.start, shard.stop)
+
+    if shard_key not in _resident_shards:
+        _resident_shards[shard_key] = {
+            key: casebase[key]
+            for key in itertools.islice(casebase, shard.start, shard.stop)
+        }
+
+    return retrievers[0](_resident_shards[shard_key], query, 1)
+
+
+def _retrieve_pooled[K, V, S: Float](
+    pool: WorkerPool,
+    casebase: Casebase[K, V],
+    retrievers: Sequence[RetrieverFunc[K, V, S]],
+    query: V,
+) -> SimMap[K, S]:
+    sim_chunks = pool.starmap(
+        _retrieve_shard,
+        (casebase, retrievers),
+        ((shard, query) for shard in pool.slices(len(casebase))),
+    )
+    similarities: dict[K, S] = {}
+
+    for sim_chunk in sim_chunks:
+        similarities.update(sim_chunk)
+
+    retriever_func = retrievers[0]
+
+    # limits and thresholds are applied per slice, so they have to be applied again
+    if isinstance(retriever_func, base_retriever):
+        return retriever_func.postprocess(similarities)
+
+    return similarities
+
+
+def _chunkify[V](val: Sequence[V], n: int) -> Iterator[Sequence[V]]:
+    """Yield successive n-sized chunks from val.
+
+    Args:
+        val: The sequence that will be chunked.
+        n: Number of complete chunks.
+
+    Returns:
+        An iterator that yields the chunks.
+
+    Examples:
+        >>> list(_chunkify([1, 2, 3, 4, 5, 6, 7, 8, 9], 4))
+        [[1, 2], [3, 4], [5, 6], [7, 8], [9]]
+    """
+
+    # first compute the chunk size
+    k = len(val) // n
+    for i in range(0, len(val), k):
+        yield val[i : i + k]
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class base_retriever[K, V, S: Float](RetrieverFunc[K, V, S], SupportsMetadata):
+    limit: int | None = None
+    min_similarity: float | None = None
+    max_similarity: float | None = None
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {
+            "limit": self.limit,
+            "min_similarity": self.min_similarity,
+            "max_similarity": self.max_similarity,
+        }
+
+    def postprocess(self, similarities: SimMap[K, S]) -> SimMap[K, S]:
+        ranking = similarities2ranking(
+            similarities,
+            limit=self.limit,
+            min_similarity=self.min_similarity,
+            max_similarity=self.max_similarity,
+        )
+
+        # the returned mapping is ordered by rank
+        return _RankedSimMap((key, similarities[key]) for key in ranking)
+
+
+@dataclass(slots=True, frozen=True)
+class build[K, V, S: Float](base_retriever[K, V, S]):
+    """Based on the similarity function this function creates a retriever function.
+
+    The given limit will be applied after filtering for min/max similarity.
+    Similarity functions that support `sim_top` (e.g., `cbrkit.sim.graphs.astar`)
+    handle the processes themselves and may skip cases that cannot reach the limit.
+    These cases are then missing from the similarities of the result.
+
+    Args:
+        similarity_func: Similarity function to compute the similarity between cases.
+        limit: Retriever function will return the top limit cases.
+        min_similarity: Return only cases with a similarity greater or equal than this.
+        max_similarity: Return only cases with a similarity less or equal than this.
+
+    Returns:
+        Returns the retriever function.
+
+    Examples:
+        >>> import cbrkit
+        >>> retriever = cbrkit.retrieval.build(
+        ...     cbrkit.sim.attribute_value(
+        ...         attributes={
+        ...             "price": cbrkit.sim.numbers.linear(max=100000),
+        ...             "year": cbrkit.sim.numbers.linear(max=50),
+        ...             "model": cbrkit.sim.attribute_value(
+        ...                 attributes={
+        ...                     "make": cbrkit.sim.generic.equality(),
+        ...                     "manufacturer": cbrkit.sim.strings.taxonomy.load(
+        ...                         "./data/cars-taxonomy.yaml",
+        ...                         measure=cbrkit.sim.strings.taxonomy.wu_palmer(),
+        ...                     ),
+        ...                 }
+        ...             ),
+        ...         },
+        ...         aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ...     ),
+        ...     limit=5,
+        ... )
+    """
+
+    similarity_func: AnySimFunc[V, S]
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {
+            **super(build, self).metadata,
+            "similarity_func": get_metadata(self.similarity_func),
+        }
+
+    @override
+    def __call__(
+        self,
+        casebase: Casebase[K, V],
+        query: V,
+        processes: int,
+    ) -> SimMap[K, S]:
+        if isinstance(self.similarity_func, SupportsSimTop):
+            # cases beyond the limit may only be skipped if no cases are removed afterwards
+            limit = self.limit if self.max_similarity is None else None
+
+            return self.postprocess(
+                self.similarity_func.sim_top(casebase, query, limit, processes)
+            )
+
+        sim_func = SimMapWrapper(self.similarity_func)
+        similarities: SimMap[K, S] = {}
+
+        if processes != 1:
+            pool_processes = None if processes <= 0 else processes
+            chunks_num = os.cpu_count() if not pool_processes else pool_processes
+            assert chunks_num is not None
+
+            case_chunks: list[Casebase[K, V]] = [
+                dict(chunk) for chunk in _chunkify(list(casebase.items()), chunks_num)
+            ]
+
+            with Pool(pool_processes) as pool:
+                sim_chunks = pool.starmap(
+                    sim_func,
+                    ((x_chunk, query) for x_chunk in case_chunks),
+                )
+
+            for sim_chunk in sim_chunks:
+                similarities.update(sim_chunk)
+        else:
+            similarities = sim_func(casebase, query)
+
+        return self.postprocess(similarities)
+
+    def batch(
+        self,
+        casebase: Casebase[K, V],
+        queries: Sequence[V],
+    ) -> Sequence[SimMap[K, S]]:
+        """Compares multiple queries to the casebase, in a single pass if the similarity function supports it."""
+        if isinstance(self.similarity_func, SupportsSimTop):
+            return [self(casebase, query, 1) for query in queries]
+
+        if isinstance(self.similarity_func, SupportsSimBatch):
+            sim_maps = self.similarity_func.sim_batch(casebase, queries)
+        else:
+            sim_func = SimMapWrapper(self.similarity_func)
+            sim_maps = [sim_func(casebase, query) for query in queries]
+
+        return [self.postprocess(sim_map) for sim_map in sim_maps]
+
+    async def retrieve_async(
+        self,
+        casebase: Casebase[K, V],
+        query: V,
+    ) -> SimMap[K, S]:
+        """Awaits similarity functions with an asynchronous path, others are run in a separate thread."""
+        if isinstance(self.similarity_func, SupportsSimAsync):
+            sims = await self.similarity_func.sim_async(
+                [(x, query) for x in casebase.values()]
+            )
+
+            return self.postprocess(dict(zip(casebase.keys(), sims, strict=True)))
+
+        return await asyncio.to_thread(self, casebase, query, 1)
+
+
+try:
+    from cohere import AsyncClient, Client
+    from cohere.core import RequestOptions
+
+    @dataclass(slots=True, frozen=True)
+    class cohere[K, V, U](base_retriever[K, V, float]):
+        """Semantic similarity using Cohere's rerank models
+
+        Args:
+            model: Name of the [rerank model](https://docs.cohere.com/reference/rerank).
+        """
+
+        model: str
+        conversion_func: Callable[[V], str]
+        top_n: int | None = None
+        max_chunks_per_doc: int | None = None
+        client: Client = field(default_factory=Client)
+        request_options: RequestOptions | None = None
+        async_client: AsyncClient = field(default_factory=AsyncClient)
+
+        @property
+        @override
+        def metadata(self) -> JsonDict:
+            return {
+                **super(cohere, self).metadata,
+                "model": self.model,
+                "conversion_func": get_metadata(self.conversion_func),
+                "top_n": self.top_n,
+                "max_chunks_per_doc": self.max_chunks_per_doc,
+                "request_options": str(self.request_options),
+            }
+
+        @override
+        def __call__(
+            self,
+            casebase: Casebase[K, V],
+            query: V,
+            processes: int,
+        ) -> SimMap[K, float]:
+            response = self.client.v2.rerank(
+                model=self.model,
+                query=self.conversion_func(query),
+                documents=[self.conversion_func(value) for value in casebase.values()],
+                return_documents=False,
+                top_n=self.top_n,
+                max_chunks_per_doc=self.max_chunks_per_doc,
+                request_options=self.request_options,
+            )
+
+            return self._similarities(casebase, response)
+
+        async def retrieve_async(
+            self,
+            casebase: Casebase[K, V],
+            query: V,
+        ) -> SimMap[K, float]:
+            response = await self.async_client.v2.rerank(
+                model=self.model,
+                query=self.conversion_func(query),
+                documents=[self.conversion_func(value) for value in casebase.values()],
+                return_documents=False,
+                top_n=self.top_n,
+                max_chunks_per_doc=self.max_chunks_per_doc,
+                request_options=self.request_options,
+            )
+
+            return self._similarities(casebase, response)
+
+        def _similarities(
+            self, casebase: Casebase[K, V], response: Any
+        ) -> SimMap[K, float]:
+            key_index = {idx: key for idx, key in enumerate(casebase)}
+
+            similarities: SimMap[K, float] = {
+                key_index[result.index]: result.relevance_score
+                for result in response.results
+            }
+
+            return self.postprocess(similarities)
+
+    __all__ += ["cohere"]
+
+except ImportError:
+    pass
+
+
+# the indexes build on `base_retriever`, so they are imported after its definition
+try:
+    from . import indexes
+    from .indexes import AnnIndex, ann
+
+    __all__ += ["AnnIndex", "ann", "indexes"]
+
+except ImportError:
+    pass
+
+
+try:
+    from .indexes import NgramIndex, ngram
+
+    __all__ += ["NgramIndex", "ngram"]
+
+except ImportError:
+    pass
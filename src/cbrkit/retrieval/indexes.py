@@ -0,0 +1,521 @@
+"""
+Indexes allow retrievers to score only the candidates of a query instead of the whole casebase.
+They are built once over the cases, e.g. offline or at service start, and then shared by all queries.
+
+Two indexes are provided:
+`cbrkit.retrieval.indexes.AnnIndex` clusters the case embeddings for an approximate nearest neighbour search with `cbrkit.retrieval.ann`,
+while `cbrkit.retrieval.indexes.NgramIndex` maps the n-grams of the case texts to the cases containing them for `cbrkit.retrieval.ngram`.
+Both retrievers are re-exported by `cbrkit.retrieval`.
+"""
+
+import itertools
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, override
+
+import numpy as np
+import orjson
+
+from ..helpers import get_metadata
+from ..sim.strings.embeddings import normalize as _normalize_rows
+from ..typing import Casebase, FilePath, JsonDict, SimMap
+from . import base_retriever
+
+__all__ = [
+    "AnnIndex",
+    "ann",
+]
+
+
+@dataclass(slots=True, frozen=True, eq=False)
+class AnnIndex[K]:
+    """Inverted file (IVF) index over normalized case embeddings.
+
+    The vectors are clustered with spherical k-means, and each case is assigned to the list of its closest centroid.
+    A search only scores the cases in the lists whose centroids are closest to the query,
+    so its cost grows with the size of these lists instead of the size of the casebase.
+    The index is usually built offline with `AnnIndex.build`, written with `save`,
+    and loaded at service start with `AnnIndex.load`, which memory-maps the arrays.
+
+    Args:
+        keys: Case keys in the order of the vector rows. They have to be JSON-serializable to save the index.
+        vectors: Normalized float32 matrix with one row per case.
+        centroids: Normalized float32 matrix with one row per list.
+        list_offsets: Start of each list in `list_rows`, followed by the total number of rows.
+        list_rows: Row indices of all cases, grouped by list.
+    """
+
+    keys: Sequence[K]
+    vectors: Any
+    centroids: Any
+    list_offsets: Any
+    list_rows: Any
+    positions: dict[K, int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self, "positions", {key: idx for idx, key in enumerate(self.keys)}
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.positions
+
+    @classmethod
+    def build[V](
+        cls,
+        casebase: Casebase[K, V],
+        embed_func: Callable[[Sequence[V]], Sequence[Any]],
+        lists: int | None = None,
+        iterations: int = 10,
+        sample_size: int | None = None,
+        seed: int = 0,
+    ) -> "AnnIndex[K]":
+        """Embeds all cases and clusters them into lists.
+
+        Args:
+            casebase: Cases to index.
+            embed_func: Converts a sequence of cases into a sequence of vectors.
+            lists: Number of lists. Defaults to the square root of the number of cases.
+            iterations: Number of k-means iterations.
+            sample_size: Number of cases used to train the centroids. Defaults to 256 per list.
+            seed: Seed for selecting the initial centroids and the training sample.
+        """
+        keys = list(casebase.keys())
+
+        # an empty index has no lists, so its searches always return no candidates
+        if not keys:
+            empty = np.empty((0, 0), dtype=np.float32)
+
+            return cls(
+                keys, empty, empty, np.zeros(1, dtype=np.int64), np.empty(0, np.int64)
+            )
+
+        vectors = _normalize_rows(embed_func(list(casebase.values())))
+        lists = lists or max(1, int(len(keys) ** 0.5))
+        lists = min(lists, len(keys))
+        sample_size = sample_size or 256 * lists
+
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = _nearest_centroids(sample, centroids)
+
+            for idx in range(lists):
+                members = sample[assignments == idx]
+
+                # empty lists keep their previous centroid
+                if len(members) > 0:
+                    centroids[idx] = members.sum(axis=0)
+
+            centroids = _normalize_rows(centroids)
+
+        assignments = _nearest_centroids(vectors, centroids)
+        list_rows = np.argsort(assignments, kind="stable")
+        list_offsets = np.searchsorted(
+            assignments[list_rows], np.arange(lists + 1), side="left"
+        )
+
+        return cls(keys, vectors, centroids, list_offsets, list_rows)
+
+    def save(self, path: FilePath) -> None:
+        """Writes the index to the directory `path`."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        np.save(path / "vectors.npy", self.vectors)
+        np.save(path / "centroids.npy", self.centroids)
+        np.save(path / "list_offsets.npy", self.list_offsets)
+        np.save(path / "list_rows.npy", self.list_rows)
+        (path / "keys.json").write_bytes(orjson.dumps(list(self.keys)))
+
+    @classmethod
+    def load(cls, path: FilePath, mmap: bool = True) -> "AnnIndex[K]":
+        """Loads an index written with `save`.
+
+        Args:
+            path: Directory of the index.
+            mmap: If True, the case vectors are memory-mapped instead of read into memory.
+        """
+        path = Path(path)
+
+        return cls(
+            orjson.loads((path / "keys.json").read_bytes()),
+            np.load(path / "vectors.npy", mmap_mode="r" if mmap else None),
+            np.load(path / "centroids.npy"),
+            np.load(path / "list_offsets.npy"),
+            np.load(path / "list_rows.npy"),
+        )
+
+    def search(
+        self,
+        query: Any,
+        probes: int,
+        limit: int | None = None,
+    ) -> dict[K, float]:
+        """Scores the cases in the `probes` lists closest to the query vector.
+
+        Returns:
+            Cosine similarities of the candidates, at most `limit` entries if given.
+        """
+        if probes < 1:
+            raise ValueError(f"At least one list has to be probed, but got {probes}")
+
+        if len(self.keys) == 0:
+            return {}
+
+        query = _normalize_rows([query])[0]
+        centroid_scores = self.centroids @ query
+        probes = min(probes, len(centroid_scores))
+        probed = np.argpartition(-centroid_scores, probes - 1)[:probes]
+        rows = np.concatenate(
+            [
+                self.list_rows[self.list_offsets[idx] : self.list_offsets[idx + 1]]
+                for idx in probed
+            ]
+        )
+        rows.sort()
+        scores = self.vectors[rows] @ query
+
+        if limit is not None and len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+
+        return {
+            self.keys[row]: score
+            for row, score in zip(rows.tolist(), scores.tolist(), strict=True)
+        }
+
+
+def _nearest_centroids(vectors: Any, centroids: Any, chunk_size: int = 65536) -> Any:
+    assignments = np.empty(len(vectors), dtype=np.int64)
+
+    for start in range(0, len(vectors), chunk_size):
+        chunk_scores = vectors[start : start + chunk_size] @ centroids.T
+        assignments[start : start + chunk_size] = chunk_scores.argmax(axis=1)
+
+    return assignments
+
+
+@dataclass(slots=True, frozen=True)
+class ann[K, V](base_retriever[K, V, float]):
+    """Approximate nearest neighbour retriever based on an `AnnIndex`.
+
+    It is intended as the first of several retrievers:
+    it quickly selects the `limit` cases whose embeddings are closest to the query,
+    so that more expensive retrievers only have to score these candidates.
+    Cases of the casebase that are not part of the index are embedded and scored exactly,
+    cases of the index that are not part of the casebase are ignored.
+
+    Args:
+        index: Index built over the embeddings of the casebase.
+        embed_func: Converts a sequence of cases or queries into a sequence of vectors.
+            It has to be the same function that was used to build the index.
+        probes: Number of lists that are searched per query.
+            Higher values increase the recall at the expense of speed.
+        limit: Retriever function will return the top limit cases.
+        min_similarity: Return only cases with a similarity greater or equal than this.
+        max_similarity: Return only cases with a similarity less or equal than this.
+
+    Examples:
+        >>> import cbrkit
+        >>> import polars as pl
+        >>> df = pl.read_csv("./data/cars-1k.csv")
+        >>> casebase = cbrkit.loaders.polars(df)
+        >>> def embed(cars):
+        ...     return [[car["price"] / 100000, car["year"] / 2020, car["miles"] / 1000000] for car in cars]
+        >>> index = cbrkit.retrieval.AnnIndex.build(casebase, embed, lists=16)
+        >>> retrievers = [
+        ...     cbrkit.retrieval.ann(index, embed, probes=4, limit=50),
+        ...     cbrkit.retrieval.build(
+        ...         cbrkit.sim.attribute_value(
+        ...             attributes={
+        ...                 "price": cbrkit.sim.numbers.linear(max=100000),
+        ...                 "year": cbrkit.sim.numbers.linear(max=50),
+        ...             },
+        ...             aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ...         ),
+        ...         limit=5,
+        ...     ),
+        ... ]
+        >>> result = cbrkit.retrieval.apply(casebase, casebase[42], retrievers)
+        >>> len(result.steps[0].ranking), len(result.ranking)
+        (50, 5)
+    """
+
+    index: AnnIndex[K]
+    embed_func: Callable[[Sequence[V]], Sequence[Any]]
+    probes: int = 8
+
+    def __post_init__(self) -> None:
+        if self.probes < 1:
+            raise ValueError(
+                f"At least one list has to be probed, but got {self.probes}"
+            )
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {
+            **super(ann, self).metadata,
+            "index_size": len(self.index),
+            "embed_func": get_metadata(self.embed_func),
+            "probes": self.probes,
+        }
+
+    @override
+    def __call__(
+        self,
+        casebase: Casebase[K, V],
+        query: V,
+        processes: int,
+    ) -> SimMap[K, float]:
+        query_vec = self.embed_func([query])[0]
+        indexed = casebase.keys() <= self.index.positions.keys()
+        complete = indexed and len(casebase) == len(self.index)
+
+        # the limit can only be applied during the search if no candidates are removed afterwards
+        similarities = self.index.search(
+            query_vec,
+            self.probes,
+            self.limit if complete and self.max_similarity is None else None,
+        )
+
+        if not complete:
+            similarities = {
+                key: value for key, value in similarities.items() if key in casebase
+            }
+
+        missing_keys = (
+            [] if indexed else [key for key in casebase if key not in self.index]
+        )
+
+        if missing_keys:
+            missing_vecs = _normalize_rows(
+                self.embed_func([casebase[key] for key in missing_keys])
+            )
+            missing_scores = missing_vecs @ _normalize_rows([query_vec])[0]
+            similarities.update(zip(missing_keys, missing_scores.tolist(), strict=True))
+
+        return self.postprocess(similarities)
+
+
+try:
+    from ..sim.strings import ngram as ngram_sim
+
+    @dataclass(slots=True, frozen=True, eq=False)
+    class NgramIndex[K]:
+        """Inverted index over the interned n-gram sets of the case texts.
+
+        Each distinct n-gram of the casebase is mapped to an integer ID,
+        and each ID to the rows of the cases that contain it.
+        A search only visits the rows of the n-grams that occur in the query
+        and computes the Jaccard similarities of these candidates with a few array operations.
+
+        Args:
+            keys: Case keys in the order of the rows.
+            ngram_func: Similarity function whose n-grams are indexed.
+            vocabulary: Mapping of each n-gram to its ID.
+            sizes: Number of distinct n-grams of each row.
+            gram_offsets: Start of the rows of each n-gram in `gram_rows`, followed by the total number of entries.
+            gram_rows: Rows of all n-grams, grouped by their ID.
+        """
+
+        keys: Sequence[K]
+        ngram_func: ngram_sim
+        vocabulary: Mapping[tuple[str, ...], int]
+        sizes: Any
+        gram_offsets: Any
+        gram_rows: Any
+        positions: dict[K, int] = field(init=False, repr=False)
+
+        def __post_init__(self) -> None:
+            object.__setattr__(
+                self, "positions", {key: idx for idx, key in enumerate(self.keys)}
+            )
+
+        def __len__(self) -> int:
+            return len(self.keys)
+
+        def __contains__(self, key: object) -> bool:
+            return key in self.positions
+
+        @classmethod
+        def build(
+            cls,
+            texts: Mapping[K, str],
+            ngram_func: ngram_sim,
+        ) -> "NgramIndex[K]":
+            """Interns the n-grams of all case texts.
+
+            Args:
+                texts: Text of each case.
+                ngram_func: Similarity function that defines the n-grams.
+            """
+            keys = list(texts.keys())
+            vocabulary: dict[tuple[str, ...], int] = {}
+            row_grams: list[list[int]] = []
+
+            for text in texts.values():
+                row_grams.append(
+                    [
+                        vocabulary.setdefault(gram, len(vocabulary))
+                        for gram in ngram_func.ngrams(text)
+                    ]
+                )
+
+            sizes = np.array([len(grams) for grams in row_grams], dtype=np.int64)
+            grams = np.fromiter(
+                itertools.chain.from_iterable(row_grams),
+                dtype=np.int64,
+                count=int(sizes.sum()),
+            )
+            rows = np.repeat(np.arange(len(keys), dtype=np.int64), sizes)
+            order = np.argsort(grams, kind="stable")
+            gram_offsets = np.searchsorted(
+                grams[order], np.arange(len(vocabulary) + 1), side="left"
+            )
+
+            return cls(keys, ngram_func, vocabulary, sizes, gram_offsets, rows[order])
+
+        def search(self, text: str) -> dict[K, float]:
+            """Computes the Jaccard similarities of the cases that share at least one n-gram with the query text.
+
+            Returns:
+                Similarities of the candidates, all other cases have a similarity of 0.0.
+            """
+            query_grams = self.ngram_func.ngrams(text)
+            gram_ids = [
+                self.vocabulary[gram] for gram in query_grams if gram in self.vocabulary
+            ]
+
+            if not gram_ids:
+                return {}
+
+            rows, overlaps = np.unique(
+                np.concatenate(
+                    [
+                        self.gram_rows[
+                            self.gram_offsets[idx] : self.gram_offsets[idx + 1]
+                        ]
+                        for idx in gram_ids
+                    ]
+                ),
+                return_counts=True,
+            )
+            scores = overlaps / (self.sizes[rows] + len(query_grams) - overlaps)
+
+            return {
+                self.keys[row]: score
+                for row, score in zip(rows.tolist(), scores.tolist(), strict=True)
+            }
+
+    @dataclass(slots=True, frozen=True)
+    class ngram[K, V](base_retriever[K, V, float]):
+        """N-gram retriever based on an `NgramIndex`.
+
+        It computes the same similarities as `cbrkit.sim.strings.ngram`,
+        but the n-grams of the cases are only computed once when building the index.
+        Cases of the casebase that are not part of the index are scored directly,
+        cases of the index that are not part of the casebase are ignored.
+
+        Args:
+            index: Index built over the texts of the casebase.
+            conversion_func: Converts a case or query into the indexed text.
+                If None, the cases and queries have to be strings.
+            candidates_only: If True, only the cases that share at least one n-gram with the query are returned,
+                so that the retriever can generate the candidates for more expensive retrievers.
+                Otherwise, all other cases are returned with a similarity of 0.0.
+            limit: Retriever function will return the top limit cases.
+            min_similarity: Return only cases with a similarity greater or equal than this.
+            max_similarity: Return only cases with a similarity less or equal than this.
+
+        Examples:
+            >>> import cbrkit
+            >>> import polars as pl
+            >>> df = pl.read_csv("./data/cars-1k.csv")
+            >>> casebase = cbrkit.loaders.polars(df)
+            >>> def text(car):
+            ...     return f"{car['manufacturer']} {car['make']}"
+            >>> index = cbrkit.retrieval.NgramIndex.build(
+            ...     {key: text(car) for key, car in casebase.items()},
+            ...     cbrkit.sim.strings.ngram(3),
+            ... )
+            >>> retriever = cbrkit.retrieval.ngram(index, text, candidates_only=True)
+            >>> result = cbrkit.retrieval.apply(casebase, casebase[42], retriever)
+            >>> len(result.ranking), len(casebase)
+            (12, 999)
+            >>> result.similarities[42]
+            1.0
+        """
+
+        index: NgramIndex[K]
+        conversion_func: Callable[[V], str] | None = None
+        candidates_only: bool = False
+
+        @property
+        @override
+        def metadata(self) -> JsonDict:
+            return {
+                **super(ngram, self).metadata,
+                "index_size": len(self.index),
+                "ngram_func": get_metadata(self.index.ngram_func),
+                "conversion_func": get_metadata(self.conversion_func),
+                "candidates_only": self.candidates_only,
+            }
+
+        def _text(self, value: V) -> str:
+            if self.conversion_func is None:
+                return value  # type: ignore[return-value]
+
+            return self.conversion_func(value)
+
+        @override
+        def __call__(
+            self,
+            casebase: Casebase[K, V],
+            query: V,
+            processes: int,
+        ) -> SimMap[K, float]:
+            query_text = self._text(query)
+            similarities = self.index.search(query_text)
+            indexed = casebase.keys() <= self.index.positions.keys()
+
+            if not indexed or len(casebase) != len(self.index):
+                similarities = {
+                    key: value for key, value in similarities.items() if key in casebase
+                }
+
+            missing_keys = (
+                [] if indexed else [key for key in casebase if key not in self.index]
+            )
+
+            if missing_keys:
+                missing_sims = self.index.ngram_func.sim_column(
+                    [self._text(casebase[key]) for key in missing_keys], query_text
+                )
+                similarities.update(
+                    (key, sim)
+                    for key, sim in zip(missing_keys, missing_sims, strict=True)
+                    if sim > 0.0
+                )
+
+            if not self.candidates_only:
+                similarities.update(
+                    (key, 0.0) for key in casebase if key not in similarities
+                )
+
+            return self.postprocess(similarities)
+
+    __all__ += ["NgramIndex", "ngram"]
+
+except ImportError:
+    pass
@@ -1,3 +1,5 @@
+import itertools
+import os
 from collections.abc import Mapping, Sequence
 from dataclasses import asdict, dataclass
 from inspect import signature as inspect_signature
@@ -5,7 +7,8 @@ from multiprocessing import Pool
 from typing import Any, Literal, cast, override
 
 from .helpers import (
-    SimPairWrapper,
+    SimSeqWrapper,
+    WorkerPool,
     get_metadata,
     similarities2ranking,
     unpack_sim,
@@ -116,32 +119,30 @@ class base_reuser[K, V, S: Float](ReuserFunc[K, V, S], SupportsMetadata):
         self, casebase: Casebase[K, tuple[V | None, S]]
     ) -> Casebase[K, tuple[V | None, S]]:
         similarities = {key: sim for key, (_, sim) in casebase.items()}
-        ranking = similarities2ranking(similarities)
-
-        if self.min_similarity is not None:
-            ranking = [
-                key
-                for key in ranking
-                if unpack_sim(similarities[key]) >= self.min_similarity
-            ]
-        if self.max_similarity is not None:
-            ranking = [
-                key
-                for key in ranking
-                if unpack_sim(similarities[key]) <= self.max_similarity
-            ]
+        ranking = similarities2ranking(
+            similarities,
+            limit=self.limit,
+            min_similarity=self.min_similarity,
+            max_similarity=self.max_similarity,
+        )
 
-        return {key: casebase[key] for key in ranking[: self.limit]}
+        return {key: casebase[key] for key in ranking}
 
 
 @dataclass(slots=True, frozen=True)
 class build[K, V, S: Float](base_reuser[K, V, S]):
     """Builds a casebase by adapting cases using an adaptation function and a similarity function.
 
+    The adapted cases are compared to the query in a single batch, so vectorized similarity functions
+    (e.g., `cbrkit.sim.attribute_value`) are evaluated once per reuser instead of once per case.
+    With multiple processes, each worker adapts and scores a chunk of the cases in one task.
+
     Args:
         adaptation_func: The adaptation function that will be applied to the cases.
         similarity_func: The similarity function that will be used to compare the adapted cases to the query.
         max_similarity_decrease: Maximum decrease in similarity allowed for an adapted case.
+            The similarities of the original cases are only computed if they are not passed
+            to `cbrkit.reuse.apply` (e.g., from the preceding retrieval result).
 
     Returns:
         The adapted casebase.
@@ -166,9 +167,19 @@ class build[K, V, S: Float](base_reuser[K, V, S]):
         casebase: Casebase[K, V],
         query: V,
         processes: int,
+        similarities: SimMap[K, Float] | None = None,
     ) -> Casebase[K, tuple[V | None, S]]:
-        sim_func = SimPairWrapper(self.similarity_func)
-        adapted_casebase: dict[K, tuple[V | None, S]] = {}
+        """Adapts the cases and compares them to the query.
+
+        Args:
+            casebase: Cases that will be adapted.
+            query: Query the cases are adapted to.
+            processes: Number of processes for adapting the cases independently.
+            similarities: Similarities of the original cases to the query, computed with `similarity_func`.
+                They are used for `max_similarity_decrease` instead of comparing the original cases again.
+        """
+        if similarities is None:
+            similarities = {}
 
         adaptation_func_signature = inspect_signature(self.adaptation_func)
 
@@ -180,56 +191,167 @@ class build[K, V, S: Float](base_reuser[K, V, S]):
             adaptation_result = adaptation_func(casebase, query)
 
             if isinstance(adaptation_result, tuple):
-                adapted_key, adapted_case = adaptation_result
-                adapted_casebase = {
-                    adapted_key: (adapted_case, sim_func(adapted_case, query))
-                }
-            else:
-                adapted_casebase = {
-                    key: (adapted_case, sim_func(adapted_case, query))
-                    for key, adapted_case in adaptation_result.items()
-                }
+                adaptation_result = dict([adaptation_result])
+
+            keys = list(adaptation_result.keys())
+            results = self._score(
+                [casebase[key] for key in keys]
+                if self.max_similarity_decrease is not None
+                else [],
+                list(adaptation_result.values()),
+                query,
+                [similarities.get(key) for key in keys],
+            )
 
         else:
-            adaptation_func = cast(AdaptPairFunc[V], self.adaptation_func)
+            keys = list(casebase.keys())
+            cases = [casebase[key] for key in keys]
+            retrieved_sims = [similarities.get(key) for key in keys]
 
-            if processes != 1:
+            if processes != 1 and len(keys) > 1:
                 pool_processes = None if processes <= 0 else processes
-                keys = list(casebase.keys())
+                pool_size = pool_processes or os.cpu_count() or 1
+                # a few chunks per process balance the load without sending single cases
+                chunk_size = max(1, -(-len(keys) // (4 * pool_size)))
+                chunks = [
+                    slice(start, start + chunk_size)
+                    for start in range(0, len(keys), chunk_size)
+                ]
 
                 with Pool(pool_processes) as pool:
-                    adapted_cases = pool.starmap(
-                        adaptation_func,
-                        ((casebase[key], query) for key in keys),
-                    )
-                    adapted_sims = pool.starmap(
-                        sim_func,
-                        ((case, query) for case in adapted_cases),
+                    chunk_results = pool.starmap(
+                        _adapt_chunk,
+                        (
+                            (self, cases[chunk], query, retrieved_sims[chunk])
+                            for chunk in chunks
+                        ),
                     )
 
-                adapted_casebase = {
-                    key: (case, sim)
-                    for key, case, sim in zip(
-                        keys, adapted_cases, adapted_sims, strict=True
-                    )
-                }
+                results = list(itertools.chain.from_iterable(chunk_results))
             else:
-                for key, case in casebase.items():
-                    adapted_case = adaptation_func(case, query)
-                    adapted_sim = sim_func(adapted_case, query)
-                    adapted_casebase[key] = adapted_case, adapted_sim
+                results = _adapt_chunk(self, cases, query, retrieved_sims)
+
+        return self.postprocess(dict(zip(keys, results, strict=True)))
+
+    def _score(
+        self,
+        cases: Sequence[V],
+        adapted_cases: Sequence[V],
+        query: V,
+        retrieved_sims: Sequence[Float | None],
+    ) -> list[tuple[V | None, S]]:
+        """Compares the adapted cases and the original cases without known similarities to the query in one batch."""
+        sim_func = SimSeqWrapper(self.similarity_func)
+        pairs = [(case, query) for case in adapted_cases]
+
+        if self.max_similarity_decrease is None:
+            return list(zip(adapted_cases, sim_func(pairs), strict=True))
+
+        missing = [idx for idx, sim in enumerate(retrieved_sims) if sim is None]
+        sims = sim_func(pairs + [(cases[idx], query) for idx in missing])
+        adapted_sims = sims[: len(pairs)]
+        retrieved = list(retrieved_sims)
+
+        for idx, sim in zip(missing, sims[len(pairs) :], strict=True):
+            retrieved[idx] = sim
+
+        return [
+            (
+                None
+                if unpack_sim(adapted_sim)
+                < unpack_sim(cast(Float, retrieved_sim)) - self.max_similarity_decrease
+                else adapted_case,
+                adapted_sim,
+            )
+            for adapted_case, adapted_sim, retrieved_sim in zip(
+                adapted_cases, adapted_sims, retrieved, strict=True
+            )
+        ]
+
+
+def _adapt_chunk[V, S: Float](
+    reuser: build[Any, V, S],
+    cases: Sequence[V],
+    query: V,
+    retrieved_sims: Sequence[Float | None],
+) -> list[tuple[V | None, S]]:
+    """Adapts and scores a chunk of cases, used as a single task for worker processes."""
+    adaptation_func = cast(AdaptPairFunc[V], reuser.adaptation_func)
+    adapted_cases = [adaptation_func(case, query) for case in cases]
+
+    return reuser._score(cases, adapted_cases, query, retrieved_sims)
+
+
+def _is_pairwise(reuser: ReuserFunc[Any, Any, Any]) -> bool:
+    """Check if a reuser adapts each case independently, so that it can be applied to parts of a casebase."""
+
+    return (
+        isinstance(reuser, build)
+        and "casebase" not in inspect_signature(reuser.adaptation_func).parameters
+    )
+
+
+def _reuse_shard[K, V, S: Float](
+    reusers: Sequence[ReuserFunc[K, V, S]],
+    reuser_idx: int,
+    casebase: Casebase[K, V],
+    query: V,
+    similarities: SimMap[K, Float] | None,
+) -> Casebase[K, tuple[V | None, S]]:
+    reuser = reusers[reuser_idx]
+
+    if similarities is not None and isinstance(reuser, build):
+        return reuser(casebase, query, 1, similarities)
 
-        if self.max_similarity_decrease is not None:
-            for key, (_, adapted_sim) in adapted_casebase.items():
-                retrieved_sim = sim_func(casebase[key], query)
+    return reuser(casebase, query, 1)
 
-                if (
-                    unpack_sim(adapted_sim)
-                    < unpack_sim(retrieved_sim) - self.max_similarity_decrease
-                ):
-                    adapted_casebase[key] = (None, adapted_sim)
 
-        return self.postprocess(adapted_casebase)
+def _reuse_pooled[K, V, S: Float](
+    pool: WorkerPool,
+    reusers: Sequence[ReuserFunc[K, V, S]],
+    reuser_idx: int,
+    casebase: Casebase[K, V],
+    query: V,
+    similarities: SimMap[K, Float] | None,
+) -> Casebase[K, tuple[V | None, S]]:
+    items = list(casebase.items())
+    shards = [dict(items[shard]) for shard in pool.slices(len(items))]
+    results = pool.starmap(
+        _reuse_shard,
+        (reusers,),
+        (
+            (
+                reuser_idx,
+                shard,
+                query,
+                None
+                if similarities is None
+                else {key: similarities[key] for key in shard if key in similarities},
+            )
+            for shard in shards
+        ),
+    )
+    adapted_casebase: dict[K, tuple[V | None, S]] = {}
+
+    for result in results:
+        adapted_casebase.update(result)
+
+    reuser = reusers[reuser_idx]
+
+    # limits and thresholds are applied per slice, so they have to be applied again
+    if isinstance(reuser, base_reuser):
+        return reuser.postprocess(adapted_casebase)
+
+    return adapted_casebase
+
+
+def _apply_resident[K, V, S: Float](
+    casebase: Casebase[K, V],
+    reusers: ReuserFunc[K, V, S] | Sequence[ReuserFunc[K, V, S]],
+    query: V,
+    similarities: SimMap[K, Float] | None,
+) -> Result[K, V, S]:
+    return apply(casebase, query, reusers, similarities=similarities)
 
 
 def apply_single[V, S: Float](
@@ -260,6 +382,8 @@ def apply[K, V, S: Float](
     query: V,
     reusers: ReuserFunc[K, V, S] | Sequence[ReuserFunc[K, V, S]],
     processes: int = 1,
+    pool: WorkerPool | None = None,
+    similarities: SimMap[K, Float] | None = None,
 ) -> Result[K, V, S]:
     """Applies a single query to a casebase using reuser functions.
 
@@ -271,9 +395,36 @@ def apply[K, V, S: Float](
             If 1, a regular loop will be used.
             If 0, the number of processes will be equal to the number of CPUs.
             Negative values will be treated as 0.
+        pool: A persistent worker pool that is used instead of creating new processes.
+            The reusers are kept in its workers between calls, so only the cases and the query are sent to them.
+            Reusers that adapt the whole casebase at once are applied in the current process.
+            If given, `processes` is ignored.
+        similarities: Similarities of the cases to the query, usually `similarities` of the preceding retrieval result.
+            They are passed to the first reuser, so that `cbrkit.reuse.build` does not have to compare
+            the original cases again for its `max_similarity_decrease`.
+            They have to be computed with the similarity function of this reuser.
 
     Returns:
         Returns an object of type Result
+
+    Examples:
+        >>> import cbrkit
+        >>> sim_func = cbrkit.sim.numbers.linear(max=10)
+        >>> casebase = {"a": 1, "b": 8}
+        >>> retrieval_result = cbrkit.retrieval.apply(
+        ...     casebase, 5, cbrkit.retrieval.build(sim_func)
+        ... )
+        >>> reuser = cbrkit.reuse.build(
+        ...     lambda case, query: case + 1, sim_func, max_similarity_decrease=0.0
+        ... )
+        >>> result = apply(
+        ...     retrieval_result.casebase,
+        ...     5,
+        ...     reuser,
+        ...     similarities=retrieval_result.similarities,
+        ... )
+        >>> result.casebase
+        {'a': 2, 'b': 8}
     """
 
     if not isinstance(reusers, Sequence):
@@ -282,8 +433,21 @@ def apply[K, V, S: Float](
     steps: list[ResultStep[K, V, S]] = []
     current_casebase = casebase
 
-    for reuser in reusers:
-        reuse_results = reuser(current_casebase, query, processes)
+    for idx, reuser in enumerate(reusers):
+        # the similarities only belong to the original cases
+        step_similarities = similarities if idx == 0 else None
+
+        if pool is not None and _is_pairwise(reuser):
+            reuse_results = _reuse_pooled(
+                pool, reusers, idx, current_casebase, query, step_similarities
+            )
+        elif step_similarities is not None and isinstance(reuser, build):
+            reuse_results = reuser(
+                current_casebase, query, processes, step_similarities
+            )
+        else:
+            reuse_results = reuser(current_casebase, query, processes)
+
         adapted_casebase: dict[K, V] = {}
         adapted_similarities: dict[K, S] = {}
 
@@ -308,6 +472,8 @@ def mapply[QK, CK, V, S: Float](
     reusers: ReuserFunc[CK, V, S] | Sequence[ReuserFunc[CK, V, S]],
     processes: int = 1,
     parallel: Literal["queries", "casebase"] = "queries",
+    pool: WorkerPool | None = None,
+    similarities: Mapping[QK, SimMap[CK, Float]] | None = None,
 ) -> Mapping[QK, Result[CK, V, S]]:
     """Applies multiple queries to a Casebase using reuser functions.
 
@@ -322,24 +488,45 @@ def mapply[QK, CK, V, S: Float](
         parallel: Strategy for parallelization.
             If "queries", each query will be processed in parallel,
             if "casebase" the whole casebase will be processed in parallel.
+        pool: A persistent worker pool that is used instead of creating new processes.
+            The casebase and the reusers are kept in its workers between calls.
+            If given, `processes` is ignored.
+        similarities: Similarities of the cases to each query, usually from the results of `cbrkit.retrieval.mapply`.
+            They are passed to `apply` for the corresponding query.
 
     Returns:
         Returns an object of type Result.
     """
 
-    if processes != 1 and parallel == "queries":
+    if similarities is None:
+        similarities = {}
+
+    if pool is not None and parallel == "queries":
+        keys = list(queries.keys())
+        results = pool.starmap(
+            _apply_resident,
+            (casebase, reusers),
+            ((queries[key], similarities.get(key)) for key in keys),
+        )
+
+        return dict(zip(keys, results, strict=True))
+
+    if pool is None and processes != 1 and parallel == "queries":
         pool_processes = None if processes <= 0 else processes
         keys = list(queries.keys())
 
-        with Pool(pool_processes) as pool:
-            results = pool.starmap(
+        with Pool(pool_processes) as process_pool:
+            results = process_pool.starmap(
                 apply,
-                ((casebase, queries[key], reusers) for key in keys),
+                (
+                    (casebase, queries[key], reusers, 1, None, similarities.get(key))
+                    for key in keys
+                ),
             )
 
         return dict(zip(keys, results, strict=True))
 
     return {
-        key: apply(casebase, value, reusers, processes)
+        key: apply(casebase, value, reusers, processes, pool, similarities.get(key))
         for key, value in queries.items()
     }
@@ -6,12 +6,14 @@ strings (`cbrkit.sim.strings`),
 lists/collections (`cbrkit.sim.collections`),
 and generic data (`cbrkit.sim.generic`),
 there is also a measure for attribute-value data.
-Additionally, the module contains an aggregator to combine multiple local measures into a global score.
+Additionally, the module contains an aggregator to combine multiple local measures into a global score
+and a cache that memoizes the results of expensive measures.
 """
 
 from . import collections, generic, graphs, numbers, strings
 from ._aggregator import PoolingName, aggregator
 from ._attribute_value import AttributeValueSim, attribute_value
+from ._cache import cache
 
 __all__ = [
     "collections",
@@ -21,6 +23,7 @@ __all__ = [
     "attribute_value",
     "graphs",
     "aggregator",
+    "cache",
     "PoolingName",
     "AttributeValueSim",
 ]
@@ -1,9 +1,9 @@
 import statistics
-from collections.abc import Mapping, Sequence
+from collections.abc import Callable, Mapping, Sequence
 from dataclasses import dataclass
-from typing import Literal, override
+from typing import Any, Literal, override
 
-from ..helpers import get_name, unpack_sim
+from ..helpers import get_name, unpack_sim, unpack_sims
 from ..typing import (
     AggregatorFunc,
     Float,
@@ -13,6 +13,11 @@ from ..typing import (
     SupportsMetadata,
 )
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 __all__ = [
     "PoolingName",
     "pooling_funcs",
@@ -48,6 +53,20 @@ pooling_funcs: dict[PoolingName, PoolingFunc] = {
     "sum": sum,
 }
 
+# pooling functions that can be applied to all rows of a similarity matrix at once
+column_pooling_funcs: dict[PoolingName, Callable[[Any], Any]] = (
+    {
+        "mean": lambda x: np.mean(x, axis=0),
+        "fmean": lambda x: np.mean(x, axis=0),
+        "median": lambda x: np.median(x, axis=0),
+        "min": lambda x: np.min(x, axis=0),
+        "max": lambda x: np.max(x, axis=0),
+        "sum": lambda x: np.sum(x, axis=0),
+    }
+    if np is not None
+    else {}
+)
+
 
 @dataclass(slots=True, frozen=True)
 class aggregator[K](AggregatorFunc[K, Float], SupportsMetadata):
@@ -130,3 +149,50 @@ class aggregator[K](AggregatorFunc[K, Float], SupportsMetadata):
             raise NotImplementedError()
 
         return pooling_func(sims) * pooling_factor
+
+    def aggregate_columns(
+        self, similarities: Mapping[K, Sequence[Float]]
+    ) -> list[float]:
+        """Aggregate columns of local similarities, i.e., one column per key and one row per case.
+
+        Common pooling functions are computed for all rows at once with NumPy,
+        the results may thus differ from calling the aggregator per row in the last digit.
+
+        Examples:
+            >>> agg = aggregator("mean", {"a": 1, "b": 3})
+            >>> agg.aggregate_columns({"a": [1.0, 0.0], "b": [0.0, 1.0]})
+            [0.25, 0.75]
+        """
+        keys = list(similarities.keys())
+        rows = len(similarities[keys[0]]) if keys else 0
+
+        if (
+            not isinstance(self.pooling, str)
+            or self.pooling not in column_pooling_funcs
+            or isinstance(self.pooling_weights, Sequence)
+        ):
+            return [
+                self({key: similarities[key][idx] for key in keys})
+                for idx in range(rows)
+            ]
+
+        matrix = np.array(
+            [
+                similarities[key]
+                if rows == 0 or isinstance(similarities[key][0], float | int)
+                else unpack_sims(similarities[key])
+                for key in keys
+            ],
+            dtype=np.float64,
+        )
+        pooling_factor = 1.0
+
+        if self.pooling_weights is not None:
+            weights = [
+                self.pooling_weights.get(key, self.default_pooling_weight)
+                for key in keys
+            ]
+            matrix *= np.array(weights, dtype=np.float64)[:, None]
+            pooling_factor = len(keys) / sum(weights)
+
+        return (column_pooling_funcs[self.pooling](matrix) * pooling_factor).tolist()
@@ -1,17 +1,22 @@
 from collections.abc import Callable, Mapping, Sequence
 from dataclasses import dataclass
-from typing import Any, override
+from typing import Any, cast, override
 
-from ..helpers import SimSeqWrapper, get_metadata
+from ..helpers import LazySimMap, SimColumnWrapper, SimSeqWrapper, get_metadata
+from ..loaders import polars as polars_casebase
+from ..loaders import polars_lazy as polars_lazy_casebase
 from ..typing import (
     AggregatorFunc,
     AnnotatedFloat,
     AnySimFunc,
     Float,
     JsonDict,
+    SimMap,
     SimSeq,
     SimSeqFunc,
     SupportsMetadata,
+    SupportsSimBatch,
+    SupportsSimMap,
 )
 from ._aggregator import aggregator
 
@@ -25,21 +30,134 @@ def default_value_getter(obj: Any, key: Any) -> Any:
         return getattr(obj, key)
 
 
+def _unique_pairs_sims[S: Float](
+    sim_func: SimSeqWrapper[Any, S], pairs: Sequence[tuple[Any, Any]]
+) -> Sequence[S]:
+    """Calls the measure once per distinct pair and scatters the results back."""
+
+    if sim_func.column:
+        return sim_func(pairs)
+
+    try:
+        unique_pairs = list(dict.fromkeys(pairs))
+    except TypeError:
+        return sim_func(pairs)
+
+    if len(unique_pairs) == len(pairs):
+        return sim_func(pairs)
+
+    sims = dict(zip(unique_pairs, sim_func(unique_pairs), strict=True))
+
+    return [sims[pair] for pair in pairs]
+
+
+class _column_sims[S: Float]:
+    """Compares a column of case values to query values, once per distinct case value.
+
+    The distinct values are determined only once, so the column can be compared to many queries.
+    """
+
+    __slots__ = ("func", "inverse", "unique_values", "values")
+
+    func: SimColumnWrapper[Any, S]
+    values: Sequence[Any]
+    unique_values: list[Any] | None
+    inverse: list[int]
+
+    def __init__(self, func: SimColumnWrapper[Any, S], values: Sequence[Any]) -> None:
+        self.func = func
+        self.values = values
+        self.unique_values = None
+        self.inverse = []
+
+        # vectorized measures are faster on the full column
+        if func.column:
+            return
+
+        self.values = list(values)
+
+        try:
+            unique_index = {value: None for value in self.values}
+        except TypeError:
+            return
+
+        if len(unique_index) < len(self.values):
+            self.unique_values = list(unique_index)
+            positions = {value: idx for idx, value in enumerate(self.unique_values)}
+            self.inverse = [positions[value] for value in self.values]
+
+    def __call__(self, y: Any) -> Sequence[S]:
+        if self.unique_values is None:
+            return self.func(self.values, y)
+
+        sims = self.func(self.unique_values, y)
+
+        return [sims[idx] for idx in self.inverse]
+
+
 @dataclass(slots=True, frozen=True)
 class AttributeValueSim[S: Float](AnnotatedFloat):
     value: float
     attributes: Mapping[str, S]
 
 
+class _attribute_value_sim_map[K, S: Float](LazySimMap[K, AttributeValueSim[S]]):
+    """Global similarities of a casebase, the local similarities of a case are only collected on access."""
+
+    __slots__ = ("local_sims", "positions")
+
+    local_sims: Mapping[str, Sequence[S]]
+    positions: dict[K, int] | None
+
+    def __init__(
+        self,
+        keys: Sequence[K],
+        global_sims: Sequence[float],
+        local_sims: Mapping[str, Sequence[S]],
+    ) -> None:
+        super().__init__(dict(zip(keys, global_sims, strict=True)))
+        self.local_sims = local_sims
+        self.positions = None
+
+    @override
+    def __getitem__(self, key: K) -> AttributeValueSim[S]:
+        global_sim = self.floats[key]
+
+        if self.positions is None:
+            self.positions = {key: idx for idx, key in enumerate(self.floats)}
+
+        idx = self.positions[key]
+
+        return AttributeValueSim(
+            global_sim,
+            {attr_name: sims[idx] for attr_name, sims in self.local_sims.items()},
+        )
+
+
 default_aggregator = aggregator()
 
 
 @dataclass(slots=True, frozen=True)
 class attribute_value[V, S: Float](
-    SimSeqFunc[V, AttributeValueSim[S]], SupportsMetadata
+    SimSeqFunc[V, AttributeValueSim[S]],
+    SupportsSimMap[Any, V, AttributeValueSim[S]],
+    SupportsSimBatch[Any, V, AttributeValueSim[S]],
+    SupportsMetadata,
 ):
     """Similarity function that computes the attribute value similarity between two cases.
 
+    If the casebase is a `cbrkit.loaders.polars` dataframe or a lazily read `cbrkit.loaders.polars_lazy` file
+    and the default value getter is used, the similarities are computed column by column:
+    each local measure receives the full column of its attribute (see `cbrkit.typing.SupportsSimColumn`),
+    and the aggregation is performed on the resulting columns (see `cbrkit.sim.aggregator`).
+
+    Local measures without a column implementation are only called once per distinct pair of values,
+    so attributes with few distinct values (e.g., categories) are cheap to compare even for large casebases.
+    When comparing a casebase to multiple queries (see `cbrkit.typing.SupportsSimBatch`),
+    the attribute values of the cases are only extracted once for all queries.
+    The similarities of a casebase are aggregated before any `AttributeValueSim` is built:
+    the returned mapping builds them on access, so ranking only builds them for the retrieved cases.
+
     Args:
         attributes: A mapping of attribute names to the similarity functions to be used for those attributes.
         aggregator: A function that aggregates the local similarity scores for each attribute into a single global similarity.
@@ -89,9 +207,69 @@ class attribute_value[V, S: Float](
                 for x, y in pairs
             ]
             sim_func = SimSeqWrapper(self.attributes[attr_name])
-            sim_func_result = sim_func(attribute_values)
+            sim_func_result = _unique_pairs_sims(sim_func, attribute_values)
 
             for idx, sim in enumerate(sim_func_result):
                 local_sims[idx][attr_name] = sim
 
         return [AttributeValueSim(self.aggregator(sims), sims) for sims in local_sims]
+
+    def _columnar(self, x_map: Mapping[Any, V]) -> bool:
+        return (
+            isinstance(x_map, polars_casebase | polars_lazy_casebase)
+            and self.value_getter is default_value_getter
+        )
+
+    @override
+    def sim_map(
+        self, x_map: Mapping[Any, V], y: V
+    ) -> SimMap[Any, AttributeValueSim[S]]:
+        return self.sim_batch(x_map, [y])[0]
+
+    @override
+    def sim_batch(
+        self, x_map: Mapping[Any, V], ys: Sequence[V]
+    ) -> Sequence[SimMap[Any, AttributeValueSim[S]]]:
+        columnar = self._columnar(x_map)
+        columns: dict[str, _column_sims[S]] = {}
+
+        if columnar:
+            # only the compared attributes are read from lazy casebases
+            df = cast(polars_casebase | polars_lazy_casebase, x_map).select(
+                list(self.attributes)
+            )
+
+            for attr_name, sim_func in self.attributes.items():
+                columns[attr_name] = _column_sims(
+                    SimColumnWrapper(sim_func), df.get_column(attr_name)
+                )
+        else:
+            cases = list(x_map.values())
+
+            for attr_name, sim_func in self.attributes.items():
+                columns[attr_name] = _column_sims(
+                    SimColumnWrapper(sim_func),
+                    [self.value_getter(x, attr_name) for x in cases],
+                )
+
+        keys = list(x_map.keys())
+        results: list[SimMap[Any, AttributeValueSim[S]]] = []
+
+        for y in ys:
+            local_sims = {
+                attr_name: column(self.value_getter(y, attr_name))
+                for attr_name, column in columns.items()
+            }
+
+            if columnar and isinstance(self.aggregator, aggregator):
+                global_sims = self.aggregator.aggregate_columns(local_sims)
+            else:
+                attr_names = list(local_sims.keys())
+                global_sims = [
+                    self.aggregator(dict(zip(attr_names, row, strict=True)))
+                    for row in zip(*local_sims.values(), strict=True)
+                ]
+
+            results.append(_attribute_value_sim_map(keys, global_sims, local_sims))
+
+        return results
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from collections.abc import Hashable, Sequence
+from dataclasses import dataclass, field
+from typing import Any, cast, override
+
+from ..helpers import SimSeqWrapper, get_metadata
+from ..typing import AnySimFunc, Float, JsonDict, SimSeq, SimSeqFunc, SupportsMetadata
+
+__all__ = [
+    "cache",
+]
+
+
+@dataclass(slots=True)
+class cache[V, S: Float](SimSeqFunc[V, S], SupportsMetadata):
+    """Memoizes the results of a similarity function.
+
+    Duplicate pairs within a batch are only passed once to the wrapped function,
+    and the results are kept across calls in a cache that evicts the least recently used pairs.
+    Pairs with unhashable values are always passed to the wrapped function.
+    Only wrap functions whose result depends solely on the two values.
+
+    Args:
+        similarity_func: Pair or sequence similarity function to memoize.
+        maxsize: Maximum number of pairs kept in the cache. If None, the cache is unbounded.
+
+    Examples:
+        >>> calls = []
+        >>> def equality(x, y):
+        ...     calls.append((x, y))
+        ...     return 1.0 if x == y else 0.0
+        >>> sim = cache(equality, maxsize=10)
+        >>> sim([("a", "a"), ("b", "a"), ("a", "a")])
+        [1.0, 0.0, 1.0]
+        >>> sim([("b", "a"), ("c", "a")])
+        [0.0, 0.0]
+        >>> calls
+        [('a', 'a'), ('b', 'a'), ('c', 'a')]
+        >>> sim.hits, sim.misses
+        (2, 3)
+    """
+
+    similarity_func: AnySimFunc[V, S]
+    maxsize: int | None = 100_000
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    _func: SimSeqWrapper[V, S] = field(init=False, repr=False)
+    _store: OrderedDict[Hashable, S] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self._func = SimSeqWrapper(self.similarity_func)
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {
+            "similarity_func": get_metadata(self.similarity_func),
+            "maxsize": self.maxsize,
+            "size": len(self._store),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self) -> None:
+        """Removes all entries from the cache and resets the counters."""
+        self._store.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @override
+    def __call__(self, pairs: Sequence[tuple[V, V]]) -> SimSeq[S]:
+        results: list[Any] = [None] * len(pairs)
+        # indices of all pairs that have to be computed, grouped by their key
+        pending: dict[Hashable, list[int]] = {}
+        unhashable: list[int] = []
+
+        for idx, pair in enumerate(pairs):
+            try:
+                value = self._store.get(pair)
+            except TypeError:
+                unhashable.append(idx)
+                continue
+
+            if value is not None:
+                self._store.move_to_end(pair)
+                results[idx] = value
+                self.hits += 1
+            elif pair in pending:
+                pending[pair].append(idx)
+                self.hits += 1
+            else:
+                pending[pair] = [idx]
+                self.misses += 1
+
+        if pending or unhashable:
+            pending_pairs = cast(list[tuple[V, V]], list(pending.keys()))
+            sims = self._func(pending_pairs + [pairs[idx] for idx in unhashable])
+
+            for pair, sim in zip(pending_pairs, sims, strict=False):
+                self._store[pair] = sim
+
+                for idx in pending[pair]:
+                    results[idx] = sim
+
+            for idx, sim in zip(unhashable, sims[len(pending_pairs) :], strict=True):
+                results[idx] = sim
+
+            if self.maxsize is not None:
+                while len(self._store) > self.maxsize:
+                    self._store.popitem(last=False)
+
+        return results
@@ -1,15 +1,25 @@
+import math
+import warnings
 from collections.abc import Collection, Sequence, Set
 from dataclasses import asdict, dataclass, field
 from itertools import product
 from typing import Any, cast, override
 
-from ..helpers import dist2sim, get_metadata, unpack_sim
-from ..typing import AnnotatedFloat, Float, JsonDict, SimPairFunc, SupportsMetadata
+from ..helpers import SimSeqWrapper, dist2sim, get_metadata, unpack_sim, unpack_sims
+from ..typing import (
+    AnnotatedFloat,
+    AnySimFunc,
+    Float,
+    JsonDict,
+    SimPairFunc,
+    SupportsMetadata,
+)
 
 Number = float | int
 
 __all__ = [
     "isolated_mapping",
+    "mapping",
     "sequence_mapping",
     "sequence_correctness",
     "SequenceSim",
@@ -121,6 +131,108 @@ except ImportError:
     pass
 
 
+def _sim_matrix[V](
+    sim_func: AnySimFunc[V, Float], x: Sequence[V], y: Sequence[V]
+) -> list[list[float]]:
+    """Computes the similarities of all element pairs in one batch, one row per element of x."""
+    if not y:
+        return [[] for _ in x]
+
+    sims = unpack_sims(SimSeqWrapper(sim_func)([(xi, yi) for xi in x for yi in y]))
+
+    return [sims[idx : idx + len(y)] for idx in range(0, len(sims), len(y))]
+
+
+def _hungarian(matrix: Sequence[Sequence[float]]) -> list[tuple[int, int]]:
+    """Solves the maximum-weight assignment problem in O(n²m) with the Hungarian method.
+
+    Each row is assigned to at most one column and vice versa, so min(n, m) pairs are returned.
+
+    Examples:
+        >>> _hungarian([[0.1, 0.9], [0.8, 0.7], [0.2, 0.3]])
+        [(0, 1), (1, 0)]
+    """
+    if not matrix or not matrix[0]:
+        return []
+
+    transposed = len(matrix) > len(matrix[0])
+
+    if transposed:
+        matrix = list(zip(*matrix, strict=True))
+
+    n, m = len(matrix), len(matrix[0])
+    # potentials of rows/columns and the row assigned to each column (1-based, 0 = free)
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+
+        # find a shortest augmenting path from row i to a free column
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = matrix[i0 - 1]
+            delta = math.inf
+            j1 = 0
+
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = -row[j - 1] - u[i0] - v[j]
+
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+
+            j0 = j1
+
+            if p[j0] == 0:
+                break
+
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = sorted((p[j] - 1, j - 1) for j in range(1, m + 1) if p[j])
+
+    if transposed:
+        return sorted((col, row) for row, col in pairs)
+
+    return pairs
+
+
+try:
+    from scipy.optimize import linear_sum_assignment
+
+    def _assignment(matrix: Sequence[Sequence[float]]) -> list[tuple[int, int]]:
+        if not matrix or not matrix[0]:
+            return []
+
+        rows, cols = linear_sum_assignment(matrix, maximize=True)
+
+        return list(zip(rows.tolist(), cols.tolist(), strict=True))
+
+except ImportError:
+    _assignment = _hungarian
+
+
 @dataclass(slots=True, frozen=True)
 class isolated_mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
     """
@@ -129,6 +241,8 @@ class isolated_mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
     and takes the maximum similarity for each element in 'x', then averages
     these maximums.
 
+    The similarities of all element pairs are computed in one batch.
+
     Args:
         element_similarity: A function that takes two elements and returns
         a similarity score between them.
@@ -138,9 +252,11 @@ class isolated_mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
         >>> sim = isolated_mapping(levenshtein())
         >>> sim(["kitten", "sitting"], ["sitting", "fitted"])
         0.8333333333333334
+        >>> sim([], ["sitting"])
+        0.0
     """
 
-    element_similarity: SimPairFunc[V, float]
+    element_similarity: AnySimFunc[V, Float]
 
     @property
     @override
@@ -149,100 +265,74 @@ class isolated_mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
 
     @override
     def __call__(self, x: Sequence[V], y: Sequence[V]) -> float:
-        total_similarity = 0.0
-
-        for xi in x:
-            max_similarity = max(self.element_similarity(xi, yi) for yi in y)
-            total_similarity += max_similarity
-
-        average_similarity = total_similarity / len(x)
+        if not x or not y:
+            return 0.0
 
-        return average_similarity
+        matrix = _sim_matrix(self.element_similarity, x, y)
+        total_similarity = sum(max(row) for row in matrix)
 
+        return total_similarity / len(x)
 
-try:
-    import heapq
 
-    @dataclass(slots=True, frozen=True)
-    class mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
-        """
-        Implements an A* algorithm to find the best matching between query items and case items
-        based on the provided similarity function, maximizing the overall similarity score.
+@dataclass(slots=True, frozen=True)
+class mapping[V](SimPairFunc[Sequence[V], float], SupportsMetadata):
+    """
+    Finds the best one-to-one matching between query items and case items
+    based on the provided similarity function, maximizing the overall similarity score.
 
-        Args:
-            similarity_function: A function that calculates the similarity between two elements.
-            max_queue_size: Maximum size of the priority queue. Defaults to 1000.
+    The similarities of all item pairs are computed in one batch and the optimal assignment
+    is solved in polynomial time (via `scipy.optimize.linear_sum_assignment` if available,
+    otherwise via the Hungarian method).
+    If there are more query items than case items, the unmatched query items contribute a similarity of 0,
+    so the result is the score of the matched items divided by the number of query items.
+    Note that earlier versions (based on a bounded A* search) returned 0.0 in this case.
 
-        Returns:
-            A similarity function for sequences.
+    Args:
+        similarity_function: A function that calculates the similarity between two elements.
+        max_queue_size: Deprecated and ignored since the assignment is solved exactly.
+            Passing a value other than the default emits a `DeprecationWarning`.
 
-        Examples:
-            >>> def example_similarity_function(x: Any, y: Any) -> float:
-            ...     return 1.0 if x == y else 0.0
-            >>> sim_func = mapping(example_similarity_function)
-            >>> result = sim_func(["Monday", "Tuesday", "Wednesday"], ["Monday", "Tuesday", "Sunday"])
-            >>> print(f"Normalized Similarity Score: {result}")
-            Normalized Similarity Score: 0.6666666666666666
-        """
+    Returns:
+        A similarity function for sequences.
 
-        element_similarity: SimPairFunc[V, float]
-        max_queue_size: int = 1000
+    Examples:
+        >>> def example_similarity_function(x: Any, y: Any) -> float:
+        ...     return 1.0 if x == y else 0.0
+        >>> sim_func = mapping(example_similarity_function)
+        >>> result = sim_func(["Monday", "Tuesday", "Wednesday"], ["Monday", "Tuesday", "Sunday"])
+        >>> print(f"Normalized Similarity Score: {result}")
+        Normalized Similarity Score: 0.6666666666666666
+        >>> sim_func(["Monday"], [])
+        0.0
+        >>> sim_func(["Monday", "Tuesday"], ["Monday"])
+        0.5
+    """
 
-        @property
-        @override
-        def metadata(self) -> JsonDict:
-            return {
-                "element_similarity": get_metadata(self.element_similarity),
-                "max_queue_size": self.max_queue_size,
-            }
+    element_similarity: AnySimFunc[V, Float]
+    max_queue_size: int = 1000
 
-        @override
-        def __call__(self, query: Sequence[V], case: Sequence[V]) -> float:
-            # Priority queue to store potential solutions with their scores
-            pq = []
-            initial_solution = (0.0, set(), frozenset(query), frozenset(case))
-            heapq.heappush(pq, initial_solution)
+    def __post_init__(self) -> None:
+        if self.max_queue_size != 1000:
+            warnings.warn(
+                "max_queue_size is ignored since the assignment is solved exactly",
+                DeprecationWarning,
+                stacklevel=3,
+            )
 
-            best_score = 0.0
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {"element_similarity": get_metadata(self.element_similarity)}
 
-            while pq:
-                current_score, current_mapping, remaining_query, remaining_case = (
-                    heapq.heappop(pq)
-                )
+    @override
+    def __call__(self, query: Sequence[V], case: Sequence[V]) -> float:
+        if not query or not case:
+            return 0.0
 
-                if not remaining_query:  # All query items are mapped
-                    best_score = max(best_score, current_score / len(query))
-                    continue  # Continue to process remaining potential mappings
-
-                for query_item in remaining_query:
-                    for case_item in remaining_case:
-                        sim_score = self.element_similarity(query_item, case_item)
-                        new_mapping = current_mapping | {(query_item, case_item)}
-                        new_score = (
-                            current_score + sim_score
-                        )  # Accumulate score correctly
-                        new_remaining_query = remaining_query - {query_item}
-                        new_remaining_case = remaining_case - {case_item}
-
-                        heapq.heappush(
-                            pq,
-                            (
-                                new_score,
-                                new_mapping,
-                                new_remaining_query,
-                                new_remaining_case,
-                            ),
-                        )
-
-                        if len(pq) > self.max_queue_size:
-                            heapq.heappop(pq)
-
-            return best_score
-
-    __all__ += ["mapping"]
+        matrix = _sim_matrix(self.element_similarity, query, case)
+        score = sum(matrix[row][col] for row, col in _assignment(matrix))
 
-except ImportError:
-    pass
+        return score / len(query)
 
 
 @dataclass(slots=True, frozen=True)
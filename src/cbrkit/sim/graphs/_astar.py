@@ -1,18 +1,20 @@
 from __future__ import annotations
 
-import bisect
+import heapq
 import itertools
-import random
-from collections.abc import Iterable, Sequence
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
 from dataclasses import dataclass, field
 from typing import Literal, Protocol, override
 
+import immutables
+
 from cbrkit.helpers import (
     SimSeqWrapper,
     get_metadata,
     unpack_sim,
-    unpack_sims,
 )
+from cbrkit.sim.graphs._common import pair_sims, top_sims
 from cbrkit.sim.graphs._model import (
     DataSimWrapper,
     Edge,
@@ -55,15 +57,51 @@ class HeuristicFunc[K, N, E, G](Protocol):
     ) -> float: ...
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
+class ElementSims[K]:
+    """Similarities of all query/case element pairs of a graph pair, computed once per pair"""
+
+    # keyed by (query element, case element)
+    nodes: dict[tuple[K, K], float]
+    edges: dict[tuple[K, K], float]
+    # best similarity of each query element to any case element
+    max_nodes: dict[K, float]
+    max_edges: dict[K, float]
+    # source and target of each query edge
+    query_endpoints: dict[K, tuple[K, K]]
+    # query edges incident to each query node
+    query_edges: dict[K, list[K]]
+    # best similarity of each query edge to the case edges between two case nodes
+    connected_edges: dict[tuple[K, K, K], float]
+    total_elements: int
+
+    def edge_bound(self, q: K, node_mappings: Mapping[K, K]) -> float:
+        """Best possible similarity of a query edge given the current node mappings"""
+
+        source, target = self.query_endpoints[q]
+        source = node_mappings.get(source)
+        target = node_mappings.get(target)
+
+        # once both endpoints are mapped, only the case edges between them are legal
+        if source is None or target is None:
+            return self.max_edges[q]
+
+        return self.connected_edges.get((q, source, target), 0.0)
+
+
+@dataclass(slots=True, frozen=True)
 class GraphMapping[K, N, E, G]:
-    """Store all mappings and perform integrity checks on them"""
+    """Store all mappings and perform integrity checks on them.
+
+    The mappings are persistent: creating a new mapping returns a new object
+    that shares most of its structure with this one.
+    """
 
     x: Graph[K, N, E, G]
     y: Graph[K, N, E, G]
-    # mappings are from x to y
-    node_mappings: dict[K, K] = field(default_factory=dict)
-    edge_mappings: dict[K, K] = field(default_factory=dict)
+    # mappings are from y (query) to x (case)
+    node_mappings: immutables.Map[K, K] = field(default_factory=immutables.Map)
+    edge_mappings: immutables.Map[K, K] = field(default_factory=immutables.Map)
 
     @property
     def unmapped_nodes(self) -> set[K]:
@@ -110,49 +148,77 @@ class GraphMapping[K, N, E, G]:
     def is_legal_edge_mapping(self, x: K, y: K) -> bool:
         """Check if mapping is legal"""
 
-        return not (
-            self._is_edge_mapped(x)
-            or not self.is_legal_node_mapping(
-                self.y.edges[y].source.key, self.x.edges[x].source.key
-            )
-            or not self.is_legal_node_mapping(
-                self.y.edges[y].target.key, self.x.edges[x].target.key
-            )
+        if self._is_edge_mapped(x):
+            return False
+
+        query_edge = self.y.edges[x]
+        case_edge = self.x.edges[y]
+
+        # the endpoints of the query edge must not be mapped to other case nodes
+        return (
+            self.is_legal_node_mapping(query_edge.source.key, case_edge.source.key)
+            or self._are_nodes_mapped(query_edge.source.key, case_edge.source.key)
+        ) and (
+            self.is_legal_node_mapping(query_edge.target.key, case_edge.target.key)
+            or self._are_nodes_mapped(query_edge.target.key, case_edge.target.key)
         )
 
-    def map(self, x: K, y: K, kind: ElementKind) -> None:
+    def map(self, x: K, y: K, kind: ElementKind) -> GraphMapping[K, N, E, G]:
         """Create a new mapping"""
 
         if kind == "node":
-            self.map_nodes(x, y)
+            return self.map_nodes(x, y)
 
-        elif kind == "edge":
-            self.map_edges(x, y)
+        return self.map_edges(x, y)
 
-    def map_nodes(self, x: K, y: K) -> None:
+    def map_nodes(self, x: K, y: K) -> GraphMapping[K, N, E, G]:
         """Create new node mapping"""
 
-        self.node_mappings[x] = y
+        return GraphMapping(
+            self.x, self.y, self.node_mappings.set(x, y), self.edge_mappings
+        )
 
-    def map_edges(self, x: K, y: K) -> None:
+    def map_edges(self, x: K, y: K) -> GraphMapping[K, N, E, G]:
         """Create new edge mapping"""
 
-        self.edge_mappings[x] = y
+        return GraphMapping(
+            self.x, self.y, self.node_mappings, self.edge_mappings.set(x, y)
+        )
 
 
 @dataclass(slots=True)
 class SearchNode[K, N, E, G]:
-    """Specific search node"""
+    """Specific search node.
+
+    The mapping and the unmapped elements are persistent maps shared with the parent node,
+    so expanding a node does not copy them.
+    The unmapped elements are stored as the keys of a map.
+    """
 
     mapping: GraphMapping[K, N, E, G]
+    sims: ElementSims[K]
+    unmapped_nodes: immutables.Map[K, None]
+    unmapped_edges: immutables.Map[K, None]
+    # sum of the similarities of all mapped elements
+    past_sim: float = 0.0
+    # sum of the best possible similarities of all unmapped elements
+    future_sim: float = 0.0
     f: float = 1.0
-    unmapped_nodes: set[K] = field(init=False)
-    unmapped_edges: set[K] = field(init=False)
 
-    def __post_init__(self) -> None:
-        # Initialize unmapped nodes and edges based on previous mapping
-        self.unmapped_nodes = set(self.y.nodes.keys())
-        self.unmapped_edges = set(self.y.edges.keys())
+    @classmethod
+    def root(
+        cls,
+        mapping: GraphMapping[K, N, E, G],
+        sims: ElementSims[K],
+    ) -> SearchNode[K, N, E, G]:
+        return cls(
+            mapping,
+            sims,
+            immutables.Map(dict.fromkeys(mapping.unmapped_nodes)),
+            immutables.Map(dict.fromkeys(mapping.unmapped_edges)),
+            0.0,
+            sum(sims.max_nodes.values()) + sum(sims.max_edges.values()),
+        )
 
     @property
     def x(self) -> Graph[K, N, E, G]:
@@ -162,12 +228,53 @@ class SearchNode[K, N, E, G]:
     def y(self) -> Graph[K, N, E, G]:
         return self.mapping.y
 
-    def remove_unmapped_element(self, q: K, kind: ElementKind) -> None:
+    @property
+    def total_elements(self) -> int:
+        return self.sims.total_elements
+
+    def expand(self, q: K, c: K | None, kind: ElementKind) -> SearchNode[K, N, E, G]:
+        """Return a child node in which the query element is mapped to the case element.
+
+        If the case element is None, the query element is left unmapped.
+        The costs are updated based on the costs of this node.
+        """
+
+        mapping = self.mapping
+        unmapped_nodes = self.unmapped_nodes
+        unmapped_edges = self.unmapped_edges
+        past_sim = self.past_sim
+
         if kind == "node":
-            self.unmapped_nodes.remove(q)
+            unmapped_nodes = unmapped_nodes.delete(q)
+            future_sim = self.future_sim - self.sims.max_nodes[q]
+
+            if c is not None:
+                mapping = mapping.map_nodes(q, c)
+                past_sim += self.sims.nodes[q, c]
+
+                # the bounds of the incident edges can only become tighter
+                for edge in self.sims.query_edges.get(q, ()):
+                    if edge in unmapped_edges:
+                        bound = self.sims.edge_bound(edge, mapping.node_mappings)
+                        future_sim -= self.sims.max_edges[edge] - bound
+        else:
+            unmapped_edges = unmapped_edges.delete(q)
+            future_sim = self.future_sim - self.sims.edge_bound(
+                q, mapping.node_mappings
+            )
 
-        elif kind == "edge":
-            self.unmapped_edges.remove(q)
+            if c is not None:
+                mapping = mapping.map_edges(q, c)
+                past_sim += self.sims.edges[q, c]
+
+        return SearchNode(
+            mapping,
+            self.sims,
+            unmapped_nodes,
+            unmapped_edges,
+            past_sim,
+            future_sim,
+        )
 
 
 @dataclass(slots=True, frozen=True)
@@ -202,12 +309,32 @@ class astar[K, N, E, G](
         edge_data_sim: A similarity function for graph edges that receives two data objects.
         queue_limit: Limits the queue size which prunes the search space.
             This leads to a faster search and less memory usage but also introduces a similarity error.
+            Once the queue holds twice as many nodes, only the best `queue_limit` nodes are kept.
         future_cost_func: A heuristic function to compute the future costs.
         past_cost_func: A heuristic function to compute the costs of all previous steps.
         select_func: A function to select the next element to map.
 
     Returns:
         The similarity between the query graph and the most similar graph in the casebase.
+
+    Examples:
+        >>> from cbrkit.sim.graphs import model
+        >>> x = model.from_dict({
+        ...     "nodes": {1: {"data": "a"}, 2: {"data": "b"}, 3: {"data": "c"}},
+        ...     "edges": {1: {"source": 1, "target": 2, "data": None}},
+        ...     "data": None,
+        ... })
+        >>> y = model.from_dict({
+        ...     "nodes": {4: {"data": "b"}, 5: {"data": "a"}},
+        ...     "edges": {6: {"source": 5, "target": 4, "data": None}},
+        ...     "data": None,
+        ... })
+        >>> sim = astar(node_data_sim=lambda x, y: 1.0 if x == y else 0.0)
+        >>> result = sim(x, y)
+        >>> result.value
+        1.0
+        >>> result.node_mappings == {4: 2, 5: 1}, result.edge_mappings
+        (True, {6: 1})
     """
 
     node_sim_func: SimSeqFunc[Node[K, N], Float]
@@ -279,15 +406,16 @@ class astar[K, N, E, G](
         self,
         s: SearchNode[K, N, E, G],
     ) -> None | SelectionResult[K]:
+        # the first element is taken instead of a random one, as copying the persistent map is linear in its size
         if s.unmapped_nodes:
             return SelectionResult(
-                query_element=random.choice(tuple(s.unmapped_nodes)),
+                query_element=next(iter(s.unmapped_nodes)),
                 case_candidates=s.x.nodes.keys(),
                 kind="node",
             )
         elif s.unmapped_edges:
             return SelectionResult(
-                query_element=random.choice(tuple(s.unmapped_edges)),
+                query_element=next(iter(s.unmapped_edges)),
                 case_candidates=s.x.edges.keys(),
                 kind="edge",
             )
@@ -298,40 +426,15 @@ class astar[K, N, E, G](
     ) -> float:
         """Heuristic to compute future costs"""
 
-        return (len(s.unmapped_nodes) + len(s.unmapped_edges)) / (
-            len(s.y.nodes) + len(s.y.edges)
-        )
+        return (len(s.unmapped_nodes) + len(s.unmapped_edges)) / s.total_elements
 
     def h2(
         self,
         s: SearchNode[K, N, E, G],
     ) -> float:
-        h_val = 0
-        x, y = s.x, s.y
-
-        for y_name in s.unmapped_nodes:
-            max_sim = max(
-                unpack_sims(
-                    self.node_sim_func(
-                        [(x_node, y.nodes[y_name]) for x_node in (x.nodes.values())]
-                    )
-                )
-            )
-
-            h_val += max_sim
-
-        for y_name in s.unmapped_edges:
-            max_sim = max(
-                unpack_sims(
-                    self.edge_sim_func(
-                        [(x_edge, y.edges[y_name]) for x_edge in x.edges.values()]
-                    )
-                )
-            )
-
-            h_val += max_sim
+        """Heuristic that assumes the best possible similarity for all unmapped elements"""
 
-        return h_val / (len(y.nodes) + len(y.edges))
+        return s.future_sim / s.total_elements
 
     def g1(
         self,
@@ -339,70 +442,187 @@ class astar[K, N, E, G](
     ) -> float:
         """Function to compute the costs of all previous steps"""
 
-        node_sims = self.node_sim_func(
-            [(s.x.nodes[x], s.y.nodes[y]) for x, y in s.mapping.node_mappings.items()]
-        )
+        return s.past_sim / s.total_elements
+
+    def element_sims[CK](
+        self,
+        x_map: Mapping[CK, Graph[K, N, E, G]],
+        y: Graph[K, N, E, G],
+    ) -> dict[CK, ElementSims[K]]:
+        """Compute the similarities of all node and edge pairs between the query and each case graph.
+
+        The pairs of all case graphs are computed in one batch each,
+        and nodes/edges with identical data are only compared once if data similarity functions are used.
+        """
 
-        edge_sims = self.edge_sim_func(
-            [(s.x.edges[x], s.y.edges[y]) for x, y in s.mapping.edge_mappings.items()]
+        node_sims = pair_sims(
+            self.node_sim_func,
+            {key: x.nodes for key, x in x_map.items()},
+            y.nodes,
         )
 
-        all_sims = unpack_sims(itertools.chain(node_sims, edge_sims))
-        total_elements = len(s.y.nodes) + len(s.y.edges)
+        # the default edge similarity only depends on the already computed node similarities
+        if isinstance(self.edge_sim_func, default_edge_sim):
+            edge_sims = {
+                key: {
+                    (q, c): 0.5
+                    * (
+                        node_sims[key][y.edges[q].source.key, x.edges[c].source.key]
+                        + node_sims[key][y.edges[q].target.key, x.edges[c].target.key]
+                    )
+                    for q, c in itertools.product(y.edges.keys(), x.edges.keys())
+                }
+                for key, x in x_map.items()
+            }
+        else:
+            edge_sims = pair_sims(
+                self.edge_sim_func,
+                {key: x.edges for key, x in x_map.items()},
+                y.edges,
+            )
+
+        return {
+            key: self._element_sims(x, y, node_sims[key], edge_sims[key])
+            for key, x in x_map.items()
+        }
 
-        return sum(all_sims) / total_elements
+    def _element_sims(
+        self,
+        x: Graph[K, N, E, G],
+        y: Graph[K, N, E, G],
+        node_sims: dict[tuple[K, K], float],
+        edge_sims: dict[tuple[K, K], float],
+    ) -> ElementSims[K]:
+        max_nodes = dict.fromkeys(y.nodes.keys(), 0.0)
+        max_edges = dict.fromkeys(y.edges.keys(), 0.0)
+
+        for (q, _), sim in node_sims.items():
+            max_nodes[q] = max(max_nodes[q], sim)
+
+        for (q, _), sim in edge_sims.items():
+            max_edges[q] = max(max_edges[q], sim)
+
+        query_endpoints = {
+            key: (edge.source.key, edge.target.key) for key, edge in y.edges.items()
+        }
+        query_edges: dict[K, list[K]] = defaultdict(list)
+        connected_edges: dict[tuple[K, K, K], float] = {}
+
+        for key, edge in y.edges.items():
+            query_edges[edge.source.key].append(key)
+
+            if edge.target.key != edge.source.key:
+                query_edges[edge.target.key].append(key)
+
+        for (q, c), sim in edge_sims.items():
+            key = (q, x.edges[c].source.key, x.edges[c].target.key)
+            connected_edges[key] = max(connected_edges.get(key, 0.0), sim)
+
+        return ElementSims(
+            node_sims,
+            edge_sims,
+            max_nodes,
+            max_edges,
+            query_endpoints,
+            dict(query_edges),
+            connected_edges,
+            len(y.nodes) + len(y.edges),
+        )
 
     def _expand(
         self,
-        q: list[SearchNode[K, N, E, G]],
+        s: SearchNode[K, N, E, G],
     ) -> list[SearchNode[K, N, E, G]]:
-        """Expand a given node and its queue"""
+        """Expand a given node into its children"""
 
-        s = q[-1]
-        mapped = False
         selection = self.select_func(s)
 
-        if selection:
-            for case_element in selection.case_candidates:
-                if s.mapping.is_legal_mapping(
-                    selection.query_element, case_element, selection.kind
-                ):
-                    s_new = SearchNode(s.mapping)
-                    s_new.mapping.map(
-                        selection.query_element, case_element, selection.kind
-                    )
-                    s_new.remove_unmapped_element(
-                        selection.query_element, selection.kind
-                    )
-                    s_new.f = self.past_cost_func(s_new) + self.future_cost_func(s_new)
-                    bisect.insort(q, s_new, key=lambda x: x.f)
-                    mapped = True
+        if not selection:
+            return []
 
-            if mapped:
-                q.remove(s)
-            else:
-                s.remove_unmapped_element(selection.query_element, selection.kind)
+        children = [
+            s.expand(selection.query_element, case_element, selection.kind)
+            for case_element in selection.case_candidates
+            if s.mapping.is_legal_mapping(
+                selection.query_element, case_element, selection.kind
+            )
+        ]
 
-        return q[len(q) - self.queue_limit :] if self.queue_limit > 0 else q
+        # if the element cannot be mapped, it is skipped
+        if not children:
+            children.append(s.expand(selection.query_element, None, selection.kind))
 
-    @override
-    def __call__(
+        for child in children:
+            child.f = self.past_cost_func(child) + self.future_cost_func(child)
+
+        return children
+
+    def search(
         self,
         x: Graph[K, N, E, G],
         y: Graph[K, N, E, G],
+        sims: ElementSims[K],
     ) -> GraphSim[K]:
-        """Perform an A* analysis of the x base and the y"""
+        """Perform an A* search based on the precomputed similarities of the graph pair"""
+
+        s = SearchNode.root(GraphMapping(x, y), sims)
+        counter = itertools.count()
+        # max-heap on f, ties are resolved in favor of the most recent node
+        q: list[tuple[float, int, SearchNode[K, N, E, G]]] = [(-s.f, 0, s)]
+
+        while q:
+            s = heapq.heappop(q)[2]
 
-        s0 = SearchNode(GraphMapping(x, y))
-        q = [s0]
+            if not (s.unmapped_nodes or s.unmapped_edges):
+                break
 
-        while q[-1].unmapped_nodes or q[-1].unmapped_edges:
-            q = self._expand(q)
+            for child in self._expand(s):
+                heapq.heappush(q, (-child.f, -next(counter), child))
 
-        result = q[-1]
+            # pruning is amortized by only doing it once the limit is exceeded twofold
+            if self.queue_limit > 0 and len(q) > 2 * self.queue_limit:
+                q = heapq.nsmallest(self.queue_limit, q)
 
         return GraphSim(
-            self.past_cost_func(result),
-            result.mapping.node_mappings,
-            result.mapping.edge_mappings,
+            self.past_cost_func(s),
+            dict(s.mapping.node_mappings),
+            dict(s.mapping.edge_mappings),
         )
+
+    def sim_top[CK](
+        self,
+        x_map: Mapping[CK, Graph[K, N, E, G]],
+        y: Graph[K, N, E, G],
+        limit: int | None,
+        processes: int,
+    ) -> dict[CK, GraphSim[K]]:
+        """Compare the query to all case graphs, but only search the graphs that can be among the `limit` most similar ones.
+
+        The estimate of the root search node serves as upper bound of the similarity of a graph.
+        """
+
+        sims = self.element_sims(x_map, y)
+        bounds: dict[CK, float] = {}
+
+        for key, x in x_map.items():
+            root = SearchNode.root(GraphMapping(x, y), sims[key])
+            bounds[key] = self.past_cost_func(root) + self.future_cost_func(root)
+
+        return top_sims(x_map, y, sims, bounds, self.search, limit, processes)
+
+    def sim_map[CK](
+        self,
+        x_map: Mapping[CK, Graph[K, N, E, G]],
+        y: Graph[K, N, E, G],
+    ) -> dict[CK, GraphSim[K]]:
+        return self.sim_top(x_map, y, None, 1)
+
+    @override
+    def __call__(
+        self,
+        x: Graph[K, N, E, G],
+        y: Graph[K, N, E, G],
+    ) -> GraphSim[K]:
+        """Perform an A* analysis of the x base and the y"""
+
+        return self.search(x, y, self.element_sims({None: x}, y)[None])
@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import os
+from collections.abc import Callable, Hashable, Mapping
+from multiprocessing import Pool
+from typing import Any
+
+from cbrkit.helpers import unpack_sim, unpack_sims
+from cbrkit.typing import Float, SimSeqFunc
+
+from ._model import DataSimWrapper, HasData
+
+
+def pair_sims[CK, K, T: HasData[Any]](
+    sim_func: SimSeqFunc[T, Float],
+    cases: Mapping[CK, Mapping[K, T]],
+    query: Mapping[K, T],
+) -> dict[CK, dict[tuple[K, K], float]]:
+    """Computes the similarities between all query elements and the elements of all cases in one batch.
+
+    The results are keyed by (query element, case element).
+    If the similarity function only compares the data of the elements,
+    each pair of query element and (hashable) case data is only computed once across all cases.
+    """
+
+    by_data = isinstance(sim_func, DataSimWrapper)
+    representatives: dict[Hashable, T] = {}
+    idents: dict[CK, dict[K, Hashable]] = {}
+
+    for case_key, elements in cases.items():
+        case_idents: dict[K, Hashable] = {}
+
+        for key, element in elements.items():
+            ident: Hashable = ("element", case_key, key)
+
+            if by_data:
+                try:
+                    hash(element.data)
+                    ident = ("data", element.data)
+                except TypeError:
+                    pass
+
+            case_idents[key] = ident
+            representatives.setdefault(ident, element)
+
+        idents[case_key] = case_idents
+
+    pairs = list(itertools.product(query.keys(), representatives.keys()))
+    sims = unpack_sims(
+        sim_func([(representatives[ident], query[key]) for key, ident in pairs])
+    )
+    table = dict(zip(pairs, sims, strict=True))
+
+    return {
+        case_key: {
+            (query_key, key): table[query_key, ident]
+            for query_key in query
+            for key, ident in case_idents.items()
+        }
+        for case_key, case_idents in idents.items()
+    }
+
+
+def top_sims[K, V, T, S: Float](
+    x_map: Mapping[K, V],
+    y: V,
+    states: Mapping[K, T],
+    bounds: Mapping[K, float],
+    search: Callable[[V, V, T], S],
+    limit: int | None,
+    processes: int,
+) -> dict[K, S]:
+    """Runs an expensive search for the cases in descending order of their upper bounds.
+
+    Once `limit` cases have been scored, the remaining cases whose upper bound
+    is lower than the worst of the `limit` best similarities are skipped.
+    With multiple processes, the cases are sent to a process pool in rounds,
+    so that the threshold can be updated between rounds.
+
+    The skipped cases are omitted from the result, as they cannot be among the `limit` best cases
+    (cases whose bound equals the threshold are still scored).
+    The scored cases are returned in the order of `x_map`,
+    so that ties are broken in the same way as when scoring all cases.
+
+    Args:
+        x_map: Case graphs.
+        y: Query graph.
+        states: Precomputed state of each case that is passed to the search.
+        bounds: Upper bound of the similarity of each case.
+        search: Computes the similarity of a case given its state.
+        limit: Number of most similar cases that are needed. If None, all cases are scored.
+        processes: Number of processes. If 1, the cases are scored sequentially.
+            Values of 0 or less use all CPUs.
+    """
+
+    order = sorted(x_map.keys(), key=lambda key: bounds[key], reverse=True)
+    results: dict[K, S] = {}
+    # min-heap of the best similarities found so far
+    best: list[float] = []
+    pool_size = (
+        1 if processes == 1 else processes if processes > 0 else os.cpu_count() or 1
+    )
+    round_size = 1 if pool_size == 1 else 4 * pool_size
+    pool = Pool(pool_size) if pool_size > 1 else None
+
+    try:
+        idx = 0
+
+        while idx < len(order):
+            threshold = best[0] if limit and len(best) >= limit else float("-inf")
+            keys = [
+                key for key in order[idx : idx + round_size] if bounds[key] >= threshold
+            ]
+
+            # the cases are sorted by their bounds, so all remaining ones can be skipped
+            if not keys:
+                break
+
+            idx += round_size
+            args = [(x_map[key], y, states[key]) for key in keys]
+            sims = (
+                pool.starmap(search, args)
+                if pool is not None
+                else [search(*arg) for arg in args]
+            )
+
+            for key, sim in zip(keys, sims, strict=True):
+                results[key] = sim
+                value = unpack_sim(sim)
+
+                if not limit:
+                    continue
+
+                if len(best) < limit:
+                    heapq.heappush(best, value)
+                elif value > best[0]:
+                    heapq.heapreplace(best, value)
+
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return {key: results[key] for key in x_map.keys() if key in results}
@@ -1,8 +1,8 @@
-from collections.abc import Callable
+from collections.abc import Callable, Mapping
 from dataclasses import dataclass
 from typing import Any, override
 
-from cbrkit.helpers import SimSeqWrapper
+from cbrkit.helpers import SimSeqWrapper, unpack_sim
 from cbrkit.typing import (
     AggregatorFunc,
     AnySimFunc,
@@ -13,6 +13,7 @@ from cbrkit.typing import (
 )
 
 from . import _model as model
+from ._common import pair_sims, top_sims
 from ._model import DataSimWrapper, Graph, GraphSim, Node
 
 
@@ -59,12 +60,14 @@ class isomorphism[K, N, E, G](
         self.edge_matcher = edge_matcher
         self.aggregator = aggregator
 
-    @override
-    def __call__(
+    def search(
         self,
         x: Graph[K, N, E, G],
         y: Graph[K, N, E, G],
+        node_sims: Mapping[tuple[K, K], float],
     ) -> GraphSim[K]:
+        """Find the best isomorphism based on the precomputed node similarities of the graph pair"""
+
         import rustworkx
 
         x_rw, x_lookup = model.to_rustworkx_with_lookup(x)
@@ -86,15 +89,14 @@ class isomorphism[K, N, E, G](
         if len(node_mappings) == 0:
             return GraphSim(0.0, node_mappings={}, edge_mappings={})
 
-        mapping_similarities: list[float] = []
-
-        for node_mapping in node_mappings:
-            node_pairs = [
-                (x.nodes[x_key], y.nodes[y_key])
-                for y_key, x_key in node_mapping.items()
-            ]
-            node_similarities = self.node_sim_func(node_pairs)
-            mapping_similarities.append(self.aggregator(node_similarities))
+        mapping_similarities: list[float] = [
+            unpack_sim(
+                self.aggregator(
+                    [node_sims[y_key, x_key] for y_key, x_key in node_mapping.items()]
+                )
+            )
+            for node_mapping in node_mappings
+        ]
 
         best_mapping_id, best_sim = max(
             enumerate(mapping_similarities),
@@ -103,3 +105,54 @@ class isomorphism[K, N, E, G](
         best_mapping = node_mappings[best_mapping_id]
 
         return GraphSim(best_sim, node_mappings=best_mapping, edge_mappings={})
+
+    def sim_top[CK](
+        self,
+        x_map: Mapping[CK, Graph[K, N, E, G]],
+        y: Graph[K, N, E, G],
+        limit: int | None,
+        processes: int,
+    ) -> dict[CK, GraphSim[K]]:
+        """Compare the query to all case graphs, but only search the graphs that can be among the `limit` most similar ones.
+
+        A graph that has fewer nodes or edges than the query cannot contain it and has a similarity of 0.
+        Otherwise, the aggregated best similarities of the query nodes serve as upper bound,
+        which assumes that the aggregator is monotonic.
+        """
+
+        node_sims = pair_sims(
+            self.node_sim_func,
+            {key: x.nodes for key, x in x_map.items()},
+            y.nodes,
+        )
+        bounds: dict[CK, float] = {}
+
+        for key, x in x_map.items():
+            if len(x.nodes) < len(y.nodes) or len(x.edges) < len(y.edges):
+                bounds[key] = 0.0
+            elif len(x.nodes) == 0 or len(y.nodes) == 0:
+                bounds[key] = 1.0
+            else:
+                best_sims = dict.fromkeys(y.nodes.keys(), 0.0)
+
+                for (y_key, _), sim in node_sims[key].items():
+                    best_sims[y_key] = max(best_sims[y_key], sim)
+
+                bounds[key] = unpack_sim(self.aggregator(list(best_sims.values())))
+
+        return top_sims(x_map, y, node_sims, bounds, self.search, limit, processes)
+
+    def sim_map[CK](
+        self,
+        x_map: Mapping[CK, Graph[K, N, E, G]],
+        y: Graph[K, N, E, G],
+    ) -> dict[CK, GraphSim[K]]:
+        return self.sim_top(x_map, y, None, 1)
+
+    @override
+    def __call__(
+        self,
+        x: Graph[K, N, E, G],
+        y: Graph[K, N, E, G],
+    ) -> GraphSim[K]:
+        return self.sim_map({None: x}, y)[None]
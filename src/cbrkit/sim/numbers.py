@@ -1,16 +1,43 @@
 import math
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
-from typing import override
+from typing import Any, override
 
-from ..typing import SimPairFunc, SupportsMetadata
+from ..typing import SimPairFunc, SimSeq, SupportsMetadata, SupportsSimColumn
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 type Number = float | int
 
 __all__ = ["linear_interval", "linear", "threshold", "exponential", "sigmoid"]
 
 
+def _eval_column(
+    func: SimPairFunc[Number, float],
+    xs: Sequence[Number],
+    y: Number,
+    kernel: Callable[[Any], Any],
+) -> list[float]:
+    """Apply a NumPy kernel to a column of case values.
+
+    The kernel receives the case values as a float array.
+    Results of exponential kernels may differ from `math.exp` in the last digit.
+    Without NumPy, the pair function is applied to each value instead.
+    """
+
+    if np is None:
+        return [func(x, y) for x in xs]
+
+    return kernel(np.asarray(xs, dtype=np.float64)).tolist()
+
+
 @dataclass(slots=True, frozen=True)
-class linear_interval(SimPairFunc[Number, float], SupportsMetadata):
+class linear_interval(
+    SimPairFunc[Number, float], SupportsSimColumn[Number, float], SupportsMetadata
+):
     """Linear similarity function based on the distance between two values within a range.
 
     Args:
@@ -21,6 +48,8 @@ class linear_interval(SimPairFunc[Number, float], SupportsMetadata):
         >>> sim = linear_interval(1950, 2000)
         >>> sim(1950, 1975)
         0.5
+        >>> sim.sim_column([1950, 1975, 2010], 1975)
+        [0.5, 1.0, 0.0]
     """
 
     min: float
@@ -33,9 +62,27 @@ class linear_interval(SimPairFunc[Number, float], SupportsMetadata):
 
         return 1.0 - abs(x - y) / (self.max - self.min)
 
+    @override
+    def sim_column(self, xs: Sequence[Number], y: Number) -> SimSeq[float]:
+        if y < self.min or y > self.max:
+            return [0.0] * len(xs)
+
+        return _eval_column(
+            self,
+            xs,
+            y,
+            lambda x: np.where(
+                (x >= self.min) & (x <= self.max),
+                1.0 - np.abs(x - y) / (self.max - self.min),
+                0.0,
+            ),
+        )
+
 
 @dataclass(slots=True, frozen=True)
-class linear(SimPairFunc[Number, float], SupportsMetadata):
+class linear(
+    SimPairFunc[Number, float], SupportsSimColumn[Number, float], SupportsMetadata
+):
     """Linear similarity function based on the distance between two values.
 
     Args:
@@ -48,6 +95,8 @@ class linear(SimPairFunc[Number, float], SupportsMetadata):
         >>> sim = linear(100)
         >>> sim(50, 60)
         0.9
+        >>> sim.sim_column([50, 60, 200], 60)
+        [0.9, 1.0, 0.0]
     """
 
     max: float
@@ -64,9 +113,23 @@ class linear(SimPairFunc[Number, float], SupportsMetadata):
 
         return (self.max - dist) / (self.max - self.min)
 
+    @override
+    def sim_column(self, xs: Sequence[Number], y: Number) -> SimSeq[float]:
+        # distances below min/above max are clipped to 1.0/0.0
+        return _eval_column(
+            self,
+            xs,
+            y,
+            lambda x: np.clip(
+                (self.max - np.abs(x - y)) / (self.max - self.min), 0.0, 1.0
+            ),
+        )
+
 
 @dataclass(slots=True, frozen=True)
-class threshold(SimPairFunc[Number, float], SupportsMetadata):
+class threshold(
+    SimPairFunc[Number, float], SupportsSimColumn[Number, float], SupportsMetadata
+):
     """Threshold similarity function.
 
     Args:
@@ -80,6 +143,8 @@ class threshold(SimPairFunc[Number, float], SupportsMetadata):
         1.0
         >>> sim(50, 61)
         0.0
+        >>> sim.sim_column([60, 61], 50)
+        [1.0, 0.0]
     """
 
     value: float
@@ -88,9 +153,17 @@ class threshold(SimPairFunc[Number, float], SupportsMetadata):
     def __call__(self, x: Number, y: Number) -> float:
         return 1.0 if abs(x - y) <= self.value else 0.0
 
+    @override
+    def sim_column(self, xs: Sequence[Number], y: Number) -> SimSeq[float]:
+        return _eval_column(
+            self, xs, y, lambda x: np.where(np.abs(x - y) <= self.value, 1.0, 0.0)
+        )
+
 
 @dataclass(slots=True, frozen=True)
-class exponential(SimPairFunc[Number, float], SupportsMetadata):
+class exponential(
+    SimPairFunc[Number, float], SupportsSimColumn[Number, float], SupportsMetadata
+):
     """Exponential similarity function.
 
     Args:
@@ -102,6 +175,8 @@ class exponential(SimPairFunc[Number, float], SupportsMetadata):
         >>> sim = exponential(0.1)
         >>> sim(50, 60)
         0.36787944117144233
+        >>> sim.sim_column([50, 60], 60)
+        [0.36787944117144233, 1.0]
     """
 
     alpha: float = 1.0
@@ -110,9 +185,15 @@ class exponential(SimPairFunc[Number, float], SupportsMetadata):
     def __call__(self, x: Number, y: Number) -> float:
         return math.exp(-self.alpha * abs(x - y))
 
+    @override
+    def sim_column(self, xs: Sequence[Number], y: Number) -> SimSeq[float]:
+        return _eval_column(self, xs, y, lambda x: np.exp(-self.alpha * np.abs(x - y)))
+
 
 @dataclass(slots=True, frozen=True)
-class sigmoid(SimPairFunc[Number, float], SupportsMetadata):
+class sigmoid(
+    SimPairFunc[Number, float], SupportsSimColumn[Number, float], SupportsMetadata
+):
     """Sigmoid similarity function.
 
     Args:
@@ -127,6 +208,8 @@ class sigmoid(SimPairFunc[Number, float], SupportsMetadata):
         0.5
         >>> sim(50, 58)
         0.8807970779778823
+        >>> sim.sim_column([60, 58], 50)
+        [0.5, 0.8807970779778823]
     """
 
     alpha: float = 1.0
@@ -135,3 +218,12 @@ class sigmoid(SimPairFunc[Number, float], SupportsMetadata):
     @override
     def __call__(self, x: Number, y: Number) -> float:
         return 1.0 / (1.0 + math.exp((abs(x - y) - self.theta) / self.alpha))
+
+    @override
+    def sim_column(self, xs: Sequence[Number], y: Number) -> SimSeq[float]:
+        return _eval_column(
+            self,
+            xs,
+            y,
+            lambda x: 1.0 / (1.0 + np.exp((np.abs(x - y) - self.theta) / self.alpha)),
+        )
@@ -2,15 +2,21 @@
 **Please note:** Taxonomy-based similarities are available in the `cbrkit.sim.strings.taxonomy` module.
 """
 
+import asyncio
 import csv
 import fnmatch
 import itertools
+import os
 import re
-from collections.abc import Callable, Mapping, Sequence
+from collections.abc import Awaitable, Callable, Mapping, Sequence
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Literal, cast, override
+from typing import Any, Literal, override
 
+import polars as pl
+
+from ...helpers import get_metadata
 from ...typing import (
     FilePath,
     JsonDict,
@@ -18,39 +24,149 @@ from ...typing import (
     SimSeq,
     SimSeqFunc,
     SupportsMetadata,
+    SupportsSimColumn,
 )
 from ..generic import static_table
-from . import taxonomy
+from . import embeddings, taxonomy
+from .embeddings import EmbeddingStore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 __all__ = [
     "table",
     "taxonomy",
+    "embeddings",
+    "fake_embedding",
     "ngram",
     "regex",
     "glob",
 ]
 
 
-def _cosine(u, v) -> float:
-    """Cosine similarity between two vectors
+def _cosine(pairs: Sequence[tuple[str, str]], vecs: Mapping[str, Any]) -> list[float]:
+    """Cosine similarities of the given text pairs
+
+    The case and query vectors are stacked into two normalized float32 matrices,
+    so all pairs are scored with a single matrix product instead of one call per pair.
 
     Args:
-        u: First vector
-        v: Second vector
+        pairs: Text pairs to score
+        vecs: Vectors of all texts contained in the pairs
     """
-    import numpy as np
-    import scipy.spatial.distance as scipy_dist
+    x_index = {text: idx for idx, text in enumerate(dict.fromkeys(x for x, _ in pairs))}
+    y_index = {text: idx for idx, text in enumerate(dict.fromkeys(y for _, y in pairs))}
+
+    x_matrix = embeddings.normalize([vecs[text] for text in x_index])
+    y_matrix = embeddings.normalize([vecs[text] for text in y_index])
+
+    # scoring every case against every query only pays off if most combinations are requested
+    if len(x_index) * len(y_index) <= 4 * len(pairs):
+        scores = embeddings.cosine(x_matrix, y_matrix, normalized=True)
+
+        return [float(scores[x_index[x], y_index[y]]) for x, y in pairs]
 
-    if np.any(u) and np.any(v):
-        return 1 - cast(float, scipy_dist.cosine(u, v))
+    x_rows = x_matrix[[x_index[x] for x, _ in pairs]]
+    y_rows = y_matrix[[y_index[y] for _, y in pairs]]
 
-    return 0.0
+    return (x_rows * y_rows).sum(axis=1).tolist()
 
 
 def _unique_items(pairs: Sequence[tuple[str, str]]) -> list[str]:
     return [*{*itertools.chain.from_iterable(pairs)}]
 
 
+@dataclass(slots=True)
+class _case_matrix:
+    """Normalized matrix of the case texts of the last call with a single query.
+
+    Retrieval compares the same cases to many queries, so the case vectors are only
+    looked up, stacked, and normalized for the first query.
+    Afterwards, a query costs one embedding plus one matrix-vector product.
+    The matrix is not pickled, so it is not sent to worker processes.
+    """
+
+    entry: tuple[tuple[str, ...], Any, Any] | None = None
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_case_matrix, ())
+
+    def _lookup(
+        self, pairs: Sequence[tuple[str, str]]
+    ) -> tuple[
+        tuple[str, ...] | None, tuple[tuple[str, ...], Any, Any] | None, list[str]
+    ]:
+        """Determines the texts that have to be embedded.
+
+        Returns:
+            The case texts if all pairs share one query (otherwise None),
+            the cached entry if it belongs to these texts, and the texts to embed.
+        """
+        query = pairs[0][1]
+
+        if not all(y == query for _, y in pairs):
+            return None, None, _unique_items(pairs)
+
+        texts = tuple(x for x, _ in pairs)
+        entry = self.entry
+
+        if entry is not None and entry[0] == texts:
+            return texts, entry, [query]
+
+        return texts, None, [*dict.fromkeys(texts), query]
+
+    def _scores(
+        self,
+        pairs: Sequence[tuple[str, str]],
+        texts: tuple[str, ...] | None,
+        entry: tuple[tuple[str, ...], Any, Any] | None,
+        vecs: Mapping[str, Any],
+    ) -> list[float]:
+        if texts is None:
+            return _cosine(pairs, vecs)
+
+        if entry is None:
+            index = {text: idx for idx, text in enumerate(dict.fromkeys(texts))}
+            matrix = embeddings.normalize([vecs[text] for text in index])
+            rows = np.fromiter((index[text] for text in texts), np.intp, len(texts))
+            entry = (texts, matrix, rows)
+            self.entry = entry
+
+        _, matrix, rows = entry
+        query_vec = embeddings.normalize([vecs[pairs[0][1]]])[0]
+
+        return (matrix @ query_vec)[rows].tolist()
+
+    def cosine(
+        self,
+        pairs: Sequence[tuple[str, str]],
+        embed: Callable[[Sequence[str]], Mapping[str, Any]],
+    ) -> list[float]:
+        """Cosine similarities of the given text pairs, the vectors are computed by `embed`."""
+        if not pairs:
+            return []
+
+        texts, entry, pending = self._lookup(pairs)
+
+        return self._scores(pairs, texts, entry, embed(pending))
+
+    async def cosine_async(
+        self,
+        pairs: Sequence[tuple[str, str]],
+        embed: Callable[[Sequence[str]], Awaitable[Mapping[str, Any]]],
+    ) -> list[float]:
+        """Same as `cosine`, but the vectors are computed asynchronously."""
+        if not pairs:
+            return []
+
+        # the entry is determined before awaiting, concurrent calls may replace it in the meantime
+        texts, entry, pending = self._lookup(pairs)
+
+        return self._scores(pairs, texts, entry, await embed(pending))
+
+
 try:
     from spacy import load as spacy_load
     from spacy.language import Language
@@ -62,31 +178,44 @@ try:
         Args:
             model: Either the name of a [spaCy model](https://spacy.io/usage/models)
                 or a `spacy.Language` model instance.
+            store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
         """
 
         model: Language
+        store: EmbeddingStore | None
+        _cases: _case_matrix = field(
+            default_factory=_case_matrix, init=False, repr=False, compare=False
+        )
 
-        def __init__(self, model: str | Language):
+        def __init__(self, model: str | Language, store: EmbeddingStore | None = None):
             if isinstance(model, str):
                 self.model = spacy_load(model)
             else:
                 self.model = model
 
+            self.store = store
+            self._cases = _case_matrix()
+
         @property
         @override
         def metadata(self) -> JsonDict:
-            return {"model": self.model.meta}
+            return {"model": self.model.meta, "store": get_metadata(self.store)}
 
-        @override
-        def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq[float]:
-            texts = _unique_items(pairs)
+        @property
+        def store_key(self) -> str:
+            meta = self.model.meta
+            return f"spacy/{meta['lang']}_{meta['name']}@{meta['version']}"
 
+        def _encode(self, texts: Sequence[str]) -> list:
             with self.model.select_pipes(enable=[]):
-                _docs = self.model.pipe(texts)
+                return [doc.vector for doc in self.model.pipe(texts)]
 
-            docs = dict(zip(texts, _docs, strict=True))
+        def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+            return embeddings.embed(texts, self.store_key, self._encode, self.store)
 
-            return [docs[x].similarity(docs[y]) for x, y in pairs]
+        @override
+        def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq[float]:
+            return self._cases.cosine(pairs, self.embed)
 
     __all__ += ["spacy"]
 
@@ -104,12 +233,25 @@ try:
         Args:
             model: Either the name of a [pretrained model](https://www.sbert.net/docs/pretrained_models.html)
                 or a `SentenceTransformer` model instance.
+            store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
+                Custom model instances share the store key `sentence-transformers/custom`,
+                so use a separate store for each of them.
         """
 
         model: SentenceTransformer
+        store: EmbeddingStore | None
         _metadata: JsonDict = field(default_factory=dict, init=False)
+        _cases: _case_matrix = field(
+            default_factory=_case_matrix, init=False, repr=False, compare=False
+        )
+
+        def __init__(
+            self,
+            model: str | SentenceTransformer,
+            store: EmbeddingStore | None = None,
+        ):
+            self._metadata = {}
 
-        def __init__(self, model: str | SentenceTransformer):
             if isinstance(model, str):
                 self.model = SentenceTransformer(model)
                 self._metadata["model"] = model
@@ -117,18 +259,27 @@ try:
                 self.model = model
                 self._metadata["model"] = "custom"
 
+            self.store = store
+            self._cases = _case_matrix()
+
         @property
         @override
         def metadata(self) -> JsonDict:
-            return self._metadata
+            return {**self._metadata, "store": get_metadata(self.store)}
+
+        @property
+        def store_key(self) -> str:
+            return f"sentence-transformers/{self._metadata['model']}"
+
+        def _encode(self, texts: Sequence[str]) -> Any:
+            return self.model.encode(list(texts), convert_to_numpy=True)
+
+        def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+            return embeddings.embed(texts, self.store_key, self._encode, self.store)
 
         @override
         def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq[float]:
-            texts = _unique_items(pairs)
-            encoded_texts = self.model.encode(texts, convert_to_numpy=True)
-            vecs = dict(zip(texts, encoded_texts, strict=True))
-
-            return [_cosine(vecs[x], vecs[y]) for x, y in pairs]
+            return self._cases.cosine(pairs, self.embed)
 
     __all__ += ["sentence_transformers"]
 
@@ -138,7 +289,7 @@ except ImportError:
 
 try:
     import numpy as np
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
 
     @dataclass(slots=True, frozen=True)
     class openai(SimSeqFunc[str, float], SupportsMetadata):
@@ -146,28 +297,65 @@ try:
 
         Args:
             model: Name of the [embedding model](https://platform.openai.com/docs/models/embeddings).
+            store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
+            batch_size: Maximum number of texts per request in `sim_async`.
+            concurrency: Maximum number of concurrent requests in `sim_async`.
         """
 
         model: str
         client: OpenAI = field(default_factory=OpenAI)
+        store: EmbeddingStore | None = None
+        async_client: AsyncOpenAI = field(default_factory=AsyncOpenAI)
+        batch_size: int = 256
+        concurrency: int = 4
+        _cases: _case_matrix = field(
+            default_factory=_case_matrix, init=False, repr=False, compare=False
+        )
 
         @property
         @override
         def metadata(self) -> JsonDict:
-            return {"model": self.model}
+            return {"model": self.model, "store": get_metadata(self.store)}
+
+        @property
+        def store_key(self) -> str:
+            return f"openai/{self.model}"
+
+        def _encode(self, texts: Sequence[str]) -> list:
+            res = self.client.embeddings.create(
+                input=list(texts),
+                model=self.model,
+                encoding_format="float",
+            )
+            return [np.array(x.embedding) for x in res.data]
+
+        def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+            return embeddings.embed(texts, self.store_key, self._encode, self.store)
 
         @override
         def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
-            texts = _unique_items(pairs)
-            res = self.client.embeddings.create(
-                input=texts,
+            return self._cases.cosine(pairs, self.embed)
+
+        async def _encode_async(self, texts: Sequence[str]) -> list:
+            res = await self.async_client.embeddings.create(
+                input=list(texts),
                 model=self.model,
                 encoding_format="float",
             )
-            _vecs = [np.array(x.embedding) for x in res.data]
-            vecs = dict(zip(texts, _vecs, strict=True))
+            return [np.array(x.embedding) for x in res.data]
 
-            return [_cosine(vecs[x], vecs[y]) for x, y in pairs]
+        async def embed_async(self, texts: Sequence[str]) -> dict[str, Any]:
+            return await embeddings.embed_async(
+                texts,
+                self.store_key,
+                self._encode_async,
+                self.store,
+                self.batch_size,
+                self.concurrency,
+            )
+
+        async def sim_async(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
+            return await self._cases.cosine_async(pairs, self.embed_async)
 
     __all__ += ["openai"]
 
@@ -177,7 +365,7 @@ except ImportError:
 
 try:
     import numpy as np
-    from ollama import Client, Options
+    from ollama import AsyncClient, Client, Options
 
     @dataclass(slots=True, frozen=True)
     class ollama(SimSeqFunc[str, float], SupportsMetadata):
@@ -185,6 +373,9 @@ try:
 
         Args:
             model: Name of the [embedding model](https://ollama.com/blog/embedding-models).
+            store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
+            batch_size: Maximum number of texts per request in `sim_async`.
+            concurrency: Maximum number of concurrent requests in `sim_async`.
         """
 
         model: str
@@ -192,6 +383,13 @@ try:
         options: Options | None = None
         keep_alive: float | str | None = None
         client: Client = field(default_factory=Client)
+        store: EmbeddingStore | None = None
+        async_client: AsyncClient = field(default_factory=AsyncClient)
+        batch_size: int = 256
+        concurrency: int = 4
+        _cases: _case_matrix = field(
+            default_factory=_case_matrix, init=False, repr=False, compare=False
+        )
 
         @property
         @override
@@ -201,22 +399,52 @@ try:
                 "truncate": self.truncate,
                 "keep_alive": self.keep_alive,
                 "options": str(self.options),
+                "store": get_metadata(self.store),
             }
 
+        @property
+        def store_key(self) -> str:
+            return f"ollama/{self.model}"
+
+        def _encode(self, texts: Sequence[str]) -> list:
+            res = self.client.embed(
+                self.model,
+                list(texts),
+                truncate=self.truncate,
+                options=self.options,
+                keep_alive=self.keep_alive,
+            )
+            return [np.array(x) for x in res["embeddings"]]
+
+        def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+            return embeddings.embed(texts, self.store_key, self._encode, self.store)
+
         @override
         def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
-            texts = _unique_items(pairs)
-            res = self.client.embed(
+            return self._cases.cosine(pairs, self.embed)
+
+        async def _encode_async(self, texts: Sequence[str]) -> list:
+            res = await self.async_client.embed(
                 self.model,
-                texts,
+                list(texts),
                 truncate=self.truncate,
                 options=self.options,
                 keep_alive=self.keep_alive,
             )
-            _vecs = [np.array(x) for x in res["embeddings"]]
-            vecs = dict(zip(texts, _vecs, strict=True))
+            return [np.array(x) for x in res["embeddings"]]
 
-            return [_cosine(vecs[x], vecs[y]) for x, y in pairs]
+        async def embed_async(self, texts: Sequence[str]) -> dict[str, Any]:
+            return await embeddings.embed_async(
+                texts,
+                self.store_key,
+                self._encode_async,
+                self.store,
+                self.batch_size,
+                self.concurrency,
+            )
+
+        async def sim_async(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
+            return await self._cases.cosine_async(pairs, self.embed_async)
 
     __all__ += ["ollama"]
 
@@ -226,7 +454,7 @@ except ImportError:
 
 try:
     import numpy as np
-    from cohere import Client
+    from cohere import AsyncClient, Client
     from cohere.core import RequestOptions
 
     @dataclass(slots=True, frozen=True)
@@ -235,12 +463,22 @@ try:
 
         Args:
             model: Name of the [embedding model](https://docs.cohere.com/reference/embed).
+            store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
+            batch_size: Maximum number of texts per request in `sim_async`.
+            concurrency: Maximum number of concurrent requests in `sim_async`.
         """
 
         model: str
         client: Client = field(default_factory=Client)
         truncate: Literal["NONE", "START", "END"] | None = None
         request_options: RequestOptions | None = None
+        store: EmbeddingStore | None = None
+        async_client: AsyncClient = field(default_factory=AsyncClient)
+        batch_size: int = 96
+        concurrency: int = 4
+        _cases: _case_matrix = field(
+            default_factory=_case_matrix, init=False, repr=False, compare=False
+        )
 
         @property
         @override
@@ -249,39 +487,62 @@ try:
                 "model": self.model,
                 "truncate": self.truncate,
                 "request_options": str(self.request_options),
+                "store": get_metadata(self.store),
             }
 
-        @override
-        def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
-            case_texts = list({x for x, _ in pairs})
-            query_texts = list({y for _, y in pairs})
+        @property
+        def store_key(self) -> str:
+            return f"cohere/{self.model}"
 
-            case_raw_vecs = self.client.v2.embed(
+        def _encode(self, texts: Sequence[str]) -> list:
+            raw_vecs = self.client.v2.embed(
                 model=self.model,
-                texts=case_texts,
+                texts=list(texts),
                 input_type="search_document",
                 embedding_types="float",
                 truncate=self.truncate,
                 request_options=self.request_options,
             ).embeddings.float_
-            query_raw_vecs = self.client.v2.embed(
-                model=self.model,
-                texts=query_texts,
-                input_type="search_document",
-                embedding_types="float",
-                truncate=self.truncate,
-                request_options=self.request_options,
+
+            assert raw_vecs is not None
+
+            return [np.array(x) for x in raw_vecs]
+
+        def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+            return embeddings.embed(texts, self.store_key, self._encode, self.store)
+
+        @override
+        def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
+            return self._cases.cosine(pairs, self.embed)
+
+        async def _encode_async(self, texts: Sequence[str]) -> list:
+            raw_vecs = (
+                await self.async_client.v2.embed(
+                    model=self.model,
+                    texts=list(texts),
+                    input_type="search_document",
+                    embedding_types="float",
+                    truncate=self.truncate,
+                    request_options=self.request_options,
+                )
             ).embeddings.float_
 
-            assert case_raw_vecs is not None and query_raw_vecs is not None
+            assert raw_vecs is not None
 
-            case_np_vecs = [np.array(x) for x in case_raw_vecs]
-            query_np_vecs = [np.array(x) for x in query_raw_vecs]
+            return [np.array(x) for x in raw_vecs]
 
-            case_vecs = dict(zip(case_texts, case_np_vecs, strict=True))
-            query_vecs = dict(zip(query_texts, query_np_vecs, strict=True))
+        async def embed_async(self, texts: Sequence[str]) -> dict[str, Any]:
+            return await embeddings.embed_async(
+                texts,
+                self.store_key,
+                self._encode_async,
+                self.store,
+                self.batch_size,
+                self.concurrency,
+            )
 
-            return [_cosine(case_vecs[x], query_vecs[y]) for x, y in pairs]
+        async def sim_async(self, pairs: Sequence[tuple[str, str]]) -> SimSeq:
+            return await self._cases.cosine_async(pairs, self.embed_async)
 
     __all__ += ["cohere"]
 
@@ -289,26 +550,184 @@ except ImportError:
     pass
 
 
+@dataclass(slots=True)
+class fake_embedding(SimSeqFunc[str, float], SupportsMetadata):
+    """Stand-in for an embedding provider that works offline, e.g. for tests.
+
+    Each text is mapped to a deterministic pseudo-random vector derived from its hash,
+    so identical texts have a similarity of 1.0 while different texts are compared randomly.
+    The optional delay simulates the latency of a remote provider in `sim_async`.
+
+    Args:
+        dim: Number of dimensions of the vectors.
+        delay: Seconds that each asynchronous request takes.
+        store: Optional embedding store (see `cbrkit.sim.strings.embeddings`) consulted before encoding.
+        batch_size: Maximum number of texts per request in `sim_async`.
+        concurrency: Maximum number of concurrent requests in `sim_async`.
+
+    Examples:
+        >>> import asyncio
+        >>> sim = fake_embedding(batch_size=1, concurrency=2)
+        >>> [round(x, 4) for x in sim([("a", "a"), ("b", "b")])]
+        [1.0, 1.0]
+        >>> [round(x, 4) for x in asyncio.run(sim.sim_async([("a", "a"), ("b", "c")]))][0]
+        1.0
+        >>> sim.requests, sim.max_concurrent_requests
+        (4, 2)
+    """
+
+    dim: int = 32
+    delay: float = 0.0
+    store: EmbeddingStore | None = None
+    batch_size: int | None = None
+    concurrency: int | None = None
+    requests: int = field(default=0, init=False)
+    max_concurrent_requests: int = field(default=0, init=False)
+    _active_requests: int = field(default=0, init=False, repr=False)
+    _cases: _case_matrix = field(
+        default_factory=_case_matrix, init=False, repr=False, compare=False
+    )
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {
+            "dim": self.dim,
+            "delay": self.delay,
+            "store": get_metadata(self.store),
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+        }
+
+    @property
+    def store_key(self) -> str:
+        return f"fake/{self.dim}"
+
+    def _encode(self, texts: Sequence[str]) -> list:
+        import numpy as np
+
+        self.requests += 1
+
+        return [
+            np.random.default_rng(int(embeddings.text_hash(text), 16)).standard_normal(
+                self.dim
+            )
+            for text in texts
+        ]
+
+    async def _encode_async(self, texts: Sequence[str]) -> list:
+        self._active_requests += 1
+        self.max_concurrent_requests = max(
+            self.max_concurrent_requests, self._active_requests
+        )
+
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self._active_requests -= 1
+
+        return self._encode(texts)
+
+    def embed(self, texts: Sequence[str]) -> dict[str, Any]:
+        return embeddings.embed(texts, self.store_key, self._encode, self.store)
+
+    async def embed_async(self, texts: Sequence[str]) -> dict[str, Any]:
+        return await embeddings.embed_async(
+            texts,
+            self.store_key,
+            self._encode_async,
+            self.store,
+            self.batch_size,
+            self.concurrency,
+        )
+
+    @override
+    def __call__(self, pairs: Sequence[tuple[str, str]]) -> SimSeq[float]:
+        return self._cases.cosine(pairs, self.embed)
+
+    async def sim_async(self, pairs: Sequence[tuple[str, str]]) -> SimSeq[float]:
+        return await self._cases.cosine_async(pairs, self.embed_async)
+
+
 try:
     import Levenshtein as pyLevenshtein
+    from rapidfuzz import process as rf_process
+    from rapidfuzz.distance import Indel as rf_indel
+    from rapidfuzz.distance import Jaro as rf_jaro
+    from rapidfuzz.distance import JaroWinkler as rf_jaro_winkler
+
+    def _rapidfuzz_column(
+        scorer: Callable[..., float],
+        xs: Sequence[str],
+        y: str,
+        processor: Callable[[str], str] | None,
+        score_cutoff: float | None,
+        workers: int,
+        **scorer_kwargs: Any,
+    ) -> list[float]:
+        """Scores one query string against a column of case strings in a single native call.
+
+        The processor is applied once per string and scores below `score_cutoff` are returned as 0.0.
+        Without NumPy, the scores are collected via `rapidfuzz.process.extract` instead of `cdist`.
+        """
+
+        if len(xs) == 0:
+            return []
+
+        if np is None:
+            sims = [0.0] * len(xs)
+
+            for _, sim, idx in rf_process.extract(
+                y,
+                xs,
+                scorer=scorer,
+                processor=processor,
+                limit=None,
+                score_cutoff=score_cutoff,
+                scorer_kwargs=scorer_kwargs,
+            ):
+                sims[idx] = sim
+
+            return sims
+
+        return rf_process.cdist(
+            [y],
+            xs,
+            scorer=scorer,
+            processor=processor,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=workers,
+            scorer_kwargs=scorer_kwargs,
+        )[0].tolist()
 
     @dataclass(slots=True, frozen=True)
-    class levenshtein(SimPairFunc[str, float], SupportsMetadata):
+    class levenshtein(
+        SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata
+    ):
         """Similarity function that calculates a normalized indel similarity between two strings based on [Levenshtein distance](https://en.wikipedia.org/wiki/Levenshtein_distance).
 
         Args:
             score_cutoff: If the similarity is less than this value, the function will return 0.0.
+            case_sensitive: If False, both strings are lowercased before comparing them.
+            workers: Number of threads used when scoring a column of case strings. Values of -1 use all CPUs.
         Examples:
             >>> sim = levenshtein()
             >>> sim("kitten", "sitting")
             0.6153846153846154
+            >>> sim.sim_column(["kitten", "sitting", "Sitting"], "sitting")
+            [0.6153846153846154, 1.0, 0.8571428571428572]
             >>> sim = levenshtein(score_cutoff=0.8)
             >>> sim("kitten", "sitting")
             0.0
+            >>> sim = levenshtein(case_sensitive=False)
+            >>> sim.sim_column(["kitten", "Sitting"], "sitting")
+            [0.6153846153846154, 1.0]
         """
 
         score_cutoff: float | None = None
         case_sensitive: bool = True
+        workers: int = 1
 
         @override
         def __call__(self, x: str, y: str) -> float:
@@ -317,38 +736,73 @@ try:
 
             return pyLevenshtein.ratio(x, y, score_cutoff=self.score_cutoff)
 
+        @override
+        def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+            return _rapidfuzz_column(
+                rf_indel.normalized_similarity,
+                xs,
+                y,
+                None if self.case_sensitive else str.lower,
+                self.score_cutoff,
+                self.workers,
+            )
+
     @dataclass(slots=True, frozen=True)
-    class jaro(SimPairFunc[str, float], SupportsMetadata):
+    class jaro(
+        SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata
+    ):
         """Jaro similarity function to compute similarity between two strings.
 
         Args:
             score_cutoff: If the similarity is less than this value, the function will return 0.0.
+            workers: Number of threads used when scoring a column of case strings. Values of -1 use all CPUs.
         Examples:
             >>> sim = jaro()
             >>> sim("kitten", "sitting")
             0.746031746031746
+            >>> sim.sim_column(["kitten", "sitting"], "sitting")
+            [0.746031746031746, 1.0]
             >>> sim = jaro(score_cutoff=0.8)
             >>> sim("kitten", "sitting")
             0.0
+            >>> sim.sim_column(["kitten", "sitting"], "sitting")
+            [0.0, 1.0]
         """
 
         score_cutoff: float | None = None
+        workers: int = 1
 
         @override
         def __call__(self, x: str, y: str) -> float:
             return pyLevenshtein.jaro(x, y, score_cutoff=self.score_cutoff)
 
+        @override
+        def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+            return _rapidfuzz_column(
+                rf_jaro.normalized_similarity,
+                xs,
+                y,
+                None,
+                self.score_cutoff,
+                self.workers,
+            )
+
     @dataclass(slots=True, frozen=True)
-    class jaro_winkler(SimPairFunc[str, float], SupportsMetadata):
+    class jaro_winkler(
+        SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata
+    ):
         """Jaro-Winkler similarity function to compute similarity between two strings.
 
         Args:
             score_cutoff: If the similarity is less than this value, the function will return 0.0.
             prefix_weight: Weight used for the common prefix of the two strings. Has to be between 0 and 0.25. Default is 0.1.
+            workers: Number of threads used when scoring a column of case strings. Values of -1 use all CPUs.
         Examples:
             >>> sim = jaro_winkler()
             >>> sim("kitten", "sitting")
             0.746031746031746
+            >>> sim.sim_column(["kitten", "sitter"], "sitting")
+            [0.746031746031746, 0.8476190476190476]
             >>> sim = jaro_winkler(score_cutoff=0.8)
             >>> sim("kitten", "sitting")
             0.0
@@ -356,6 +810,7 @@ try:
 
         score_cutoff: float | None = None
         prefix_weight: float = 0.1
+        workers: int = 1
 
         @override
         def __call__(self, x: str, y: str) -> float:
@@ -363,6 +818,18 @@ try:
                 x, y, score_cutoff=self.score_cutoff, prefix_weight=self.prefix_weight
             )
 
+        @override
+        def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+            return _rapidfuzz_column(
+                rf_jaro_winkler.normalized_similarity,
+                xs,
+                y,
+                None,
+                self.score_cutoff,
+                self.workers,
+                prefix_weight=self.prefix_weight,
+            )
+
     __all__ += ["levenshtein", "jaro", "jaro_winkler"]
 
 except ImportError:
@@ -373,9 +840,13 @@ try:
     from nltk.util import ngrams as nltk_ngrams
 
     @dataclass(slots=True, frozen=True)
-    class ngram(SimPairFunc[str, float], SupportsMetadata):
+    class ngram(
+        SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata
+    ):
         """N-gram similarity function to compute [similarity](https://procake.pages.gitlab.rlp.net/procake-wiki/sim/strings/#n-gram) between two strings.
 
+        To compare a query against a large casebase, the n-grams of the cases can be precomputed with `cbrkit.retrieval.NgramIndex`.
+
         Args:
             n: Length of the n-gram
             case_sensitive: If True, the comparison is case-sensitive
@@ -384,6 +855,8 @@ try:
             >>> sim = ngram(3, case_sensitive=False)
             >>> sim("kitten", "sitting")
             0.125
+            >>> sim.sim_column(["kitten", "Sitting", "kitten"], "sitting")
+            [0.125, 1.0, 0.125]
 
         """
 
@@ -400,19 +873,35 @@ try:
                 "tokenizer": self.tokenizer is not None,
             }
 
+        def ngrams(self, text: str) -> set[tuple[str, ...]]:
+            """Returns the set of n-grams of a string."""
+            if not self.case_sensitive:
+                text = text.lower()
+
+            items = self.tokenizer(text) if self.tokenizer is not None else list(text)
+
+            return set(nltk_ngrams(items, self.n))
+
         @override
         def __call__(self, x: str, y: str) -> float:
-            if not self.case_sensitive:
-                x = x.lower()
-                y = y.lower()
+            return _jaccard(self.ngrams(x), self.ngrams(y))
+
+        @override
+        def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+            y_ngrams = self.ngrams(y)
+            sims: dict[str, float] = {}
+
+            # duplicate case strings are only tokenized once
+            for x in xs:
+                if x not in sims:
+                    sims[x] = _jaccard(self.ngrams(x), y_ngrams)
 
-            x_items = self.tokenizer(x) if self.tokenizer is not None else list(x)
-            y_items = self.tokenizer(y) if self.tokenizer is not None else list(y)
+            return [sims[x] for x in xs]
 
-            x_ngrams = set(nltk_ngrams(x_items, self.n))
-            y_ngrams = set(nltk_ngrams(y_items, self.n))
+    def _jaccard(x: set[Any], y: set[Any]) -> float:
+        union = len(x | y)
 
-            return len(x_ngrams.intersection(y_ngrams)) / len(x_ngrams.union(y_ngrams))
+        return len(x & y) / union if union else 0.0
 
     __all__ += ["ngram"]
 
@@ -420,28 +909,66 @@ except ImportError:
     pass
 
 
+@lru_cache(maxsize=1024)
+def _compile_regex(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=1024)
+def _compile_glob(pattern: str) -> re.Pattern[str]:
+    return re.compile(fnmatch.translate(pattern))
+
+
 @dataclass(slots=True, frozen=True)
-class regex(SimPairFunc[str, float], SupportsMetadata):
+class regex(SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata):
     """Compares a case x to a query y, written as a regular expression. If the case matches the query, the similarity is 1.0, otherwise 0.0.
 
+    The compiled patterns of recent queries are cached, so each query is only compiled once.
+
+    Args:
+        columnar: If True, columns of polars casebases are matched by polars in a single call.
+            Polars uses the Rust regex engine whose syntax differs slightly from Python's `re`,
+            patterns that it does not support are matched with `re` instead.
     Examples:
         >>> sim = regex()
         >>> sim("Test1", "T.st[0-9]")
         1.0
         >>> sim("Test2", "T.st[3-6]")
         0.0
+        >>> sim.sim_column(["Test1", "Test7", "Tests"], "T.st[0-6]")
+        [1.0, 0.0, 0.0]
     """
 
+    columnar: bool = False
+
     @override
     def __call__(self, x: str, y: str) -> float:
-        regex = re.compile(y)
-        return 1.0 if regex.match(x) else 0.0
+        return 1.0 if _compile_regex(y).match(x) else 0.0
+
+    @override
+    def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+        if self.columnar and isinstance(xs, pl.Series) and xs.dtype == pl.String:
+            try:
+                return (
+                    xs.str.contains(f"^(?:{y})")
+                    .cast(pl.Float64)
+                    .fill_null(0.0)
+                    .to_list()
+                )
+            except pl.exceptions.ComputeError:
+                pass
+
+        match = _compile_regex(y).match
+
+        return [1.0 if match(x) else 0.0 for x in xs]
 
 
 @dataclass(slots=True, frozen=True)
-class glob(SimPairFunc[str, float], SupportsMetadata):
+class glob(SimPairFunc[str, float], SupportsSimColumn[str, float], SupportsMetadata):
     """Compares a case x to a query y, written as a glob pattern, which can contain wildcards. If the case matches the query, the similarity is 1.0, otherwise 0.0.
 
+    The compiled patterns of recent queries are cached, so each query is only translated and compiled once.
+
     Args:
         case_sensitive: If True, the comparison is case-sensitive
     Examples:
@@ -450,16 +977,26 @@ class glob(SimPairFunc[str, float], SupportsMetadata):
         1.0
         >>> sim("Test2", "Test[3-9]")
         0.0
+        >>> sim.sim_column(["Test1", "Test7", "Tests"], "Test[3-9]")
+        [0.0, 1.0, 0.0]
     """
 
     case_sensitive: bool = False
 
     @override
     def __call__(self, x: str, y: str) -> float:
-        comparison_func = (
-            fnmatch.fnmatchcase if self.case_sensitive else fnmatch.fnmatch
-        )
-        return 1.0 if comparison_func(x, y) else 0.0
+        return self.sim_column([x], y)[0]
+
+    @override
+    def sim_column(self, xs: Sequence[str], y: str) -> SimSeq[float]:
+        # same semantics as fnmatch.fnmatch, which only normalizes the case on case-insensitive file systems
+        if self.case_sensitive:
+            match = _compile_glob(y).match
+            return [1.0 if match(x) else 0.0 for x in xs]
+
+        match = _compile_glob(os.path.normcase(y)).match
+
+        return [1.0 if match(os.path.normcase(x)) else 0.0 for x in xs]
 
 
 def table(
@@ -0,0 +1,512 @@
+"""
+Embedding stores allow the semantic string measures (e.g., `cbrkit.sim.strings.sentence_transformers`)
+to reuse vectors that have already been computed instead of encoding the same texts over and over again.
+Each store is keyed by the name of the embedding model and a hash of the text,
+so a single store can safely be shared between multiple measures.
+
+Two stores are provided:
+`cbrkit.sim.strings.embeddings.memory` keeps a bounded number of vectors in an LRU cache,
+while `cbrkit.sim.strings.embeddings.disk` persists them in a memory-mapped file per model.
+Pass one of them as `store` to a semantic measure to enable caching:
+
+```python
+store = cbrkit.sim.strings.embeddings.disk("embeddings")
+sim = cbrkit.sim.strings.sentence_transformers("all-MiniLM-L6-v2", store=store)
+```
+
+With a disk store, the vectors of a casebase are computed once per deployment instead of once per request.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol, override
+
+from ...typing import FilePath, JsonDict, SupportsMetadata
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = [
+    "EmbeddingStore",
+    "cosine",
+    "disk",
+    "embed",
+    "embed_async",
+    "memory",
+    "normalize",
+    "text_hash",
+]
+
+type Vector = Any
+
+
+def text_hash(text: str) -> str:
+    """Stable hash of a text used as the key of an embedding store.
+
+    Examples:
+        >>> text_hash("hello")
+        '46fb7408d4f285228f4af516ea25851b'
+    """
+
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingStore(Protocol):
+    def get(self, model: str, texts: Sequence[str]) -> dict[str, Vector]:
+        """Returns the vectors of all texts that are contained in the store."""
+        ...
+
+    def put(self, model: str, vectors: Mapping[str, Vector]) -> None:
+        """Adds the given vectors to the store."""
+        ...
+
+
+@dataclass(slots=True)
+class memory(EmbeddingStore, SupportsMetadata):
+    """In-memory embedding store that evicts the least recently used vectors.
+
+    Args:
+        maxsize: Maximum number of vectors kept in the store. If None, the store is unbounded.
+
+    Examples:
+        >>> store = memory(maxsize=2)
+        >>> store.put("model", {"a": [1.0], "b": [2.0]})
+        >>> store.get("model", ["a", "c"])
+        {'a': [1.0]}
+        >>> store.put("model", {"c": [3.0]})
+        >>> sorted(store.get("model", ["a", "b", "c"]))
+        ['a', 'c']
+    """
+
+    maxsize: int | None = 100_000
+    _data: OrderedDict[tuple[str, str], Vector] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {"maxsize": self.maxsize, "size": len(self._data)}
+
+    @override
+    def get(self, model: str, texts: Sequence[str]) -> dict[str, Vector]:
+        result: dict[str, Vector] = {}
+
+        for text in texts:
+            key = (model, text_hash(text))
+
+            if (vec := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+                result[text] = vec
+
+        return result
+
+    @override
+    def put(self, model: str, vectors: Mapping[str, Vector]) -> None:
+        for text, vec in vectors.items():
+            key = (model, text_hash(text))
+            self._data[key] = vec
+            self._data.move_to_end(key)
+
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+@dataclass(slots=True)
+class _disk_table:
+    path: Path
+    keys: dict[str, int]
+    dim: int | None
+    vectors: Any
+    rows: int = 0
+    keys_size: int = 0
+
+
+@contextmanager
+def _file_lock(directory: Path) -> Iterator[None]:
+    """Serializes the access of multiple processes to a table (no-op on platforms without `fcntl`)."""
+    with (directory / "lock").open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _sync_table(table: _disk_table) -> None:
+    """Reads the keys appended by other stores and repairs the files after an interrupted write.
+
+    The number of rows is derived from the sizes of both files:
+    keys without a complete vector and vectors without a key are removed,
+    so new rows are always appended at the position of their keys.
+    Has to be called while holding the lock of the table.
+    """
+    keys_file = table.path / "keys.txt"
+    vectors_file = table.path / "vectors.f32"
+
+    if table.dim is None:
+        if not (table.path / "dim.txt").exists():
+            return
+
+        table.dim = int((table.path / "dim.txt").read_text())
+
+    row_size = table.dim * 4
+    keys_size = keys_file.stat().st_size if keys_file.exists() else 0
+    vectors_size = vectors_file.stat().st_size if vectors_file.exists() else 0
+
+    # the files only shrink if they have been repaired, so the keys are read again
+    if keys_size < table.keys_size or vectors_size < table.rows * row_size:
+        table.keys, table.rows, table.keys_size = {}, 0, 0
+
+    if keys_size > table.keys_size:
+        with keys_file.open("rb") as f:
+            f.seek(table.keys_size)
+            lines = f.read().splitlines(keepends=True)
+
+        complete_rows = vectors_size // row_size - table.rows
+
+        for line in lines[:complete_rows]:
+            # an incomplete last line is left by an interrupted write
+            if not line.endswith(b"\n"):
+                break
+
+            table.keys.setdefault(line.decode().strip(), table.rows)
+            table.rows += 1
+            table.keys_size += len(line)
+
+    if keys_size > table.keys_size:
+        os.truncate(keys_file, table.keys_size)
+
+    if vectors_size > table.rows * row_size:
+        os.truncate(vectors_file, table.rows * row_size)
+
+
+@dataclass(slots=True)
+class disk(EmbeddingStore, SupportsMetadata):
+    """Persistent embedding store backed by memory-mapped files.
+
+    Every model gets its own subdirectory of `path` containing a `vectors.f32` file
+    with one float32 row per text and a `keys.txt` file with the corresponding text hashes.
+    New vectors are appended to both files, existing rows are never rewritten.
+    Writes are serialized by a lock per store and a file lock per model,
+    so multiple threads and processes (e.g., the workers of `cbrkit.api.serve`) can share a directory.
+    Rows and keys without a counterpart (e.g., left by an interrupted write) are discarded when the files are read.
+    The vector file is memory-mapped, so only the rows that are actually requested are read from disk.
+
+    Args:
+        path: Directory where the embeddings are stored. It is created if it does not exist.
+
+    Examples:
+        >>> import tempfile
+        >>> tmp = tempfile.TemporaryDirectory()
+        >>> store = disk(tmp.name)
+        >>> store.put("model", {"a": [1.0, 2.0]})
+        >>> store.get("model", ["a", "b"])["a"].tolist()
+        [1.0, 2.0]
+        >>> disk(tmp.name).get("model", ["a"])["a"].tolist()
+        [1.0, 2.0]
+        >>> tmp.cleanup()
+    """
+
+    path: Path
+    _tables: dict[str, _disk_table] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def __init__(self, path: FilePath):
+        self.path = Path(path)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # the files are opened again by the receiving process
+        return (disk, (self.path,))
+
+    @property
+    @override
+    def metadata(self) -> JsonDict:
+        return {"path": str(self.path)}
+
+    def _table(self, model: str) -> _disk_table:
+        if (table := self._tables.get(model)) is not None:
+            return table
+
+        table = _disk_table(self.path / text_hash(model), {}, None, None)
+
+        if (table.path / "dim.txt").exists():
+            with _file_lock(table.path):
+                _sync_table(table)
+
+            self._map(table)
+
+        self._tables[model] = table
+
+        return table
+
+    def _map(self, table: _disk_table) -> None:
+        import numpy as np
+
+        if table.rows == 0:
+            table.vectors = None
+        elif table.vectors is None or len(table.vectors) != table.rows:
+            assert table.dim is not None
+            table.vectors = np.memmap(
+                table.path / "vectors.f32",
+                dtype=np.float32,
+                mode="r",
+                shape=(table.rows, table.dim),
+            )
+
+    @override
+    def get(self, model: str, texts: Sequence[str]) -> dict[str, Vector]:
+        with self._lock:
+            table = self._table(model)
+            result: dict[str, Vector] = {}
+
+            for text in texts:
+                if (row := table.keys.get(text_hash(text))) is not None:
+                    result[text] = table.vectors[row]
+
+            return result
+
+    @override
+    def put(self, model: str, vectors: Mapping[str, Vector]) -> None:
+        with self._lock:
+            table = self._table(model)
+            table.path.mkdir(parents=True, exist_ok=True)
+
+            with _file_lock(table.path):
+                # other stores may have added rows since the table was read
+                _sync_table(table)
+                new_entries = {
+                    key: vec
+                    for text, vec in vectors.items()
+                    if (key := text_hash(text)) not in table.keys
+                }
+
+                if new_entries:
+                    self._append(model, table, new_entries)
+
+            self._map(table)
+
+    def _append(
+        self, model: str, table: _disk_table, entries: Mapping[str, Vector]
+    ) -> None:
+        import numpy as np
+
+        matrix = np.asarray(list(entries.values()), dtype=np.float32)
+
+        if table.dim is None:
+            table.dim = matrix.shape[1]
+            (table.path / "dim.txt").write_text(str(table.dim))
+            (table.path / "model.txt").write_text(model)
+
+        if matrix.shape[1] != table.dim:
+            raise ValueError(
+                f"Expected vectors with {table.dim} dimensions, got {matrix.shape[1]}"
+            )
+
+        # the vectors are written before the keys so that a crash never leaves keys without rows
+        with (table.path / "vectors.f32").open("ab") as f:
+            f.write(matrix.tobytes())
+
+        lines = "".join(f"{key}\n" for key in entries).encode()
+
+        with (table.path / "keys.txt").open("ab") as f:
+            f.write(lines)
+
+        table.keys.update({key: table.rows + i for i, key in enumerate(entries)})
+        table.rows += len(entries)
+        table.keys_size += len(lines)
+
+
+def embed(
+    texts: Sequence[str],
+    model: str,
+    encode: Callable[[Sequence[str]], Sequence[Vector]],
+    store: EmbeddingStore | None = None,
+) -> dict[str, Vector]:
+    """Encodes the given texts, consulting the store before calling the model.
+
+    Only the texts that are missing from the store are passed to `encode`,
+    the resulting vectors are added to the store afterwards.
+
+    Args:
+        texts: Texts to encode.
+        model: Name of the embedding model used as part of the store key.
+        encode: Function that encodes a sequence of texts into a sequence of vectors.
+        store: Optional embedding store. If None, all texts are encoded.
+
+    Examples:
+        >>> calls = []
+        >>> def encode(texts):
+        ...     calls.append(list(texts))
+        ...     return [[float(len(text))] for text in texts]
+        >>> store = memory()
+        >>> embed(["a", "bb"], "model", encode, store)
+        {'a': [1.0], 'bb': [2.0]}
+        >>> embed(["bb", "ccc"], "model", encode, store)
+        {'bb': [2.0], 'ccc': [3.0]}
+        >>> calls
+        [['a', 'bb'], ['ccc']]
+    """
+
+    unique_texts = list(dict.fromkeys(texts))
+
+    if store is None:
+        return dict(zip(unique_texts, encode(unique_texts), strict=True))
+
+    cached = store.get(model, unique_texts)
+    missing = [text for text in unique_texts if text not in cached]
+
+    if missing:
+        encoded = dict(zip(missing, encode(missing), strict=True))
+        store.put(model, encoded)
+        cached.update(encoded)
+
+    return {text: cached[text] for text in unique_texts}
+
+
+async def embed_async(
+    texts: Sequence[str],
+    model: str,
+    encode: Callable[[Sequence[str]], Awaitable[Sequence[Vector]]],
+    store: EmbeddingStore | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+) -> dict[str, Vector]:
+    """Asynchronous variant of `embed` that sends the missing texts in concurrent batches.
+
+    Args:
+        texts: Texts to encode.
+        model: Name of the embedding model used as part of the store key.
+        encode: Coroutine function that encodes a sequence of texts into a sequence of vectors.
+        store: Optional embedding store. If None, all texts are encoded.
+        batch_size: Maximum number of texts per call of `encode`. If None, all texts are sent at once.
+        concurrency: Maximum number of concurrent calls of `encode`. If None, all batches are sent at once.
+
+    Examples:
+        >>> import asyncio
+        >>> async def encode(texts):
+        ...     return [[float(len(text))] for text in texts]
+        >>> asyncio.run(embed_async(["a", "bb", "ccc"], "model", encode, batch_size=2))
+        {'a': [1.0], 'bb': [2.0], 'ccc': [3.0]}
+    """
+
+    unique_texts = list(dict.fromkeys(texts))
+    cached = store.get(model, unique_texts) if store is not None else {}
+    missing = [text for text in unique_texts if text not in cached]
+
+    if missing:
+        step = batch_size or len(missing)
+        batches = [missing[idx : idx + step] for idx in range(0, len(missing), step)]
+        semaphore = asyncio.Semaphore(concurrency or len(batches))
+
+        async def encode_batch(batch: list[str]) -> Sequence[Vector]:
+            async with semaphore:
+                return await encode(batch)
+
+        batch_vecs = await asyncio.gather(*(encode_batch(batch) for batch in batches))
+        encoded = {
+            text: vec
+            for batch, vecs in zip(batches, batch_vecs, strict=True)
+            for text, vec in zip(batch, vecs, strict=True)
+        }
+
+        if store is not None:
+            store.put(model, encoded)
+
+        cached.update(encoded)
+
+    return {text: cached[text] for text in unique_texts}
+
+
+def normalize(vectors: Sequence[Vector] | Any) -> Any:
+    """Stacks the vectors into one contiguous float32 matrix with unit-length rows.
+
+    Rows with a norm of zero are kept as zero vectors, so their cosine similarity to any other vector is 0.
+
+    Examples:
+        >>> matrix = normalize([[3.0, 4.0], [0.0, 0.0]])
+        >>> matrix.dtype, matrix.shape
+        (dtype('float32'), (2, 2))
+        >>> matrix.astype(float).round(4).tolist()
+        [[0.6, 0.8], [0.0, 0.0]]
+    """
+
+    import numpy as np
+
+    matrix = np.array(vectors, dtype=np.float32, order="C", ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    return matrix
+
+
+def cosine(
+    cases: Any,
+    queries: Any,
+    normalized: bool = False,
+    chunk_size: int | None = None,
+) -> Any:
+    """Cosine similarities between all case vectors and one or more query vectors.
+
+    The scores are computed as a single matrix product per chunk of case rows.
+    Passing a memory-mapped matrix (e.g., `numpy.memmap`) together with a `chunk_size`
+    allows scoring matrices that do not fit into memory, as only one chunk is loaded at a time.
+
+    Args:
+        cases: Matrix with one case vector per row.
+        queries: Either a single query vector or a matrix with one query vector per row.
+        normalized: If True, both inputs are assumed to be already normalized (see `normalize`).
+        chunk_size: Number of case rows scored at once. If None, all rows are scored in one product.
+
+    Returns:
+        An array of shape `(len(cases),)` for a single query vector,
+        otherwise an array of shape `(len(cases), len(queries))`.
+
+    Examples:
+        >>> cosine([[1.0, 0.0], [1.0, 1.0], [0.0, 0.0]], [2.0, 0.0]).astype(float).round(4).tolist()
+        [1.0, 0.7071, 0.0]
+        >>> cosine([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]], [[1.0, 0.0], [0.0, 1.0]], chunk_size=2).astype(float).round(4).tolist()
+        [[1.0, 0.0], [0.0, 1.0], [0.7071, 0.7071]]
+    """
+
+    import numpy as np
+
+    single_query = np.ndim(queries) == 1
+    query_matrix = (
+        np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if normalized
+        else normalize(queries)
+    ).T
+    cases_len = len(cases)
+
+    step = chunk_size or max(cases_len, 1)
+    scores = np.empty((cases_len, query_matrix.shape[1]), dtype=np.float32)
+
+    for start in range(0, cases_len, step):
+        chunk = cases[start : start + step]
+        chunk = np.asarray(chunk, dtype=np.float32) if normalized else normalize(chunk)
+        np.matmul(chunk, query_matrix, out=scores[start : start + step])
+
+    # rounding errors of float32 may otherwise produce scores slightly above 1
+    np.clip(scores, -1.0, 1.0, out=scores)
+
+    return scores[:, 0] if single_query else scores
@@ -50,23 +50,84 @@ class TaxonomyNode:
 
 
 class Taxonomy:
-    __slots__ = ("root", "nodes")
+    """Tree of taxonomy nodes with precomputed depth statistics and a lowest common ancestor index.
+
+    The lowest common ancestor (lca) of two nodes is the node with the lowest depth
+    between their first occurrences in an Euler tour of the tree.
+    A sparse table over the tour answers this range minimum query in constant time,
+    so `lca` does not depend on the depth of the taxonomy.
+
+    Examples:
+        >>> taxonomy = Taxonomy("./data/cars-taxonomy.yaml")
+        >>> taxonomy.lca(taxonomy.nodes["audi"], taxonomy.nodes["porsche"]).name
+        'Volkswagen AG'
+        >>> taxonomy.max_depth, taxonomy.max_level
+        (3, 4)
+    """
+
+    __slots__ = (
+        "root",
+        "nodes",
+        "max_depth",
+        "max_level",
+        "_euler",
+        "_first",
+        "_sparse",
+    )
 
     root: TaxonomyNode
     nodes: dict[str, TaxonomyNode]
+    max_depth: int
+    max_level: int
+    _euler: list[TaxonomyNode]
+    _first: dict[str, int]
+    _sparse: list[list[int]]
 
     def __init__(self, path: FilePath) -> None:
         root_data = cast(SerializedTaxonomyNode, load_data(path))
         self.nodes = {}
         self.root = self._load(root_data)
+        self.max_depth = max(node.depth for node in self.nodes.values())
+        self.max_level = self.max_depth + 1
+        self._build_lca_index()
 
-    @property
-    def max_depth(self) -> int:
-        return max(node.depth for node in self.nodes.values())
+    def _build_lca_index(self) -> None:
+        euler: list[TaxonomyNode] = [self.root]
+        first: dict[str, int] = {self.root.name: 0}
+        # iterative depth-first traversal, a parent is visited again after each of its children
+        stack = [(self.root, iter(self.root.children.values()))]
 
-    @property
-    def max_level(self) -> int:
-        return max(node.level for node in self.nodes.values())
+        while stack:
+            children = stack[-1][1]
+
+            if (child := next(children, None)) is None:
+                stack.pop()
+
+                if stack:
+                    euler.append(stack[-1][0])
+            else:
+                first[child.name] = len(euler)
+                euler.append(child)
+                stack.append((child, iter(child.children.values())))
+
+        self._euler = euler
+        self._first = first
+
+        depths = [node.depth for node in euler]
+        sparse = [list(range(len(euler)))]
+        width = 1
+
+        while 2 * width <= len(euler):
+            prev = sparse[-1]
+            sparse.append(
+                [
+                    a if depths[a] <= depths[b] else b
+                    for a, b in zip(prev, prev[width:], strict=False)
+                ]
+            )
+            width *= 2
+
+        self._sparse = sparse
 
     def _load(
         self,
@@ -95,16 +156,17 @@ class Taxonomy:
         return node
 
     def lca(self, node1: TaxonomyNode, node2: TaxonomyNode) -> TaxonomyNode:
-        while node1 != node2:
-            if node1.parent is None or node2.parent is None:
-                return self.root
+        start, end = self._first[node1.name], self._first[node2.name]
 
-            if node1.depth > node2.depth:
-                node1 = node1.parent
-            else:
-                node2 = node2.parent
+        if start > end:
+            start, end = end, start
+
+        level = (end - start + 1).bit_length() - 1
+        row = self._sparse[level]
+        candidate1 = self._euler[row[start]]
+        candidate2 = self._euler[row[end - (1 << level) + 1]]
 
-        return node1
+        return candidate1 if candidate1.depth <= candidate2.depth else candidate2
 
 
 class TaxonomyFunc(Protocol):
@@ -332,17 +394,32 @@ class load(SimPairFunc[str, float], SupportsMetadata):
     If not set, the default value is 1.0.
     The `weight` is only used by the measure `user_weights` and ignored otherwise.
 
+    Args:
+        path: Path to the taxonomy file.
+        measure: Similarity measure applied to the taxonomy.
+        precompute: If True, the similarities of all pairs of nodes are computed when loading the taxonomy,
+            so that every call is a table lookup.
+            As the table grows quadratically with the number of nodes, this is only suitable for small taxonomies.
+
     Examples:
         >>> sim = load("./data/cars-taxonomy.yaml", measure=wu_palmer())
         >>> sim("audi", "porsche")
         0.5
         >>> sim("audi", "bmw")
         0.0
+        >>> sim = load("./data/cars-taxonomy.yaml", measure=wu_palmer(), precompute=True)
+        >>> sim("audi", "porsche")
+        0.5
     """
 
     path: FilePath
     measure: TaxonomyFunc = _taxonomy_func
+    precompute: bool = False
     taxonomy: Taxonomy = field(init=False)
+    _index: dict[str, int] = field(init=False, repr=False, default_factory=dict)
+    _table: list[list[float | None]] = field(
+        init=False, repr=False, default_factory=list
+    )
 
     @property
     @override
@@ -350,11 +427,31 @@ class load(SimPairFunc[str, float], SupportsMetadata):
         return {
             "path": str(self.path),
             "measure": get_metadata(self.measure),
+            "precompute": self.precompute,
         }
 
     def __post_init__(self) -> None:
         self.taxonomy = Taxonomy(self.path)
 
+        if self.precompute:
+            names = list(self.taxonomy.nodes)
+            self._index = {name: idx for idx, name in enumerate(names)}
+            self._table = [[self._try_measure(x, y) for y in names] for x in names]
+
+    def _try_measure(self, x: str, y: str) -> float | None:
+        # pairs that are undefined for the measure (e.g., the root with itself for wu_palmer)
+        # are not stored, so calling them raises the same error as without precomputation
+        try:
+            return self.measure(self.taxonomy, x, y)
+        except ZeroDivisionError:
+            return None
+
     @override
     def __call__(self, x: str, y: str) -> float:
+        if (
+            self._table
+            and (value := self._table[self._index[x]][self._index[y]]) is not None
+        ):
+            return value
+
         return self.measure(self.taxonomy, x, y)
@@ -46,6 +46,66 @@ class SimPairFunc[V, S: Float](Protocol):
 type AnySimFunc[V, S: Float] = SimPairFunc[V, S] | SimSeqFunc[V, S]
 
 
+@runtime_checkable
+class SupportsSimColumn[V, S: Float](Protocol):
+    """Batch path of a similarity function that compares a column of case values to a single query value.
+
+    The column may be any sequence, including a `polars.Series`.
+    The wrappers in `cbrkit.helpers` use this method automatically if it is available.
+    """
+
+    def sim_column(self, xs: Sequence[V], y: V, /) -> SimSeq[S]: ...
+
+
+@runtime_checkable
+class SupportsSimMap[K, V, S: Float](Protocol):
+    """Casebase-level path of a similarity function, e.g. to operate on the columns of a dataframe.
+
+    `cbrkit.helpers.SimMapWrapper` uses this method automatically if it is available.
+    """
+
+    def sim_map(self, x_map: Mapping[K, V], y: V, /) -> SimMap[K, S]: ...
+
+
+@runtime_checkable
+class SupportsSimBatch[K, V, S: Float](Protocol):
+    """Multi-query path of a similarity function that compares a casebase to a block of queries.
+
+    It returns one similarity map per query, i.e., a Q×N score matrix,
+    so that the casebase is only traversed once for all queries.
+    `cbrkit.retrieval.mapply` uses this method automatically if it is available.
+    """
+
+    def sim_batch(
+        self, x_map: Mapping[K, V], ys: Sequence[V], /
+    ) -> Sequence[SimMap[K, S]]: ...
+
+
+@runtime_checkable
+class SupportsSimTop[K, V, S: Float](Protocol):
+    """Casebase-level path of a similarity function that only has to score the most similar cases.
+
+    It may skip cases that cannot be among the `limit` most similar ones (e.g., based on upper bounds),
+    so the returned map only has to contain these cases.
+    If `limit` is None, all cases have to be scored.
+    `cbrkit.retrieval.build` uses this method automatically if it is available.
+    """
+
+    def sim_top(
+        self, x_map: Mapping[K, V], y: V, limit: int | None, processes: int, /
+    ) -> SimMap[K, S]: ...
+
+
+@runtime_checkable
+class SupportsSimAsync[V, S: Float](Protocol):
+    """Asynchronous path of a similarity function, e.g. to overlap requests to an embedding provider.
+
+    `cbrkit.retrieval.apply_async` uses this method automatically if it is available.
+    """
+
+    async def sim_async(self, pairs: Sequence[tuple[V, V]], /) -> SimSeq[S]: ...
+
+
 class RetrieverFunc[K, V, S: Float](Protocol):
     def __call__(
         self,
@@ -55,6 +115,22 @@ class RetrieverFunc[K, V, S: Float](Protocol):
     ) -> SimMap[K, S]: ...
 
 
+@runtime_checkable
+class SupportsRetrieveAsync[K, V, S: Float](Protocol):
+    """Asynchronous path of a retriever function.
+
+    `cbrkit.retrieval.apply_async` uses this method automatically if it is available,
+    other retrievers are run in a separate thread.
+    """
+
+    async def retrieve_async(
+        self,
+        casebase: Mapping[K, V],
+        query: V,
+        /,
+    ) -> SimMap[K, S]: ...
+
+
 class AdaptPairFunc[V](Protocol):
     def __call__(
         self,
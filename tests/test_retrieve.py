@@ -1,6 +1,12 @@
+import asyncio
+import itertools
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import polars as pl
+import pytest
 
 import cbrkit
 
@@ -157,3 +163,768 @@ def test_retrieve_nested():
     assert isinstance(model_sim, cbrkit.sim.AttributeValueSim)
     assert model_sim.value == 1.0
     assert model_sim.attributes["make"] == 1.0
+
+
+def test_retrieve_pool():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    queries = {"first": casebase[42], "second": casebase[420]}
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(
+            attributes={
+                "price": cbrkit.sim.numbers.linear(max=100000),
+                "year": cbrkit.sim.numbers.linear(max=50),
+                "make": cbrkit.sim.strings.levenshtein(),
+                "miles": _custom_numeric_sim,
+            },
+            aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ),
+        limit=5,
+    )
+    expected = cbrkit.retrieval.mapply(casebase, queries, retriever)
+
+    with cbrkit.helpers.WorkerPool(2) as pool:
+        # the second iteration reuses the workers and their resident casebase
+        for _ in range(2):
+            results = cbrkit.retrieval.mapply(casebase, queries, retriever, pool=pool)
+            result = cbrkit.retrieval.apply(
+                casebase, queries["first"], retriever, pool=pool
+            )
+
+            assert result.ranking == expected["first"].ranking
+
+            for key, value in expected.items():
+                assert results[key].ranking == value.ranking
+
+    # alternating between casebases keeps both resident without mixing up their slices
+    other_casebase = {
+        key: casebase[(key + 500) % len(casebase)] for key in range(len(casebase))
+    }
+    other_expected = cbrkit.retrieval.apply(other_casebase, queries["first"], retriever)
+    workers = None
+
+    with cbrkit.helpers.WorkerPool(2) as pool:
+        for _ in range(2):
+            for current, current_expected in (
+                (casebase, expected["first"]),
+                (other_casebase, other_expected),
+            ):
+                result = cbrkit.retrieval.apply(
+                    current, queries["first"], retriever, pool=pool
+                )
+
+                assert result.ranking == current_expected.ranking
+
+            # the pool is not restarted once both casebases are resident
+            assert workers is None or pool._pool is workers
+            workers = pool._pool
+
+
+def test_retrieve_dataframe_columnar():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(
+            attributes={
+                "price": cbrkit.sim.numbers.linear(max=100000),
+                "year": cbrkit.sim.numbers.linear(max=50),
+                "manufacturer": cbrkit.sim.strings.taxonomy.load(
+                    "./data/cars-taxonomy.yaml",
+                    measure=cbrkit.sim.strings.taxonomy.wu_palmer(),
+                ),
+                "miles": _custom_numeric_sim,
+            },
+            aggregator=cbrkit.sim.aggregator(
+                pooling="mean", pooling_weights={"price": 2, "year": 1}
+            ),
+        ),
+    )
+    # the dataframe is processed column by column, the dict row by row
+    columnar_result = cbrkit.retrieval.apply(casebase, query, retriever)
+    row_result = cbrkit.retrieval.apply(dict(casebase.items()), query, retriever)
+
+    assert columnar_result.similarities.keys() == row_result.similarities.keys()
+
+    for key, row_sim in row_result.similarities.items():
+        columnar_sim = columnar_result.similarities[key]
+
+        assert columnar_sim.attributes == row_sim.attributes
+        assert abs(columnar_sim.value - row_sim.value) < 1e-12
+
+
+def test_retrieve_attribute_value_objects(monkeypatch):
+    casebase = cbrkit.loaders.polars(pl.read_csv("data/cars-1k.csv"))
+    query = casebase[42]
+    sim_func = cbrkit.sim.attribute_value(
+        attributes={
+            "price": cbrkit.sim.numbers.linear(max=100000),
+            "year": cbrkit.sim.numbers.linear(max=50),
+        },
+    )
+    built: list[Any] = []
+
+    class RecordingSim(cbrkit.sim.AttributeValueSim):
+        __slots__ = ()
+
+        def __init__(self, *args: Any) -> None:
+            super().__init__(*args)
+            built.append(self)
+
+    monkeypatch.setattr(cbrkit.sim._attribute_value, "AttributeValueSim", RecordingSim)
+
+    # the similarity objects are only built for the retrieved cases
+    result = cbrkit.retrieval.apply(
+        casebase, query, cbrkit.retrieval.build(sim_func, limit=5)
+    )
+
+    assert len(built) == 5
+    assert result.ranking[0] == 42
+    assert result.similarities[42].value == 1.0
+    assert result.similarities[42].attributes == {"price": 1.0, "year": 1.0}
+
+    sim_map = sim_func.sim_map(casebase, query)
+    pairs = [(case, query) for case in casebase.values()]
+
+    assert list(sim_map.keys()) == list(casebase.keys())
+
+    for columnar_sim, row_sim in zip(sim_map.values(), sim_func(pairs), strict=True):
+        assert columnar_sim.attributes == row_sim.attributes
+        assert abs(columnar_sim.value - row_sim.value) < 1e-12
+
+
+def _embed_cars(cars: list[dict[str, Any]]) -> list[list[float]]:
+    return [
+        [car["price"] / 100000, car["year"] / 2020, car["miles"] / 1000000]
+        for car in cars
+    ]
+
+
+def test_retrieve_ann(tmp_path):
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    index = cbrkit.retrieval.AnnIndex.build(casebase, _embed_cars, lists=16)
+    index.save(tmp_path)
+    loaded_index = cbrkit.retrieval.AnnIndex.load(tmp_path)
+
+    assert list(loaded_index.keys) == list(casebase.keys())
+
+    # probing all lists is equivalent to an exact search
+    result = cbrkit.retrieval.apply(
+        casebase,
+        query,
+        cbrkit.retrieval.ann(loaded_index, _embed_cars, probes=16, limit=10),
+    )
+    vectors = cbrkit.sim.strings.embeddings.normalize(
+        _embed_cars(list(casebase.values()))
+    )
+    query_vec = cbrkit.sim.strings.embeddings.normalize(_embed_cars([query]))[0]
+    exact_scores = dict(zip(casebase.keys(), (vectors @ query_vec).tolist()))
+    exact_ranking = cbrkit.helpers.similarities2ranking(exact_scores, limit=10)
+
+    assert set(result.ranking) == set(exact_ranking)
+
+    # keys outside of the index are scored exactly, keys outside of the casebase are ignored
+    partial_casebase = {key: casebase[key] for key in list(casebase.keys())[:100]}
+    partial_casebase["new"] = query
+    partial_result = cbrkit.retrieval.apply(
+        partial_casebase,
+        query,
+        cbrkit.retrieval.ann(index, _embed_cars, probes=16, limit=5),
+    )
+
+    assert partial_result.ranking[0] in ("new", 42)
+    assert set(partial_result.ranking) <= partial_casebase.keys()
+
+    with pytest.raises(ValueError):
+        cbrkit.retrieval.ann(index, _embed_cars, probes=0)
+
+    with pytest.raises(ValueError):
+        index.search(query_vec, 0)
+
+    # an empty index only scores the cases of the casebase
+    empty_index = cbrkit.retrieval.AnnIndex.build({}, _embed_cars)
+    empty_result = cbrkit.retrieval.apply(
+        partial_casebase,
+        query,
+        cbrkit.retrieval.ann(empty_index, _embed_cars, limit=5),
+    )
+
+    assert empty_index.search(query_vec, 8) == {}
+    assert empty_result.ranking[0] in ("new", 42)
+    assert len(empty_result.ranking) == 5
+
+
+def _car_text(car: dict[str, Any]) -> str:
+    return f"{car['manufacturer']} {car['make']}"
+
+
+def test_retrieve_ngram():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    sim_func = cbrkit.sim.strings.ngram(3)
+    index = cbrkit.retrieval.NgramIndex.build(
+        {key: _car_text(car) for key, car in casebase.items()}, sim_func
+    )
+
+    # the index yields the same similarities as the pairwise function
+    result = cbrkit.retrieval.apply(
+        casebase, query, cbrkit.retrieval.ngram(index, _car_text)
+    )
+    expected = {
+        key: sim_func(_car_text(car), _car_text(query)) for key, car in casebase.items()
+    }
+
+    assert result.similarities.keys() == expected.keys()
+    assert all(
+        abs(result.similarities[key] - expected[key]) < 1e-12 for key in expected
+    )
+
+    # keys outside of the index are scored directly, keys outside of the casebase are ignored
+    partial_casebase = {key: casebase[key] for key in list(casebase.keys())[:100]}
+    partial_casebase["new"] = query
+    partial_result = cbrkit.retrieval.apply(
+        partial_casebase,
+        query,
+        cbrkit.retrieval.ngram(index, _car_text, candidates_only=True),
+    )
+
+    assert partial_result.similarities["new"] == 1.0
+    assert set(partial_result.ranking) == {
+        key for key in partial_casebase if expected.get(key, 1.0) > 0.0
+    }
+
+
+def test_retrieve_disk_store_recovery(tmp_path):
+    store = cbrkit.sim.strings.embeddings.disk(tmp_path)
+    store.put("model", {"a": [1.0, 2.0]})
+    (table_path,) = [path for path in tmp_path.iterdir() if path.is_dir()]
+
+    # an interrupted write leaves rows without keys and an incomplete key
+    with (table_path / "vectors.f32").open("ab") as f:
+        f.write(b"\x00" * 8 * 3)
+
+    with (table_path / "keys.txt").open("a") as f:
+        f.write("incomplete")
+
+    recovered = cbrkit.sim.strings.embeddings.disk(tmp_path)
+    recovered.put("model", {"b": [3.0, 4.0], "c": [5.0, 6.0]})
+    reloaded = cbrkit.sim.strings.embeddings.disk(tmp_path)
+
+    for current in (recovered, reloaded):
+        vectors = current.get("model", ["a", "b", "c"])
+
+        assert {text: vec.tolist() for text, vec in vectors.items()} == {
+            "a": [1.0, 2.0],
+            "b": [3.0, 4.0],
+            "c": [5.0, 6.0],
+        }
+
+
+def _encode_texts(texts: list[str]) -> list[list[float]]:
+    return [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+
+
+def test_retrieve_disk_store_concurrency(tmp_path):
+    # two stores on the same directory behave like two worker processes
+    stores = [cbrkit.sim.strings.embeddings.disk(tmp_path) for _ in range(2)]
+    texts = [f"text {idx}" for idx in range(300)]
+
+    def embed(worker: int) -> bool:
+        for step in range(50):
+            batch = [texts[(worker * 37 + step * 7 + idx) % 300] for idx in range(5)]
+            vectors = cbrkit.sim.strings.embeddings.embed(
+                batch, "model", _encode_texts, stores[worker % 2]
+            )
+
+            if [list(map(float, vectors[text])) for text in batch] != _encode_texts(
+                batch
+            ):
+                return False
+
+        return True
+
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(embed, range(8)))
+
+    reloaded = cbrkit.sim.strings.embeddings.disk(tmp_path)
+    vectors = reloaded.get("model", texts)
+
+    assert len(vectors) == len({text for text in texts if text in vectors})
+    assert [vectors[text].tolist() for text in vectors] == _encode_texts(list(vectors))
+
+    # keys whose vectors are missing are discarded instead of breaking the store
+    (table_path,) = [path for path in tmp_path.iterdir() if path.is_dir()]
+    vectors_file = table_path / "vectors.f32"
+    os.truncate(vectors_file, vectors_file.stat().st_size - 8 - 3)
+    repaired = cbrkit.sim.strings.embeddings.disk(tmp_path)
+
+    assert len(repaired.get("model", texts)) == len(vectors) - 2
+
+    repaired.put("model", {"new": [1.0, 2.0]})
+
+    assert cbrkit.sim.strings.embeddings.disk(tmp_path).get("model", ["new"])[
+        "new"
+    ].tolist() == [1.0, 2.0]
+
+
+def test_retrieve_cache():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    make_sim = cbrkit.sim.cache(cbrkit.sim.strings.levenshtein(), maxsize=1000)
+
+    def retriever(make_sim: Any) -> Any:
+        return cbrkit.retrieval.build(
+            cbrkit.sim.attribute_value(
+                attributes={
+                    "make": make_sim,
+                    "manufacturer": cbrkit.sim.strings.taxonomy.load(
+                        "./data/cars-taxonomy.yaml",
+                        measure=cbrkit.sim.strings.taxonomy.wu_palmer(),
+                    ),
+                },
+                aggregator=cbrkit.sim.aggregator(pooling="mean"),
+            ),
+            limit=5,
+        )
+
+    expected = cbrkit.retrieval.apply(
+        casebase, query, retriever(cbrkit.sim.strings.levenshtein())
+    )
+    distinct_makes = len({car["make"] for car in casebase.values()})
+
+    # attribute_value passes each distinct pair once, the second call is served from the cache
+    for hits in (0, distinct_makes):
+        result = cbrkit.retrieval.apply(casebase, query, retriever(make_sim))
+
+        assert result.ranking == expected.ranking
+        assert make_sim.misses == distinct_makes
+        assert make_sim.hits == hits
+        assert make_sim.metadata["size"] == distinct_makes
+
+
+def test_retrieve_distinct_values():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    calls: list[tuple[str, str]] = []
+
+    def fuel_sim(x: str, y: str) -> float:
+        calls.append((x, y))
+        return 1.0 if x == y else 0.0
+
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(attributes={"fuel": fuel_sim}), limit=5
+    )
+    distinct_fuels = {car["fuel"] for car in casebase.values()}
+
+    for cases in (casebase, dict(casebase.items())):
+        calls.clear()
+        result = cbrkit.retrieval.apply(cases, query, retriever)
+
+        assert len(calls) == len(distinct_fuels)
+        assert all(casebase[key]["fuel"] == query["fuel"] for key in result.ranking)
+
+
+def test_retrieve_stream():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    queries = {"first": casebase[42], "second": casebase[420]}
+    retrievers = [
+        cbrkit.retrieval.build(
+            cbrkit.sim.attribute_value(
+                attributes={
+                    "price": cbrkit.sim.numbers.linear(max=100000),
+                    "year": cbrkit.sim.numbers.linear(max=50),
+                    "miles": cbrkit.sim.numbers.linear(max=1000000),
+                },
+                aggregator=cbrkit.sim.aggregator(pooling="mean"),
+            ),
+            limit=20,
+        ),
+        cbrkit.retrieval.build(
+            cbrkit.sim.attribute_value(
+                attributes={"make": cbrkit.sim.strings.levenshtein()},
+            ),
+            limit=5,
+        ),
+    ]
+    expected = cbrkit.retrieval.mapply(casebase, queries, retrievers)
+    # the batches are produced lazily and consumed only once
+    batches = (
+        [(key, casebase[key]) for key in keys]
+        for keys in itertools.batched(range(len(casebase)), 64)
+    )
+    results = cbrkit.retrieval.mstream(batches, queries, retrievers)
+
+    for key, value in expected.items():
+        assert len(results[key].steps) == 2
+        assert results[key].steps[0].ranking == value.steps[0].ranking
+        assert results[key].ranking == value.ranking
+
+
+def _price_sim(x: dict[str, Any], y: dict[str, Any]) -> float:
+    return _custom_numeric_sim(x["price"], y["price"])
+
+
+def test_retrieve_lazy_files(tmp_path):
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    query = casebase[42]
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(
+            attributes={
+                "price": cbrkit.sim.numbers.linear(max=100000),
+                "year": cbrkit.sim.numbers.linear(max=50),
+            },
+            aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ),
+        limit=5,
+    )
+    expected = cbrkit.retrieval.apply(casebase, query, retriever)
+
+    df.write_parquet(tmp_path / "cars.parquet")
+    df.write_ipc(tmp_path / "cars.arrow")
+
+    for file_name in ("cars.parquet", "cars.arrow"):
+        lazy_casebase = cbrkit.loaders.path(tmp_path / file_name)
+
+        assert isinstance(lazy_casebase, cbrkit.loaders.polars_lazy)
+        assert lazy_casebase.loaded_columns == []
+
+        result = cbrkit.retrieval.apply(lazy_casebase, query, retriever)
+
+        assert result.ranking == expected.ranking
+        assert result.casebase == expected.casebase
+        # only the compared attributes have been read
+        assert sorted(lazy_casebase.loaded_columns) == ["price", "year"]
+
+        # other similarity functions read all cases in a single query
+        for processes in (1, 2):
+            pairwise_result = cbrkit.retrieval.apply(
+                lazy_casebase,
+                query,
+                cbrkit.retrieval.build(_price_sim, limit=5),
+                processes=processes,
+            )
+            pairwise_expected = cbrkit.retrieval.apply(
+                casebase, query, cbrkit.retrieval.build(_price_sim, limit=5)
+            )
+
+            assert pairwise_result.ranking == pairwise_expected.ranking
+            assert pairwise_result.casebase == pairwise_expected.casebase
+
+
+def test_retrieve_batch():
+    casebase_file = "data/cars-1k.csv"
+
+    df = pl.read_csv(casebase_file)
+    casebase = cbrkit.loaders.polars(df)
+    queries = {idx: casebase[idx] for idx in range(0, 100, 10)}
+    retrievers = [
+        cbrkit.retrieval.build(
+            cbrkit.sim.attribute_value(
+                attributes={
+                    "price": cbrkit.sim.numbers.linear(max=100000),
+                    "year": cbrkit.sim.numbers.linear(max=50),
+                    "manufacturer": cbrkit.sim.strings.taxonomy.load(
+                        "./data/cars-taxonomy.yaml",
+                        measure=cbrkit.sim.strings.taxonomy.wu_palmer(),
+                    ),
+                },
+                aggregator=cbrkit.sim.aggregator(pooling="mean"),
+            ),
+            limit=10,
+        ),
+        cbrkit.retrieval.build(
+            cbrkit.sim.attribute_value(
+                attributes={"make": cbrkit.sim.strings.levenshtein()},
+            ),
+            limit=3,
+        ),
+    ]
+
+    for cases in (casebase, dict(casebase.items())):
+        # all queries are scored in one pass, apply processes them one by one
+        results = cbrkit.retrieval.mapply(cases, queries, retrievers)
+
+        for key, query in queries.items():
+            expected = cbrkit.retrieval.apply(cases, query, retrievers)
+
+            assert len(results[key].steps) == 2
+            assert results[key].steps[0].similarities == expected.steps[0].similarities
+            assert results[key].ranking == expected.ranking
+
+
+def test_retrieve_async():
+    casebase = {
+        idx: text
+        for idx, text in enumerate(
+            ["red car", "blue car", "green bike", "red bike", "blue truck", "old van"]
+        )
+    }
+    queries = {"q1": "red car", "q2": "blue bike", "q3": "green van"}
+    embedding = cbrkit.sim.strings.fake_embedding(
+        delay=0.01, batch_size=2, concurrency=2
+    )
+    retriever = cbrkit.retrieval.build(embedding, limit=3)
+
+    results = asyncio.run(
+        cbrkit.retrieval.mapply_async(casebase, queries, retriever, concurrency=3)
+    )
+    expected = cbrkit.retrieval.mapply(casebase, queries, retriever)
+
+    for key in queries:
+        assert results[key].ranking == expected[key].ranking
+        assert results[key].similarities == expected[key].similarities
+
+    # at most three queries with two concurrent requests each
+    assert 2 < embedding.max_concurrent_requests <= 2 * 3
+    assert embedding.requests > 0
+
+
+def test_retrieve_embedding_cache():
+    casebase = {idx: f"case {idx % 50}" for idx in range(200)}
+    embedding = cbrkit.sim.strings.fake_embedding()
+    retriever = cbrkit.retrieval.build(embedding)
+
+    first = cbrkit.retrieval.apply(casebase, "case 3", retriever)
+    requests = embedding.requests
+    second = cbrkit.retrieval.apply(casebase, "query", retriever)
+
+    # the case matrix is reused, so only the query is embedded
+    assert embedding.requests == requests + 1
+    assert first.similarities[3] == pytest.approx(1.0)
+
+    for result, query in ((first, "case 3"), (second, "query")):
+        pairwise = cbrkit.sim.strings.fake_embedding()
+        expected = {key: pairwise([(text, query)])[0] for key, text in casebase.items()}
+
+        assert result.similarities == pytest.approx(expected, abs=1e-6)
+
+
+def _graph(nodes: list[int]) -> cbrkit.sim.graphs.model.Graph:
+    return cbrkit.sim.graphs.model.from_dict(
+        {
+            "nodes": {idx: {"data": value} for idx, value in enumerate(nodes)},
+            "edges": {
+                f"e{idx}": {"source": idx, "target": idx + 1, "data": None}
+                for idx in range(len(nodes) - 1)
+            },
+            "data": None,
+        }
+    )
+
+
+def _node_sim(x: int, y: int) -> float:
+    return 1 - abs(x - y) / 5
+
+
+def test_retrieve_graphs(monkeypatch):
+    casebase = {
+        idx: _graph([(idx * 7 + offset) % 5 for offset in range(2 + idx % 4)])
+        for idx in range(40)
+    }
+    query = _graph([1, 2, 3, 4])
+    # without pruning the queue, astar finds the optimal mapping
+    sim = cbrkit.sim.graphs.astar(node_data_sim=_node_sim, queue_limit=0)
+    expected = sorted(
+        (round(sim(case, query).value, 6) for case in casebase.values()),
+        reverse=True,
+    )
+
+    for processes in (1, 2):
+        result = cbrkit.retrieval.apply(
+            casebase,
+            query,
+            cbrkit.retrieval.build(sim, limit=5),
+            processes=processes,
+        )
+
+        assert [
+            round(value.value, 6) for value in result.similarities.values()
+        ] == expected[:5]
+
+    # batches of queries also pass the limit, so graphs below it can be skipped
+    limits: list[int | None] = []
+    sim_top = cbrkit.sim.graphs.astar.sim_top
+
+    def recording_sim_top(self, x_map, y, limit, processes):
+        limits.append(limit)
+        return sim_top(self, x_map, y, limit, processes)
+
+    monkeypatch.setattr(cbrkit.sim.graphs.astar, "sim_top", recording_sim_top)
+    results = cbrkit.retrieval.mapply(
+        casebase, {"a": query, "b": query}, cbrkit.retrieval.build(sim, limit=5)
+    )
+
+    assert limits == [5, 5]
+
+    for result in results.values():
+        assert [
+            round(value.value, 6) for value in result.similarities.values()
+        ] == expected[:5]
+
+    # all graphs are scored if no limit is given
+    all_sims = cbrkit.helpers.SimMapWrapper(sim)(casebase, query)
+
+    assert len(all_sims) == len(casebase)
+
+    # tied graphs are ranked in the order of the casebase, as when scoring all graphs,
+    # even though the second one has a higher upper bound and is searched first
+    tied_casebase = {
+        "lower_bound": _graph([0, 2, 3, 3]),
+        "higher_bound": _graph([1, 2, 3, 2]),
+        "other": _graph([4, 0]),
+    }
+    tied_sims = cbrkit.helpers.SimMapWrapper(sim)(tied_casebase, query)
+    tied_result = cbrkit.retrieval.apply(
+        tied_casebase, query, cbrkit.retrieval.build(sim, limit=2)
+    )
+
+    assert tied_sims["lower_bound"].value == pytest.approx(
+        tied_sims["higher_bound"].value
+    )
+    assert tied_result.ranking == ("lower_bound", "higher_bound")
+    assert tied_result.ranking == tuple(
+        cbrkit.helpers.similarities2ranking(tied_sims, limit=2)
+    )
+
+
+def test_retrieve_empty_sequences():
+    casebase = {"empty": [], "one": ["a"], "two": ["a", "b"]}
+    element_sim = cbrkit.sim.generic.equality()
+
+    for sim_func in (
+        cbrkit.sim.collections.mapping(element_sim),
+        cbrkit.sim.collections.isolated_mapping(element_sim),
+    ):
+        result = cbrkit.retrieval.apply(
+            casebase, ["a"], cbrkit.retrieval.build(sim_func)
+        )
+        empty_query_result = cbrkit.retrieval.apply(
+            casebase, [], cbrkit.retrieval.build(sim_func)
+        )
+
+        assert result.similarities["empty"] == 0.0
+        assert result.similarities["one"] == 1.0
+        assert set(empty_query_result.similarities.values()) == {0.0}
+
+
+def test_retrieve_partial_mapping(recwarn):
+    sim_func = cbrkit.sim.collections.mapping(cbrkit.sim.generic.equality())
+
+    # with more query items than case items, the unmatched ones count as 0
+    # instead of discarding the whole mapping
+    assert sim_func(["a", "b", "x"], ["a"]) == pytest.approx(1 / 3)
+    assert sim_func(["a", "b", "x"], ["b", "a"]) == pytest.approx(2 / 3)
+    assert sim_func(["a", "b", "x"], ["c", "d"]) == 0.0
+    assert "max_queue_size" not in cbrkit.helpers.get_metadata(sim_func)
+    assert not recwarn.list
+
+    with pytest.deprecated_call():
+        cbrkit.sim.collections.mapping(cbrkit.sim.generic.equality(), max_queue_size=10)
+
+
+def test_retrieve_ranking(monkeypatch):
+    casebase = cbrkit.loaders.polars(pl.read_csv("data/cars-1k.csv"))
+    queries = {"first": casebase[42], "second": casebase[420]}
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(
+            attributes={
+                "price": cbrkit.sim.numbers.linear(max=100000),
+                "year": cbrkit.sim.numbers.linear(max=50),
+            },
+            aggregator=cbrkit.sim.aggregator(pooling="mean"),
+        ),
+        limit=10,
+    )
+    expected = cbrkit.retrieval.mapply(casebase, queries, retriever)
+    rankings: list[int] = []
+
+    def similarities2ranking(similarities, *args, **kwargs):
+        rankings.append(len(similarities))
+        return cbrkit.helpers.similarities2ranking(similarities, *args, **kwargs)
+
+    monkeypatch.setattr(cbrkit.retrieval, "similarities2ranking", similarities2ranking)
+    results = cbrkit.retrieval.mapply(casebase, queries, retriever)
+
+    # the casebase is only ranked once per query in `postprocess`
+    assert rankings == [len(casebase), len(casebase)]
+
+    for key, result in results.items():
+        assert result.ranking == expected[key].ranking
+        assert list(result.similarities) == list(result.ranking)
+
+    # the similarities of custom retrievers are still sorted
+    def reversed_retriever(casebase, query, processes):
+        return {key: float(key) for key in reversed(list(casebase.keys())[:5])}
+
+    rankings.clear()
+    custom_result = cbrkit.retrieval.apply(
+        casebase, queries["first"], reversed_retriever
+    )
+
+    assert rankings == [5]
+    assert custom_result.ranking == (4, 3, 2, 1, 0)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_retrieve_forked_lazy_casebase(tmp_path):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("pydantic_settings")
+    from cbrkit import api
+
+    casebase_file = tmp_path / "cars-1k.parquet"
+    pl.read_csv("data/cars-1k.csv").write_parquet(casebase_file)
+    retriever = cbrkit.retrieval.build(
+        cbrkit.sim.attribute_value(
+            attributes={"price": cbrkit.sim.numbers.linear(max=100000)}
+        ),
+        limit=5,
+    )
+    query = {"price": 10000}
+
+    # running polars in the parent starts its thread pool before forking
+    api.casebases["cars"] = cbrkit.loaders.path(casebase_file)
+    expected = cbrkit.retrieval.apply(api.casebases["cars"], query, retriever)
+
+    try:
+        api._collect_lazy_casebases()
+        pid = os.fork()
+
+        if pid == 0:
+            # a deadlocked worker is terminated by the alarm
+            signal.alarm(30)
+            status = 1
+
+            try:
+                result = cbrkit.retrieval.apply(api.casebases["cars"], query, retriever)
+                status = 0 if result.ranking == expected.ranking else 1
+            finally:
+                os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+    finally:
+        del api.casebases["cars"]
+
+    assert os.waitstatus_to_exitcode(status) == 0
@@ -156,3 +156,113 @@ def test_reuse_nested():
         "make": "vclass",
         "manufacturer": "mercedes",
     }
+
+
+def test_reuse_pool():
+    query = {
+        "price": 10000,
+        "year": 2010,
+        "manufacturer": "audi",
+        "make": "a4",
+        "miles": 100000,
+    }
+    full_casebase = cbrkit.loaders.path("data/cars-1k.csv")
+    casebase = {key: full_casebase[key] for key in range(10)}
+
+    reuse_func = cbrkit.reuse.build(
+        adaptation_func=custom_adapt,
+        similarity_func=cbrkit.sim.attribute_value(
+            attributes={
+                "price": cbrkit.sim.numbers.linear(max=100000),
+                "year": cbrkit.sim.numbers.linear(max=50),
+                "miles": cbrkit.sim.numbers.linear(max=100000),
+            }
+        ),
+        limit=5,
+    )
+    expected = cbrkit.reuse.apply(casebase, query, reuse_func)
+
+    with cbrkit.helpers.WorkerPool(2) as pool:
+        result = cbrkit.reuse.apply(casebase, query, reuse_func, pool=pool)
+        results = cbrkit.reuse.mapply(
+            casebase, {"default": query}, reuse_func, pool=pool
+        )
+
+    assert len(result.casebase) == 5
+    assert result.similarities == expected.similarities
+    assert results["default"].similarities == expected.similarities
+
+
+def test_reuse_retrieval_similarities():
+    query = {
+        "price": 10000,
+        "year": 2010,
+        "manufacturer": "audi",
+        "make": "a4",
+        "miles": 100000,
+    }
+    full_casebase = cbrkit.loaders.path("data/cars-1k.csv")
+    casebase = {key: full_casebase[key] for key in range(50)}
+    sim_func = cbrkit.sim.attribute_value(
+        attributes={
+            "price": cbrkit.sim.numbers.linear(max=100000),
+            "year": cbrkit.sim.numbers.linear(max=50),
+            "miles": cbrkit.sim.numbers.linear(max=100000),
+        }
+    )
+    retrieval_result = cbrkit.retrieval.apply(
+        casebase, query, cbrkit.retrieval.build(sim_func)
+    )
+    reuse_func = cbrkit.reuse.build(
+        adaptation_func=custom_adapt,
+        similarity_func=sim_func,
+        max_similarity_decrease=0.01,
+    )
+
+    expected = cbrkit.reuse.apply(retrieval_result.casebase, query, reuse_func)
+    result = cbrkit.reuse.apply(
+        retrieval_result.casebase,
+        query,
+        reuse_func,
+        similarities=retrieval_result.similarities,
+    )
+    parallel_result = cbrkit.reuse.apply(
+        retrieval_result.casebase, query, reuse_func, processes=2
+    )
+
+    # cases whose similarity decreases too much are not adapted
+    assert any(
+        result.casebase[key] == casebase[key] for key in result.casebase
+    ) and any(result.casebase[key] != casebase[key] for key in result.casebase)
+    assert result.casebase == expected.casebase
+    assert result.similarities == expected.similarities
+    assert parallel_result.casebase == expected.casebase
+    assert parallel_result.similarities == expected.similarities
+
+    queries = {"first": query, "second": {**query, "price": 20000}}
+    similarities = {
+        query_name: cbrkit.retrieval.apply(
+            casebase, query_value, cbrkit.retrieval.build(sim_func)
+        ).similarities
+        for query_name, query_value in queries.items()
+    }
+    expected_queries = cbrkit.reuse.mapply(casebase, queries, reuse_func)
+
+    for processes in (1, 2):
+        mapply_result = cbrkit.reuse.mapply(
+            casebase,
+            queries,
+            reuse_func,
+            processes=processes,
+            similarities=similarities,
+        )
+
+        for query_name in queries:
+            assert (
+                mapply_result[query_name].casebase
+                == expected_queries[query_name].casebase
+            )
+            assert (
+                mapply_result[query_name].similarities
+                == expected_queries[query_name].similarities
+            )